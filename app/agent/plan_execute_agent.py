@@ -1,15 +1,24 @@
+import logging
 from typing import Annotated, TypedDict, Sequence
 
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
 from pydantic import BaseModel, Field
 
+from app.config import settings
 from app.llm.provider import get_chat_model
-from app.agent.tools import get_all_tools
+from app.llm.tokens import estimate_tokens, truncate_to_tokens
+from app.agent.tools import get_all_tools, get_tool_registry
+from app.agent.tools.registry import BoundModels
+from app.agent.tool_memo import AGENT_LOOPS_STOPPED, MemoToolNode, answered_calls, repeated_calls
 from app.memory.short_term import get_session_history
+from app.concurrency.admission import AdmissionRejected, llm_slot
+from app.observability.tracing import span, traced
+from app.observability.usage import record_usage
+
+logger = logging.getLogger("smartflow.agent")
 
 
 # --- State definition ---
@@ -23,8 +32,13 @@ class PlanExecuteState(TypedDict):
     plan: list[str]
     current_step: int
     step_results: list[str]
+    step_digests: list[str]
+    step_start: int  # index in messages where the current step's exchange begins
+    step_prompt_tokens: list[int]
     rag_context: str
     final_response: str
+    tool_memo: dict[str, str]  # tool call key -> result, shared by all steps of the request
+    step_repeats: int  # tool-call rounds of the current step that only repeated its own answered calls
 
 
 # --- Prompts ---
@@ -38,10 +52,7 @@ PLANNER_PROMPT = """你是一个任务规划专家。请根据用户的需求，
 4. 最后一步应该是"汇总结果并回复用户"
 
 你有以下工具可以使用：
-- calculator: 计算数学表达式
-- web_search: 搜索网络信息
-- weather_query: 查询城市天气
-- database_query: 查询业务数据库（销售数据、订单信息）
+{tools}
 
 请用中文输出步骤列表。"""
 
@@ -49,11 +60,13 @@ EXECUTOR_PROMPT = """你是一个任务执行专家。请根据给定的步骤
 
 当前执行的步骤: {current_step}
 
-之前步骤的执行结果:
+之前步骤的执行结果(摘要):
 {previous_results}
 
 请执行当前步骤。如果需要使用工具，请调用合适的工具。"""
 
+RAG_STEP_TEMPLATE = "\n\n知识库参考:\n{context}"
+
 SUMMARIZER_PROMPT = """你是 SmartFlow 智能助手。请根据以下任务执行结果，为用户生成一个完整、清晰的回答。
 
 用户原始问题: {query}
@@ -67,6 +80,18 @@ SUMMARIZER_PROMPT = """你是 SmartFlow 智能助手。请根据以下任务执
 请用中文给出最终回答，要条理清晰、信息完整。"""
 
 MAX_STEPS = 10
+# Tool rounds one step may run; a step still asking for tools after that is
+# closed with its last tool output (like ReAct's MAX_ITERATIONS).
+MAX_STEP_TOOL_ROUNDS = 3
+# Each step takes executor + record_step plus two nodes per tool round; the
+# graph input, planner and summarizer count as three more.
+RECURSION_LIMIT = MAX_STEPS * (2 + 2 * MAX_STEP_TOOL_ROUNDS) + 3
+
+# Steps mentioning any of these always receive the RAG context.
+RAG_STEP_KEYWORDS = ("知识库", "文档", "资料", "检索", "政策", "制度", "规定", "手册")
+# Otherwise a step gets the context when this share of its character bigrams
+# also appear in the retrieved text.
+RAG_STEP_OVERLAP = 0.3
 
 
 class PlanExecuteAgent:
@@ -74,26 +99,36 @@ class PlanExecuteAgent:
 
     def __init__(self):
         self.tools = get_all_tools()
-        self.llm = get_chat_model()
-        self.llm_with_tools = self.llm.bind_tools(self.tools)
+        self.registry = get_tool_registry()
+        # One model per role so each gets its own deadline and latency profile.
+        self.planner_llm = get_chat_model("planner")
+        # Each step binds only the tools chosen for it (one cached binding per tool set).
+        self.executor_llm = BoundModels(get_chat_model("executor"), self.tools, agent="executor")
+        self.summarizer_llm = get_chat_model("summarizer")
         self.graph = self._build_graph()
 
     def _build_graph(self) -> StateGraph:
         workflow = StateGraph(PlanExecuteState)
 
-        workflow.add_node("planner", self._planner_node)
-        workflow.add_node("executor", self._executor_node)
-        workflow.add_node("executor_tools", ToolNode(self.tools))
-        workflow.add_node("summarizer", self._summarizer_node)
+        workflow.add_node("planner", traced("node", "plan.planner")(self._planner_node))
+        workflow.add_node("executor", traced("node", "plan.executor")(self._executor_node))
+        workflow.add_node("executor_tools", MemoToolNode(self.tools))
+        workflow.add_node("record_step", self._record_step_node)
+        workflow.add_node("summarizer", traced("node", "plan.summarizer")(self._summarizer_node))
 
         workflow.set_entry_point("planner")
         workflow.add_edge("planner", "executor")
         workflow.add_conditional_edges(
             "executor",
             self._after_executor,
-            {"tools": "executor_tools", "next_step": "executor", "summarize": "summarizer"},
+            {"tools": "executor_tools", "done": "record_step"},
         )
         workflow.add_edge("executor_tools", "executor")
+        workflow.add_conditional_edges(
+            "record_step",
+            self._after_record,
+            {"next_step": "executor", "summarize": "summarizer"},
+        )
         workflow.add_edge("summarizer", END)
 
         return workflow.compile()
@@ -111,21 +146,37 @@ class PlanExecuteAgent:
             ("system", PLANNER_PROMPT),
             ("human", "请为以下任务制定执行计划:\n{query}"),
         ])
+        tools = self.registry.prompt_lines(self.registry.select(user_query))
 
         # Try structured output first, fallback to text parsing
         try:
-            planner = prompt | self.llm.with_structured_output(Plan)
-            plan = planner.invoke({"query": user_query})
-            steps = plan.steps
+            planner = prompt | self.planner_llm.with_structured_output(Plan, include_raw=True)
+            with llm_slot(), span("llm", "planner"):
+                output = planner.invoke({"query": user_query, "tools": tools})
+            record_usage("planner", output["raw"])
+            if output["parsed"] is None:
+                raise ValueError(f"Unparseable plan: {output['parsing_error']}")
+            steps = output["parsed"].steps
+        except AdmissionRejected:
+            raise
         except Exception:
-            chain = prompt | self.llm
-            result = chain.invoke({"query": user_query})
+            chain = prompt | self.planner_llm
+            with llm_slot(), span("llm", "planner"):
+                result = chain.invoke({"query": user_query, "tools": tools})
+            record_usage("planner", result)
             steps = self._parse_plan_text(result.content)
 
         if not steps:
             steps = ["直接回答用户的问题"]
 
-        return {"plan": steps, "current_step": 0, "step_results": []}
+        return {
+            "plan": steps,
+            "current_step": 0,
+            "step_results": [],
+            "step_digests": [],
+            "step_start": len(messages),
+            "step_prompt_tokens": [],
+        }
 
     def _parse_plan_text(self, text: str) -> list[str]:
         """Parse numbered steps from LLM text output."""
@@ -147,6 +198,57 @@ class PlanExecuteAgent:
                 steps.append(line)
         return steps
 
+    @staticmethod
+    def _step_needs_rag(step: str, rag_ctx: str) -> bool:
+        """Whether a plan step is likely to benefit from the knowledge base context."""
+        if not rag_ctx:
+            return False
+        if any(kw in step for kw in RAG_STEP_KEYWORDS):
+            return True
+        compact = "".join(step.split())
+        bigrams = {compact[i:i + 2] for i in range(len(compact) - 1)}
+        if not bigrams:
+            return False
+        hits = sum(1 for bg in bigrams if bg in rag_ctx)
+        return hits / len(bigrams) >= RAG_STEP_OVERLAP
+
+    def _build_step_prompt(
+        self, state: PlanExecuteState, step_desc: str, reserved_tokens: int
+    ) -> str:
+        """Assemble the executor system prompt within PLAN_STEP_TOKEN_BUDGET.
+
+        Previous steps contribute bounded digests (newest first) rather than
+        their full output, and the RAG context is only attached to steps that
+        need it, truncated to whatever budget remains.
+        """
+        budget = settings.PLAN_STEP_TOKEN_BUDGET - reserved_tokens
+        budget -= estimate_tokens(EXECUTOR_PROMPT.format(current_step=step_desc, previous_results=""))
+
+        plan = state["plan"]
+        digests = []
+        for i in range(len(state["step_digests"]) - 1, -1, -1):
+            line = f"步骤 {i+1}: {plan[i]}\n结果: {state['step_digests'][i]}"
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                break
+            digests.append(line)
+            budget -= cost
+        previous_results = "\n".join(reversed(digests)) or "无"
+
+        prompt = EXECUTOR_PROMPT.format(
+            current_step=step_desc,
+            previous_results=previous_results,
+        )
+
+        rag_ctx = state.get("rag_context", "")
+        if self._step_needs_rag(step_desc, rag_ctx):
+            rag_budget = budget - estimate_tokens(RAG_STEP_TEMPLATE.format(context=""))
+            if rag_budget > 0:
+                prompt += RAG_STEP_TEMPLATE.format(
+                    context=truncate_to_tokens(rag_ctx, rag_budget)
+                )
+        return prompt
+
     def _executor_node(self, state: PlanExecuteState) -> dict:
         """Execute the current step using LLM with tools."""
         current_idx = state["current_step"]
@@ -156,50 +258,76 @@ class PlanExecuteAgent:
             return {}
 
         current_step_desc = plan[current_idx]
-        previous_results = "\n".join(
-            f"步骤 {i+1}: {state['plan'][i]}\n结果: {r}"
-            for i, r in enumerate(state["step_results"])
-        ) or "无"
-
-        # Add RAG context if available
-        rag_info = ""
-        rag_ctx = state.get("rag_context", "")
-        if rag_ctx:
-            rag_info = f"\n\n知识库参考:\n{rag_ctx}"
-
-        prompt = EXECUTOR_PROMPT.format(
-            current_step=current_step_desc,
-            previous_results=previous_results,
-        ) + rag_info
-
-        messages = [SystemMessage(content=prompt), HumanMessage(content=f"请执行: {current_step_desc}")]
-        response = self.llm_with_tools.invoke(messages)
-
-        return {"messages": [response]}
+        # Tool calls and results produced so far within this step only.
+        step_messages = list(state["messages"])[state["step_start"]:]
+        human = HumanMessage(content=f"请执行: {current_step_desc}")
+        reserved = sum(estimate_tokens(str(m.content)) for m in [human, *step_messages])
+
+        prompt = self._build_step_prompt(state, current_step_desc, reserved)
+        messages = [SystemMessage(content=prompt), human, *step_messages]
+        tool_names = self.registry.select(current_step_desc)
+        with llm_slot(), span("llm", "executor", step=current_idx):
+            response = self.executor_llm.get(tool_names).invoke(messages)
+        record_usage("executor", response)
+
+        prompt_tokens = estimate_tokens(prompt) + reserved
+        update = {
+            "messages": [response],
+            "step_prompt_tokens": list(state["step_prompt_tokens"]) + [prompt_tokens],
+        }
+        # Only calls this step already got an answer for count as a loop; a
+        # call answered in an earlier step is new here and the memo replies.
+        if repeated_calls(response, answered_calls(step_messages)):
+            update["step_repeats"] = state.get("step_repeats", 0) + 1
+        return update
 
     def _after_executor(self, state: PlanExecuteState) -> str:
-        """Decide what to do after executor runs."""
-        last_message = state["messages"][-1]
-
-        # If tool calls are pending, route to tools
+        """Route pending tool calls to the tool node, otherwise close the step."""
+        messages = state["messages"]
+        last_message = messages[-1]
         if hasattr(last_message, "tool_calls") and last_message.tool_calls:
+            if state.get("step_repeats", 0) > settings.REACT_LOOP_TOLERANCE:
+                # Re-asking for results the step already has: close it with them.
+                AGENT_LOOPS_STOPPED.inc(agent="plan_execute", reason="loop")
+                return "done"
+            rounds = sum(bool(getattr(m, "tool_calls", None)) for m in messages[state["step_start"]:-1])
+            if rounds >= MAX_STEP_TOOL_ROUNDS:
+                AGENT_LOOPS_STOPPED.inc(agent="plan_execute", reason="max_iterations")
+                return "done"
             return "tools"
+        return "done"
 
-        # Step completed, record result and move to next
-        current_idx = state["current_step"]
-        plan = state["plan"]
-        step_results = list(state["step_results"])
+    @staticmethod
+    def _digest(text: str) -> str:
+        """Bounded-length digest of a step result for use in later prompts."""
+        flat = " ".join(str(text).split())
+        digest = truncate_to_tokens(flat, settings.PLAN_STEP_DIGEST_TOKENS)
+        return digest if digest == flat else digest + "…"
 
+    def _record_step_node(self, state: PlanExecuteState) -> dict:
+        """Record the finished step's result and advance to the next step."""
+        last_message = state["messages"][-1]
         result_text = last_message.content if isinstance(last_message, AIMessage) else str(last_message)
-        step_results.append(result_text)
+        if getattr(last_message, "tool_calls", None):
+            # The step was stopped (loop or round cap); its result is the last tool output.
+            step_messages = list(state["messages"])[state["step_start"]:]
+            result_text = next(
+                (str(m.content) for m in reversed(step_messages) if isinstance(m, ToolMessage)), result_text
+            )
 
-        next_idx = current_idx + 1
-        if next_idx >= len(plan) or next_idx >= MAX_STEPS:
-            return "summarize"
+        return {
+            "step_results": list(state["step_results"]) + [result_text],
+            "step_digests": list(state["step_digests"]) + [self._digest(result_text)],
+            "current_step": state["current_step"] + 1,
+            "step_start": len(state["messages"]),
+            "step_repeats": 0,
+        }
 
-        # Update state for next step (via returning to executor)
-        state["current_step"] = next_idx
-        state["step_results"] = step_results
+    def _after_record(self, state: PlanExecuteState) -> str:
+        """Continue with the next step or hand off to the summarizer."""
+        next_idx = state["current_step"]
+        if next_idx >= len(state["plan"]) or next_idx >= MAX_STEPS:
+            return "summarize"
         return "next_step"
 
     def _summarizer_node(self, state: PlanExecuteState) -> dict:
@@ -226,38 +354,54 @@ class PlanExecuteAgent:
             ("human", "请生成最终回答。"),
         ])
 
-        chain = prompt | self.llm
-        result = chain.invoke({
-            "query": user_query,
-            "plan": plan_text,
-            "results": results_text,
-        })
+        chain = prompt | self.summarizer_llm
+        with llm_slot(), span("llm", "summarizer"):
+            result = chain.invoke({
+                "query": user_query,
+                "plan": plan_text,
+                "results": results_text,
+            })
+        record_usage("summarizer", result)
 
         return {"final_response": result.content, "messages": [AIMessage(content=result.content)]}
 
     def invoke(
-        self, query: str, session_id: str = "default", rag_context: str = ""
+        self,
+        query: str,
+        session_id: str = "default",
+        rag_context: str = "",
+        stateless: bool = False,
     ) -> dict:
         """Run the Plan-and-Execute agent on a user query."""
-        history = get_session_history(session_id)
-        messages = list(history.messages) + [HumanMessage(content=query)]
+        # Stateless requests neither see nor extend the session history.
+        history = None if stateless else get_session_history(session_id)
+        past = list(history.messages) if history is not None else []
+        messages = past + [HumanMessage(content=query)]
 
         initial_state: PlanExecuteState = {
             "messages": messages,
             "plan": [],
             "current_step": 0,
             "step_results": [],
+            "step_digests": [],
+            "step_start": len(messages),
+            "step_prompt_tokens": [],
             "rag_context": rag_context,
             "final_response": "",
+            "tool_memo": {},
+            "step_repeats": 0,
         }
 
-        result = self.graph.invoke(initial_state)
+        result = self.graph.invoke(initial_state, config={"recursion_limit": RECURSION_LIMIT})
 
         final_response = result.get("final_response", "")
         if not final_response:
             ai_messages = [m for m in result["messages"] if isinstance(m, AIMessage)]
             final_response = ai_messages[-1].content if ai_messages else "任务执行完成。"
 
+        step_prompt_tokens = result.get("step_prompt_tokens", [])
+        logger.info("Plan-Execute executor prompt tokens per call: %s", step_prompt_tokens)
+
         # Extract intermediate steps
         intermediate_steps = []
         for i, (step, res) in enumerate(zip(result.get("plan", []), result.get("step_results", []))):
@@ -268,12 +412,15 @@ class PlanExecuteAgent:
             })
 
         # Save to conversation history
-        history.add_message(HumanMessage(content=query))
-        history.add_message(AIMessage(content=final_response))
+        if history is not None:
+            history.add_message(HumanMessage(content=query))
+            history.add_message(AIMessage(content=final_response))
 
         return {
             "response": final_response,
             "intermediate_steps": intermediate_steps,
             "sources": [],
             "plan": result.get("plan", []),
+            "step_prompt_tokens": step_prompt_tokens,
+            "iterations": len(step_prompt_tokens),
         }
@@ -1,28 +1,41 @@
 from typing import Annotated, TypedDict, Sequence
 
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, ToolMessage
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
 
+from app.config import settings
 from app.llm.provider import get_chat_model
-from app.agent.tools import get_all_tools
+from app.agent.tools import get_all_tools, get_tool_registry
+from app.agent.tools.registry import BoundModels
+from app.agent.tool_memo import AGENT_LOOPS_STOPPED, MemoToolNode, repeated_calls
 from app.memory.short_term import get_session_history
+from app.concurrency.admission import llm_slot
+from app.observability.metrics import Histogram
+from app.observability.tracing import span, traced
+from app.observability.usage import record_usage
+
+REACT_ITERATIONS = Histogram(
+    "smartflow_react_iterations",
+    "LLM reasoning rounds per ReAct request, including a forced final answer.",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12),
+)
 
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     rag_context: str
     iteration_count: int
+    tool_names: list[str]  # tools bound for this request, chosen by the tool registry
+    tool_memo: dict[str, str]  # tool call key -> result, for this request only
+    repeated_rounds: int  # tool-call rounds that only repeated already answered calls
+    stop_reason: str
 
 
 SYSTEM_PROMPT = """你是 SmartFlow 智能助手，一个强大的 AI Agent。你可以通过思考和调用工具来帮助用户完成各种任务。
 
 你拥有以下工具：
-- calculator: 计算数学表达式
-- web_search: 搜索网络信息
-- weather_query: 查询城市天气
-- database_query: 查询业务数据库（销售数据、订单信息）
+{tools}
 
 请根据用户的问题，决定是否需要使用工具。如果需要，请调用合适的工具并基于工具返回的结果回答用户。
 如果不需要工具，请直接回答用户的问题。
@@ -35,6 +48,10 @@ RAG_CONTEXT_TEMPLATE = """
 
 请基于以上知识库内容回答用户的问题。如果知识库内容不足以回答，请结合你自己的知识补充。"""
 
+FINAL_ANSWER_PROMPT = """
+
+你已经获得了回答所需的工具结果，不要再调用工具。请直接根据对话中工具返回的信息，用中文给出最终回答。"""
+
 MAX_ITERATIONS = 10
 
 
@@ -43,71 +60,137 @@ class ReActAgent:
 
     def __init__(self):
         self.tools = get_all_tools()
-        self.llm = get_chat_model().bind_tools(self.tools)
+        self.registry = get_tool_registry()
+        # Bound to the tools chosen per request (one cached binding per tool set);
+        # the tool node can still run any tool.
+        self.llm = BoundModels(get_chat_model("react"), self.tools, agent="react")
+        # Same model with tool calling disabled, used to force a final answer.
+        self.final_llm = BoundModels(get_chat_model("react"), self.tools, agent="react", tool_choice="none")
         self.graph = self._build_graph()
 
     def _build_graph(self) -> StateGraph:
         workflow = StateGraph(AgentState)
 
-        workflow.add_node("agent", self._agent_node)
-        workflow.add_node("tools", ToolNode(self.tools))
+        workflow.add_node("agent", traced("node", "react.agent")(self._agent_node))
+        workflow.add_node("tools", MemoToolNode(self.tools))
+        workflow.add_node("finalize", traced("node", "react.finalize")(self._finalize_node))
 
         workflow.set_entry_point("agent")
         workflow.add_conditional_edges(
             "agent",
             self._should_continue,
-            {"continue": "tools", "end": END},
+            {"continue": "tools", "finalize": "finalize", "end": END},
         )
         workflow.add_edge("tools", "agent")
+        workflow.add_edge("finalize", END)
 
         return workflow.compile()
 
+    def _system_prompt(self, state: AgentState) -> str:
+        """System prompt listing the request's tools, with optional RAG context."""
+        sys_prompt = SYSTEM_PROMPT.format(tools=self.registry.prompt_lines(state["tool_names"]))
+        rag_ctx = state.get("rag_context", "")
+        if rag_ctx:
+            sys_prompt += RAG_CONTEXT_TEMPLATE.format(context=rag_ctx)
+        return sys_prompt
+
     def _agent_node(self, state: AgentState) -> dict:
         """LLM reasoning node: decides whether to call tools or give final answer."""
         messages = list(state["messages"])
         iteration = state.get("iteration_count", 0)
 
-        # Build system prompt with optional RAG context
-        sys_prompt = SYSTEM_PROMPT
-        rag_ctx = state.get("rag_context", "")
-        if rag_ctx:
-            sys_prompt += RAG_CONTEXT_TEMPLATE.format(context=rag_ctx)
-
         # Ensure system message is first
         if not messages or not isinstance(messages[0], SystemMessage):
-            messages.insert(0, SystemMessage(content=sys_prompt))
+            messages.insert(0, SystemMessage(content=self._system_prompt(state)))
 
-        response = self.llm.invoke(messages)
-        return {"messages": [response], "iteration_count": iteration + 1}
+        with llm_slot(), span("llm", "react"):
+            response = self.llm.get(state["tool_names"]).invoke(messages)
+        record_usage("react", response)
+        update = {"messages": [response], "iteration_count": iteration + 1}
+        if repeated_calls(response, state.get("tool_memo")):
+            update["repeated_rounds"] = state.get("repeated_rounds", 0) + 1
+        return update
 
     def _should_continue(self, state: AgentState) -> str:
-        """Decide whether to continue tool calling or end."""
-        if state.get("iteration_count", 0) >= MAX_ITERATIONS:
+        """Decide whether to run the requested tools, force a final answer or end."""
+        last_message = state["messages"][-1]
+        if not (hasattr(last_message, "tool_calls") and last_message.tool_calls):
             return "end"
+        # The model keeps asking for results it already has: stop the loop
+        # instead of paying for more rounds up to MAX_ITERATIONS.
+        if state.get("repeated_rounds", 0) > settings.REACT_LOOP_TOLERANCE:
+            return "finalize"
+        if state.get("iteration_count", 0) >= MAX_ITERATIONS:
+            return "finalize"
+        return "continue"
 
-        last_message = state["messages"][-1]
-        if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-            return "continue"
-        return "end"
+    def _finalize_node(self, state: AgentState) -> dict:
+        """Answer from the tool results gathered so far, without further tool calls."""
+        messages = list(state["messages"])
+        reason = "loop" if state.get("repeated_rounds", 0) > settings.REACT_LOOP_TOLERANCE else "max_iterations"
+        AGENT_LOOPS_STOPPED.inc(agent="react", reason=reason)
+        # The last message holds tool calls that will not be answered; providers
+        # reject a transcript with unanswered calls, so it is dropped.
+        messages = messages[:-1]
+
+        # The instruction joins the leading system prompt: several providers
+        # reject or ignore a system message after the conversation has started.
+        if messages and isinstance(messages[0], SystemMessage):
+            messages[0] = SystemMessage(content=str(messages[0].content) + FINAL_ANSWER_PROMPT)
+        else:
+            messages.insert(0, SystemMessage(content=self._system_prompt(state) + FINAL_ANSWER_PROMPT))
+
+        with llm_slot(), span("llm", "react", forced=reason):
+            response = self.final_llm.get(state["tool_names"]).invoke(messages)
+        record_usage("react", response)
+        # Providers that ignore tool_choice may still ask for tools; keep only the text.
+        final = AIMessage(content=response.content or self._last_tool_output(messages))
+        return {
+            "messages": [final],
+            "iteration_count": state.get("iteration_count", 0) + 1,
+            "stop_reason": reason,
+        }
+
+    @staticmethod
+    def _last_tool_output(messages: list[BaseMessage]) -> str:
+        for msg in reversed(messages):
+            if isinstance(msg, ToolMessage):
+                return str(msg.content)
+        return "抱歉，我无法处理这个请求。"
 
     def invoke(
-        self, query: str, session_id: str = "default", rag_context: str = ""
+        self,
+        query: str,
+        session_id: str = "default",
+        rag_context: str = "",
+        stateless: bool = False,
     ) -> dict:
         """Run the ReAct agent on a user query.
 
         Returns dict with 'response', 'intermediate_steps', 'sources'.
         """
         # Load conversation history
-        history = get_session_history(session_id)
-        messages = list(history.messages) + [HumanMessage(content=query)]
+        # Stateless requests neither see nor extend the session history.
+        history = None if stateless else get_session_history(session_id)
+        past = list(history.messages) if history is not None else []
+        messages = past + [HumanMessage(content=query)]
+        # The previous question helps follow-ups like "那上海呢？" find their tools.
+        previous = next((m.content for m in reversed(past) if isinstance(m, HumanMessage)), "")
+        tool_names = self.registry.select(f"{previous}\n{query}" if previous else query)
 
         initial_state: AgentState = {
             "messages": messages,
             "rag_context": rag_context,
+            "tool_names": list(tool_names),
             "iteration_count": 0,
+            "tool_memo": {},
+            "repeated_rounds": 0,
+            "stop_reason": "",
         }
 
         result = self.graph.invoke(initial_state)
+        iterations = result.get("iteration_count", 0)
+        REACT_ITERATIONS.observe(iterations)
 
         # Extract final response
         ai_messages = [m for m in result["messages"] if isinstance(m, AIMessage)]
@@ -119,24 +202,30 @@ class ReActAgent:
         for i, msg in enumerate(all_msgs):
             if isinstance(msg, AIMessage) and hasattr(msg, "tool_calls") and msg.tool_calls:
                 for tc in msg.tool_calls:
-                    step = {
+                    # Find matching tool response; calls cut off by a forced
+                    # final answer never ran and have none.
+                    output = next(
+                        (m.content for m in all_msgs[i + 1 :]
+                         if isinstance(m, ToolMessage) and m.tool_call_id == tc["id"]),
+                        None,
+                    )
+                    if output is None:
+                        continue
+                    intermediate_steps.append({
                         "tool": tc["name"],
                         "tool_input": str(tc["args"]),
-                        "output": "",
-                    }
-                    # Find matching tool response
-                    for next_msg in all_msgs[i + 1 :]:
-                        if hasattr(next_msg, "name") and next_msg.name == tc["name"]:
-                            step["output"] = next_msg.content
-                            break
-                    intermediate_steps.append(step)
+                        "output": output,
+                    })
 
         # Save to conversation history
-        history.add_message(HumanMessage(content=query))
-        history.add_message(AIMessage(content=final_response))
+        if history is not None:
+            history.add_message(HumanMessage(content=query))
+            history.add_message(AIMessage(content=final_response))
 
         return {
             "response": final_response,
             "intermediate_steps": intermediate_steps,
             "sources": [],
+            "iterations": iterations,
+            "stop_reason": result.get("stop_reason", ""),
         }
@@ -1,11 +1,22 @@
+import copy
+from typing import TYPE_CHECKING, Optional
+
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
 
+from app.concurrency.admission import AdmissionRejected, llm_slot
+from app.concurrency.single_flight import SingleFlight, normalize_text
 from app.llm.provider import get_chat_model
-from app.agent.react_agent import ReActAgent
-from app.agent.plan_execute_agent import PlanExecuteAgent
-from app.rag.retriever import RAGRetriever
-from app.rag.vector_store import VectorStoreManager
+from app.observability.tracing import span
+from app.observability.usage import add_session_usage, record_usage, track_usage
+
+if TYPE_CHECKING:
+    from app.agent.react_agent import ReActAgent
+    from app.agent.plan_execute_agent import PlanExecuteAgent
+    from app.rag.retriever import RAGRetriever
+    from app.rag.vector_store import VectorStoreManager
+
+# Shared by all supervisors so identical stateless requests coalesce process-wide.
+_chat_flight = SingleFlight("chat")
 
 
 CLASSIFIER_PROMPT = """你是一个任务分类专家。请根据用户的输入，判断应该使用哪种处理模式。
@@ -27,55 +38,71 @@ class SupervisorAgent:
     """
 
     def __init__(self):
-        self._react_agent: ReActAgent | None = None
-        self._plan_execute_agent: PlanExecuteAgent | None = None
-        self._vector_store: VectorStoreManager | None = None
-        self._rag_retriever: RAGRetriever | None = None
+        self._react_agent: "ReActAgent | None" = None
+        self._plan_execute_agent: "PlanExecuteAgent | None" = None
+        self._vector_store: "VectorStoreManager | None" = None
+        self._rag_retriever: "RAGRetriever | None" = None
         self._llm = None
 
     @property
-    def react_agent(self) -> ReActAgent:
+    def react_agent(self) -> "ReActAgent":
+        # Agents and RAG components are imported on first use: they pull in
+        # langgraph and chromadb, which dominate cold-start time.
         if self._react_agent is None:
+            from app.agent.react_agent import ReActAgent
+
             self._react_agent = ReActAgent()
         return self._react_agent
 
     @property
-    def plan_execute_agent(self) -> PlanExecuteAgent:
+    def plan_execute_agent(self) -> "PlanExecuteAgent":
         if self._plan_execute_agent is None:
+            from app.agent.plan_execute_agent import PlanExecuteAgent
+
             self._plan_execute_agent = PlanExecuteAgent()
         return self._plan_execute_agent
 
     @property
-    def vector_store(self) -> VectorStoreManager:
+    def vector_store(self) -> "VectorStoreManager":
         if self._vector_store is None:
+            from app.rag.vector_store import VectorStoreManager
+
             self._vector_store = VectorStoreManager()
         return self._vector_store
 
     @property
-    def rag_retriever(self) -> RAGRetriever:
+    def rag_retriever(self) -> "RAGRetriever":
         if self._rag_retriever is None:
+            from app.rag.retriever import RAGRetriever
+
             self._rag_retriever = RAGRetriever(self.vector_store)
         return self._rag_retriever
 
     @property
     def llm(self):
         if self._llm is None:
-            self._llm = get_chat_model()
+            self._llm = get_chat_model("classifier")
         return self._llm
 
     def _classify_query(self, query: str) -> str:
         """Use LLM to classify whether the query needs react or plan_execute."""
+        from langchain_core.prompts import ChatPromptTemplate
+
         try:
             prompt = ChatPromptTemplate.from_messages([
                 ("system", CLASSIFIER_PROMPT),
                 ("human", "{query}"),
             ])
             chain = prompt | self.llm
-            result = chain.invoke({"query": query})
+            with llm_slot(), span("llm", "classifier"):
+                result = chain.invoke({"query": query})
+            record_usage("classifier", result)
             classification = result.content.strip().lower()
             if "plan" in classification:
                 return "plan_execute"
             return "react"
+        except AdmissionRejected:
+            raise
         except Exception:
             return "react"
 
@@ -86,6 +113,8 @@ class SupervisorAgent:
         mode: str = "auto",
         use_rag: bool = False,
         collection_name: str = "default",
+        stateless: bool = False,
+        rag_context: Optional[str] = None,
     ) -> dict:
         """Process a user query through the appropriate agent.
 
@@ -95,29 +124,72 @@ class SupervisorAgent:
             mode: "react", "plan_execute", or "auto"
             use_rag: Whether to retrieve from knowledge base
             collection_name: Which RAG collection to search
+            stateless: Ignore and don't update session history. Identical
+                concurrent stateless requests share a single execution.
+            rag_context: Pre-retrieved knowledge base context (e.g. shared by a
+                batch); when given, retrieval is skipped.
         """
-        # Retrieve RAG context if enabled
-        rag_context = ""
-        if use_rag:
-            rag_context = self.rag_retriever.retrieve_as_context(
-                query, collection_name
-            )
+        coalesced = False
+        with track_usage() as usage:
+            if stateless:
+                key = (
+                    normalize_text(query),
+                    mode,
+                    collection_name if use_rag else None,
+                    stateless,
+                )
+                shared, coalesced = _chat_flight.do(
+                    key, self._run, query, session_id, mode, use_rag, collection_name, True, rag_context
+                )
+                result = copy.deepcopy(shared)
+            else:
+                result = self._run(
+                    query, session_id, mode, use_rag, collection_name, rag_context=rag_context
+                )
+
+        # A coalesced request made no LLM calls of its own, so its usage is zero.
+        add_session_usage(session_id, usage)
+        result["usage"] = usage.as_dict()
+        result["coalesced"] = coalesced
+        return result
+
+    def _run(
+        self,
+        query: str,
+        session_id: str,
+        mode: str,
+        use_rag: bool,
+        collection_name: str,
+        stateless: bool = False,
+        rag_context: Optional[str] = None,
+    ) -> dict:
+        """Retrieve RAG context, pick an agent and run it."""
+        # Retrieve RAG context if enabled and not supplied by the caller
+        if not use_rag:
+            rag_context = ""
+        elif rag_context is None:
+            with span("rag", "retrieve", collection=collection_name):
+                rag_context = self.rag_retriever.retrieve_as_context(
+                    query, collection_name
+                )
 
         # Determine agent mode
         if mode == "auto":
-            agent_mode = self._classify_query(query)
+            with span("route", "classify"):
+                agent_mode = self._classify_query(query)
         else:
             agent_mode = mode
 
         # Route to appropriate agent
-        if agent_mode == "plan_execute":
-            result = self.plan_execute_agent.invoke(
-                query, session_id=session_id, rag_context=rag_context
-            )
-        else:
-            result = self.react_agent.invoke(
-                query, session_id=session_id, rag_context=rag_context
-            )
+        with span("agent", agent_mode):
+            if agent_mode == "plan_execute":
+                result = self.plan_execute_agent.invoke(
+                    query, session_id=session_id, rag_context=rag_context, stateless=stateless
+                )
+            else:
+                result = self.react_agent.invoke(
+                    query, session_id=session_id, rag_context=rag_context, stateless=stateless
+                )
 
         result["agent_mode"] = agent_mode
 
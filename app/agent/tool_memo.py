@@ -0,0 +1,108 @@
+import json
+from typing import Collection, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+from langchain_core.tools import BaseTool
+
+from app.config import settings
+from app.observability.metrics import Counter
+
+TOOL_CALLS = Counter(
+    "smartflow_agent_tool_calls_total",
+    "Tool calls requested by agents; outcome is 'executed' or 'memo_hit' (answered from this request's memo).",
+    labelnames=("tool", "outcome"),
+)
+AGENT_LOOPS_STOPPED = Counter(
+    "smartflow_agent_loops_stopped_total",
+    "Tool-call loops cut short; reason is 'loop' (repeated calls) or 'max_iterations'.",
+    labelnames=("agent", "reason"),
+)
+
+
+def call_key(name: str, args: dict) -> str:
+    """Canonical key of one tool call: argument order and whitespace don't matter."""
+    args = {k: v.strip() if isinstance(v, str) else v for k, v in (args or {}).items()}
+    return json.dumps([name, args], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def repeated_calls(message: AIMessage, answered: Optional[Collection[str]]) -> bool:
+    """Whether every tool call in message is among the answered call keys (e.g. the request's memo)."""
+    if not answered or not getattr(message, "tool_calls", None):
+        return False
+    return all(call_key(tc["name"], tc["args"]) in answered for tc in message.tool_calls)
+
+
+def answered_calls(messages: Sequence[BaseMessage]) -> set[str]:
+    """Keys of the tool calls in messages that a successful ToolMessage in messages answers."""
+    answered_ids = {
+        m.tool_call_id for m in messages if isinstance(m, ToolMessage) and m.status != "error"
+    }
+    return {
+        call_key(tc["name"], tc["args"])
+        for m in messages
+        for tc in getattr(m, "tool_calls", None) or ()
+        if tc["id"] in answered_ids
+    }
+
+
+class MemoToolNode:
+    """Graph node that runs the last AI message's tool calls through a per-request memo.
+
+    The memo lives in graph state under ``tool_memo`` (call key -> result text),
+    so it is scoped to one graph invocation. Calls already answered in this
+    request are replied to from the memo instead of running the tool again;
+    failed calls are not memoized. New calls run in parallel like LangGraph's
+    ToolNode.
+    """
+
+    def __init__(self, tools: list[BaseTool]):
+        self.tools_by_name = {t.name: t for t in tools}
+
+    def _run(self, call: dict) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return ToolMessage(
+                content=f"Error: {call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+                name=call["name"],
+                tool_call_id=call["id"],
+                status="error",
+            )
+        try:
+            return tool.invoke({**call, "type": "tool_call"})
+        except Exception as e:
+            return ToolMessage(
+                content=f"Error: {e!r}\n Please fix your mistakes.",
+                name=call["name"],
+                tool_call_id=call["id"],
+                status="error",
+            )
+
+    def __call__(self, state: dict, config: RunnableConfig) -> dict:
+        calls = state["messages"][-1].tool_calls
+        memo = dict(state.get("tool_memo") or {})
+        keys = [call_key(tc["name"], tc["args"]) for tc in calls]
+
+        replies: dict[str, ToolMessage] = {}
+        pending = []
+        for tc, key in zip(calls, keys):
+            if settings.TOOL_MEMO_ENABLED and key in memo:
+                TOOL_CALLS.inc(tool=tc["name"], outcome="memo_hit")
+                replies[tc["id"]] = ToolMessage(content=memo[key], name=tc["name"], tool_call_id=tc["id"])
+            else:
+                TOOL_CALLS.inc(tool=tc["name"], outcome="executed")
+                pending.append((tc, key))
+
+        results = []
+        if len(pending) == 1:
+            results = [self._run(pending[0][0])]
+        elif pending:
+            with get_executor_for_config(config) as executor:
+                results = list(executor.map(self._run, [tc for tc, _ in pending]))
+        for (tc, key), message in zip(pending, results):
+            replies[tc["id"]] = message
+            if message.status != "error":
+                memo[key] = message.content
+
+        return {"messages": [replies[tc["id"]] for tc in calls], "tool_memo": memo}
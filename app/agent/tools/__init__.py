@@ -2,8 +2,115 @@ from app.agent.tools.calculator import calculator
 from app.agent.tools.web_search import web_search
 from app.agent.tools.weather import weather_query
 from app.agent.tools.database import database_query
+from app.agent.tools.cache import CachePolicy, cached
+from app.agent.tools.registry import ToolRegistry, ToolSpec
+from app.concurrency.single_flight import normalize_text
+from app.config import settings
+
+_TOOL_FUNCTIONS = [calculator, web_search, weather_query, database_query]
+_tools = None
+_registry = None
+
+# Prompt line and keyword triggers per tool, for get_tool_registry().
+_TOOL_SPECS = {
+    "calculator": (
+        "计算数学表达式（同一公式套用到多组数据时，用 variables 传入各组数值一次算完）",
+        ("计算", "算一下", "算出", "等于", "增长率", "百分比", "比例", "占比", "平均", "求和", "合计", "+", "*", "/"),
+    ),
+    "web_search": (
+        "搜索网络信息",
+        ("搜索", "查找", "搜一下", "最新", "趋势", "新闻", "资讯", "动态", "网上", "search"),
+    ),
+    "weather_query": (
+        "查询城市天气",
+        ("天气", "气温", "温度", "下雨", "降雨", "下雪", "湿度", "风力", "穿搭", "穿什么", "带伞", "weather"),
+    ),
+    "database_query": (
+        "查询业务数据库（销售数据、订单信息）",
+        ("订单", "ord-", "销售", "营收", "业绩", "收入", "数据库"),
+    ),
+}
+
+
+def _search_key(query: str) -> str:
+    return normalize_text(query).lower()
+
+
+def _city_key(city: str) -> str:
+    return normalize_text(city)
+
+
+def _database_cacheable(result: str) -> bool:
+    """Errors and "not found" replies are not cached: the data may appear later."""
+    return not result.startswith(("未找到", "不支持", "暂无"))
+
+
+def _database_key(query_type: str, params: str = "") -> tuple:
+    query_type = query_type.strip().lower()
+    if query_type == "order":
+        return query_type, params.strip().upper()
+    return query_type, params.strip()
+
+
+def _cache_policies() -> dict[str, CachePolicy]:
+    """Result caching per tool. Calculator is cheap and not cached."""
+    return {
+        "web_search": CachePolicy(
+            ttl=settings.TOOL_CACHE_WEB_SEARCH_TTL, stale=settings.TOOL_CACHE_STALE_SECONDS,
+            max_entries=2048, key=_search_key,
+        ),
+        "weather_query": CachePolicy(
+            ttl=settings.TOOL_CACHE_WEATHER_QUERY_TTL, stale=settings.TOOL_CACHE_STALE_SECONDS,
+            max_entries=512, key=_city_key,
+        ),
+        "database_query": CachePolicy(
+            ttl=settings.TOOL_CACHE_DATABASE_QUERY_TTL, stale=settings.TOOL_CACHE_STALE_SECONDS,
+            max_entries=1024, key=_database_key, cacheable=_database_cacheable,
+        ),
+    }
 
 
 def get_all_tools():
-    """Return all available tools for the agent."""
-    return [calculator, web_search, weather_query, database_query]
+    """Return all available tools for the agent.
+
+    The plain functions are wrapped as LangChain tools on first call, so importing
+    them (e.g. for tool benchmarks) does not pull in langchain_core. Tools with a
+    cache policy share a result cache across requests (TOOL_CACHE_*).
+    """
+    global _tools
+    if _tools is None:
+        from langchain_core.tools import tool
+
+        policies = _cache_policies()
+        _tools = [
+            tool(cached(func, policies[func.__name__]) if func.__name__ in policies else func)
+            for func in _TOOL_FUNCTIONS
+        ]
+    return list(_tools)
+
+
+def get_tool_registry() -> ToolRegistry:
+    """Registry used by the agents to bind only the tools relevant to a query.
+
+    Selection is off (every tool bound) when TOOL_SELECTION_ENABLED is false or
+    the catalog has at most TOOL_SELECTION_TOP_N tools.
+    """
+    global _registry
+    if _registry is None:
+        from app.llm.provider import get_embeddings
+
+        specs = [
+            ToolSpec(
+                name=func.__name__,
+                summary=_TOOL_SPECS[func.__name__][0],
+                keywords=_TOOL_SPECS[func.__name__][1],
+                description=(func.__doc__ or "").strip().split("\n\n")[0],
+            )
+            for func in _TOOL_FUNCTIONS
+        ]
+        _registry = ToolRegistry(
+            specs,
+            top_n=settings.TOOL_SELECTION_TOP_N if settings.TOOL_SELECTION_ENABLED else 0,
+            embeddings_factory=get_embeddings if settings.TOOL_SELECTION_EMBEDDINGS else None,
+        )
+    return _registry
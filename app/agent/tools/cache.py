@@ -0,0 +1,157 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+from app.concurrency.single_flight import SingleFlight
+from app.config import settings
+from app.observability.metrics import Counter, Gauge
+
+logger = logging.getLogger("smartflow.tools")
+
+TOOL_CACHE_REQUESTS = Counter(
+    "smartflow_tool_cache_requests_total",
+    "Tool calls through the result cache; outcome is 'hit', 'stale' (served while refreshing) or 'miss'.",
+    labelnames=("tool", "outcome"),
+)
+TOOL_CACHE_ENTRIES = Gauge(
+    "smartflow_tool_cache_entries",
+    "Results currently held in a tool's cache.",
+    labelnames=("tool",),
+)
+TOOL_CACHE_EVICTIONS = Counter(
+    "smartflow_tool_cache_evictions_total",
+    "Results dropped from a tool's cache; reason is 'capacity' or 'expired'.",
+    labelnames=("tool", "reason"),
+)
+TOOL_CACHE_REFRESHES = Counter(
+    "smartflow_tool_cache_refreshes_total",
+    "Background refreshes of stale results; outcome is 'ok' or 'error'.",
+    labelnames=("tool", "outcome"),
+)
+
+# Stale entries are refreshed here, off the request path.
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool-refresh")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """How one tool's results are cached.
+
+    ``ttl`` is how long a result is served as fresh; for ``stale`` seconds
+    after that it is still served, but triggers a background refresh.
+    ``key`` maps the call's arguments (by name) to the cache key, so
+    equivalent inputs share an entry. Results for which ``cacheable``
+    returns False (e.g. "not found" replies) are returned but not stored.
+    """
+
+    ttl: float
+    stale: float = 0.0
+    max_entries: int = 1024
+    key: Optional[Callable[..., Hashable]] = None
+    cacheable: Optional[Callable[[str], bool]] = None
+
+
+class ToolCache:
+    """Thread-safe LRU of tool results with TTL and stale-while-revalidate.
+
+    Concurrent misses for the same key run the tool once (single flight).
+    Exceptions are never cached.
+    """
+
+    def __init__(self, name: str, policy: CachePolicy):
+        self.name = name
+        self.policy = policy
+        self._entries: OrderedDict[Hashable, tuple[float, str]] = OrderedDict()
+        self._refreshing: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(f"tool:{name}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.policy.max_entries:
+                self._entries.popitem(last=False)
+                TOOL_CACHE_EVICTIONS.inc(tool=self.name, reason="capacity")
+            TOOL_CACHE_ENTRIES.set(len(self._entries), tool=self.name)
+
+    def _load(self, key: Hashable, fn: Callable[[], str]) -> str:
+        value, _ = self._flight.do(key, fn)
+        if self.policy.cacheable is None or self.policy.cacheable(value):
+            self._store(key, value)
+        return value
+
+    def _refresh(self, key: Hashable, fn: Callable[[], str]) -> None:
+        try:
+            self._load(key, fn)
+            TOOL_CACHE_REFRESHES.inc(tool=self.name, outcome="ok")
+        except Exception:
+            # Keep serving the stale value until it expires for good.
+            TOOL_CACHE_REFRESHES.inc(tool=self.name, outcome="error")
+            logger.warning("Refreshing cached %s result failed", self.name, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_call(self, key: Hashable, fn: Callable[[], str]) -> str:
+        """Return the cached result for key, calling fn on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age <= self.policy.ttl:
+                    self._entries.move_to_end(key)
+                    TOOL_CACHE_REQUESTS.inc(tool=self.name, outcome="hit")
+                    return entry[1]
+                if age <= self.policy.ttl + self.policy.stale:
+                    self._entries.move_to_end(key)
+                    refresh = key not in self._refreshing
+                    if refresh:
+                        self._refreshing.add(key)
+                    TOOL_CACHE_REQUESTS.inc(tool=self.name, outcome="stale")
+                    stale_value = entry[1]
+                else:
+                    del self._entries[key]
+                    TOOL_CACHE_EVICTIONS.inc(tool=self.name, reason="expired")
+                    TOOL_CACHE_ENTRIES.set(len(self._entries), tool=self.name)
+                    entry = None
+        if entry is not None:
+            if refresh:
+                _refresh_pool.submit(self._refresh, key, fn)
+            return stale_value
+
+        TOOL_CACHE_REQUESTS.inc(tool=self.name, outcome="miss")
+        return self._load(key, fn)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            TOOL_CACHE_ENTRIES.set(0, tool=self.name)
+
+
+def cached(func: Callable[..., str], policy: CachePolicy) -> Callable[..., str]:
+    """Wrap a tool function with a result cache; keeps its signature and docstring."""
+    signature = inspect.signature(func)
+    cache = ToolCache(func.__name__, policy)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.TOOL_CACHE_ENABLED or policy.ttl <= 0:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = policy.key(**bound.arguments) if policy.key else tuple(bound.arguments.values())
+        return cache.get_or_call(key, functools.partial(func, *args, **kwargs))
+
+    wrapper.cache = cache
+    return wrapper
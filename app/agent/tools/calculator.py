@@ -1,7 +1,20 @@
 import ast
+import functools
+import math
+import multiprocessing
 import operator
+import threading
+from typing import NamedTuple, Optional, Union
 
-from langchain_core.tools import tool
+from app.config import settings
+from app.observability.metrics import Counter
+from app.observability.tracing import traced
+
+CALCULATOR_EVALUATIONS = Counter(
+    "smartflow_calculator_evaluations_total",
+    "Calculator evaluations; path is 'inline', 'batch', 'worker', 'rejected' (over a limit or invalid) or 'timeout'.",
+    labelnames=("path",),
+)
 
 _SAFE_OPERATORS = {
     ast.Add: operator.add,
@@ -14,40 +27,303 @@ _SAFE_OPERATORS = {
     ast.USub: operator.neg,
 }
 
+_LOG10_2 = math.log10(2)
+_EXACT_DIGITS = 100  # longer integer results are shown in scientific notation
+
+Number = Union[int, float]
+
+
+class _Limits(NamedTuple):
+    max_nodes: int
+    max_exponent: int
+    max_digits: int
+    inline_digits: int
+
+    @classmethod
+    def from_settings(cls) -> "_Limits":
+        return cls(
+            settings.CALCULATOR_MAX_NODES,
+            settings.CALCULATOR_MAX_EXPONENT,
+            settings.CALCULATOR_MAX_DIGITS,
+            settings.CALCULATOR_INLINE_DIGITS,
+        )
+
+
+class _Heavy(Exception):
+    """The expression needs more digits than CALCULATOR_INLINE_DIGITS; run it in a worker."""
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse(expression: str) -> tuple[ast.Expression, int]:
+    """Parsed expression and its node count (cached; LLMs repeat the same formulas)."""
+    tree = ast.parse(expression, mode="eval")
+    return tree, sum(1 for _ in ast.walk(tree))
+
+
+def _digits(value: int) -> float:
+    """Upper bound on the decimal digits of an integer."""
+    return value.bit_length() * _LOG10_2 + 1
+
+
+def _check_digits(digits: float, limits: _Limits) -> None:
+    if digits > limits.max_digits:
+        raise ValueError(f"Result too large (about {digits:,.0f} digits, limit {limits.max_digits:,})")
+    if digits > limits.inline_digits:
+        raise _Heavy()
+
+
+def _check_binop(op: ast.operator, left: Number, right: Number, limits: _Limits) -> None:
+    """Estimate the size of an integer power or product before computing it."""
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return  # float arithmetic is constant time; overflow raises or gives inf
+    if isinstance(op, ast.Pow) and right > 0 and abs(left) > 1:
+        if right > limits.max_exponent:
+            raise ValueError(f"Exponent too large ({right:,}, limit {limits.max_exponent:,})")
+        _check_digits(right * math.log10(abs(left)) + 1, limits)
+    elif isinstance(op, ast.Mult):
+        _check_digits(_digits(left) + _digits(right), limits)
+
 
-def _safe_eval(node: ast.AST) -> float:
+def _safe_eval(node: ast.AST, limits: _Limits) -> Number:
     """Recursively evaluate an AST math expression safely."""
     if isinstance(node, ast.Expression):
-        return _safe_eval(node.body)
+        return _safe_eval(node.body, limits)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        if isinstance(node.value, int):
+            _check_digits(_digits(node.value), limits)
+            return int(node.value)  # True/False count as 1/0
+        return node.value
+    if isinstance(node, ast.UnaryOp):
+        op_func = _SAFE_OPERATORS.get(type(node.op))
+        if op_func is None:
+            raise ValueError(f"Unsupported unary operator: {type(node.op).__name__}")
+        return op_func(_safe_eval(node.operand, limits))
+    if isinstance(node, ast.BinOp):
+        op_func = _SAFE_OPERATORS.get(type(node.op))
+        if op_func is None:
+            raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+        left = _safe_eval(node.left, limits)
+        right = _safe_eval(node.right, limits)
+        _check_binop(node.op, left, right, limits)
+        try:
+            return op_func(left, right)
+        except OverflowError:
+            raise OverflowError("Result out of floating-point range") from None
+    raise ValueError(f"Unsupported expression type: {type(node).__name__}")
+
+
+def _format(result: Number) -> str:
+    if isinstance(result, complex):
+        raise ValueError("Result is a complex number")
+    if isinstance(result, float):
+        if not math.isfinite(result):
+            raise OverflowError("Result out of floating-point range")
+        if not result.is_integer():
+            return str(result)
+        result = int(result)
+    if _digits(result) <= _EXACT_DIGITS:
+        return str(result)
+    # Scientific notation from the leading bits, without converting the whole integer.
+    shift = max(result.bit_length() - 64, 0)
+    log = math.log10(abs(result) >> shift) + shift * _LOG10_2
+    exponent = int(log)
+    sign = "-" if result < 0 else ""
+    return f"{sign}{10 ** (log - exponent):.6f}e+{exponent}"
+
+
+def _evaluate(expression: str, limits: _Limits) -> str:
+    tree, nodes = _parse(expression)
+    if nodes > limits.max_nodes:
+        raise ValueError(f"Expression too complex ({nodes} nodes, limit {limits.max_nodes})")
+    return _format(_safe_eval(tree, limits))
+
+
+# ---------------- worker process ----------------
+
+_worker_slots = threading.BoundedSemaphore(max(settings.CALCULATOR_MAX_WORKERS, 1))
+_context = None
+
+
+def _mp_context():
+    """forkserver where available: workers fork from a small clean process, not the threaded server."""
+    global _context
+    if _context is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            _context = multiprocessing.get_context("forkserver")
+            _context.set_forkserver_preload([__name__])
+        else:
+            _context = multiprocessing.get_context("spawn")
+    return _context
+
+
+def start_worker_server() -> None:
+    """Start the fork server ahead of the first large expression (part of app warm-up).
+
+    The server imports this module in the background after it starts, so a
+    round trip through a worker is what waits for it to be ready.
+    """
+    _evaluate_in_worker("0", _Limits.from_settings(), max(settings.CALCULATOR_TIMEOUT, 30.0))
+
+
+def _worker_main(conn, expression: str, limits: _Limits) -> None:
+    try:
+        conn.send((True, _evaluate(expression, limits)))
+    except Exception as e:
+        conn.send((False, str(e) or type(e).__name__))
+    finally:
+        conn.close()
+
+
+def _evaluate_in_worker(expression: str, limits: _Limits, timeout: float) -> str:
+    """Evaluate in a separate process with no inline limit; kill it after timeout seconds."""
+    if not _worker_slots.acquire(timeout=timeout):
+        raise TimeoutError("Calculator is busy with other large expressions, try again later")
+    try:
+        ctx = _mp_context()
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(
+            target=_worker_main,
+            args=(sender, expression, limits._replace(inline_digits=limits.max_digits)),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(timeout):
+                raise TimeoutError(f"Evaluation took longer than {timeout:g}s and was stopped")
+            ok, value = receiver.recv()
+        except EOFError:
+            raise ValueError("Evaluation worker exited unexpectedly") from None
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+    finally:
+        _worker_slots.release()
+    if not ok:
+        raise ValueError(value)
+    return value
+
+
+# ---------------- batch mode ----------------
+
+
+def _vector_eval(node: ast.AST, columns: dict, np):
+    """Evaluate over float64 arrays; the same whitelist as _safe_eval plus variable names."""
+    if isinstance(node, ast.Expression):
+        return _vector_eval(node.body, columns, np)
     if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
-        return float(node.value)
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ValueError(f"Unknown variable: {node.id}")
+        return columns[node.id]
     if isinstance(node, ast.UnaryOp):
         op_func = _SAFE_OPERATORS.get(type(node.op))
         if op_func is None:
             raise ValueError(f"Unsupported unary operator: {type(node.op).__name__}")
-        return op_func(_safe_eval(node.operand))
+        return op_func(_vector_eval(node.operand, columns, np))
     if isinstance(node, ast.BinOp):
         op_func = _SAFE_OPERATORS.get(type(node.op))
         if op_func is None:
             raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
-        left = _safe_eval(node.left)
-        right = _safe_eval(node.right)
-        return op_func(left, right)
+        return op_func(_vector_eval(node.left, columns, np), _vector_eval(node.right, columns, np))
     raise ValueError(f"Unsupported expression type: {type(node).__name__}")
 
 
-@tool
-def calculator(expression: str) -> str:
+def _cell(value) -> str:
+    return value if isinstance(value, str) else f"{value:.10g}"
+
+
+def _evaluate_batch(expression: str, variables: dict, limits: _Limits) -> str:
+    """One vectorized pass over every row; returns the rows as a table.
+
+    Variables are number lists of equal length (or single numbers, used for
+    every row). Lists of strings are label columns: shown in the table, not
+    usable in the expression. Rows whose result is not a finite real number
+    (division by zero, overflow, fractional power of a negative) show n/a.
+    """
+    import numpy as np
+
+    tree, nodes = _parse(expression)
+    if nodes > limits.max_nodes:
+        raise ValueError(f"Expression too complex ({nodes} nodes, limit {limits.max_nodes})")
+    lengths = {len(v) for v in variables.values() if isinstance(v, (list, tuple))}
+    if len(lengths) > 1:
+        raise ValueError(f"Variable lists have different lengths: {sorted(lengths)}")
+    rows = lengths.pop() if lengths else 1
+    if rows > settings.CALCULATOR_MAX_ROWS:
+        raise ValueError(f"Too many rows ({rows}, limit {settings.CALCULATOR_MAX_ROWS})")
+
+    labels, columns = {}, {}
+    for name, values in variables.items():
+        if not name.isidentifier():
+            raise ValueError(f"Invalid variable name: {name!r}")
+        if isinstance(values, (list, tuple)) and not values:
+            raise ValueError(f"Variable {name} is an empty list")
+        if not isinstance(values, (list, tuple)):
+            values = [values] * rows
+        if values and all(isinstance(v, str) for v in values):
+            labels[name] = list(values)
+            continue
+        if not all(isinstance(v, (int, float)) for v in values):
+            raise TypeError(f"Variable {name} must be a list of numbers")
+        columns[name] = np.asarray(values, dtype=np.float64)
+    if any(isinstance(n, ast.Name) and n.id in labels for n in ast.walk(tree)):
+        raise TypeError(f"Label variables can't be used in the expression: {', '.join(labels)}")
+
+    with np.errstate(all="ignore"):
+        result = np.broadcast_to(_vector_eval(tree, columns, np), (rows,))
+    valid = np.isfinite(result)
+
+    names = list(labels) + list(columns)
+    lines = [" | ".join(names + ["结果"])]
+    for i in range(rows):
+        cells = [labels[n][i] for n in labels] + [columns[n][i] for n in columns]
+        cells.append(result[i] if valid[i] else "n/a")
+        lines.append(" | ".join(_cell(c) for c in cells))
+    if not valid.all():
+        lines.append("n/a: 除零、溢出或负数的非整数次幂")
+    return "\n".join(lines)
+
+
+@traced("tool", "calculator")
+def calculator(
+    expression: str, variables: Optional[dict[str, Union[float, list[Union[float, str]]]]] = None
+) -> str:
     """Evaluate a mathematical expression. Supports +, -, *, /, **, %, //.
 
+    To apply one formula to many values, pass the values as variables: the
+    expression is evaluated for every row in one call and a table is returned.
+
     Args:
-        expression: A mathematical expression to evaluate, e.g. "(123 + 456) * 2"
+        expression: A mathematical expression to evaluate, e.g. "(123 + 456) * 2",
+            or a formula over variable names, e.g. "(cur - prev) / prev * 100"
+        variables: Optional lists of values by name, one entry per row, e.g.
+            {"month": ["2024-11", "2024-12"], "cur": [2650000, 2850000], "prev": [2420000, 2650000]};
+            lists of strings are row labels, a single number applies to every row
     """
+    text = expression.strip()
+    path = "batch" if variables else "inline"
     try:
-        tree = ast.parse(expression.strip(), mode="eval")
-        result = _safe_eval(tree)
-        if result == int(result):
-            result = int(result)
+        if len(text) > settings.CALCULATOR_MAX_CHARS:
+            raise ValueError(f"Expression too long ({len(text)} characters, limit {settings.CALCULATOR_MAX_CHARS})")
+        limits = _Limits.from_settings()
+        if variables:
+            table = _evaluate_batch(text, variables, limits)
+            CALCULATOR_EVALUATIONS.inc(path=path)
+            return f"计算结果: {expression}\n{table}"
+        try:
+            result = _evaluate(text, limits)
+        except _Heavy:
+            path = "worker"
+            result = _evaluate_in_worker(text, limits, settings.CALCULATOR_TIMEOUT)
+        CALCULATOR_EVALUATIONS.inc(path=path)
         return f"计算结果: {expression} = {result}"
-    except (ValueError, SyntaxError, TypeError, ZeroDivisionError) as e:
+    except TimeoutError as e:
+        CALCULATOR_EVALUATIONS.inc(path="timeout")
+        return f"计算错误: {e}"
+    except (ValueError, SyntaxError, TypeError, ZeroDivisionError, OverflowError, RecursionError, MemoryError) as e:
+        CALCULATOR_EVALUATIONS.inc(path="rejected")
         return f"计算错误: {e}"
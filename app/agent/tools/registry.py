@@ -0,0 +1,166 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from app.concurrency.admission import embedding_slot
+from app.concurrency.single_flight import normalize_text
+from app.observability.metrics import Counter, Histogram
+from app.observability.tracing import span
+from app.search.aho_corasick import AhoCorasick
+
+logger = logging.getLogger("smartflow.tools")
+
+TOOL_SELECTIONS = Counter(
+    "smartflow_tool_selections_total",
+    "Tool subsets chosen for a query; method is 'keyword', 'embedding' or 'all' (no selection needed or possible).",
+    labelnames=("method",),
+)
+TOOLS_BOUND = Histogram(
+    "smartflow_tools_bound",
+    "Tools bound to each agent LLM call.",
+    labelnames=("agent",),
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64),
+)
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Registry entry for one tool: its line in the system prompt and how it is found.
+
+    ``keywords`` are case-insensitive substrings that always select the tool;
+    ``description`` is embedded together with the summary for similarity search.
+    """
+
+    name: str
+    summary: str
+    keywords: tuple[str, ...] = ()
+    description: str = ""
+
+
+class ToolRegistry:
+    """Chooses the tools worth binding for a piece of text.
+
+    Keyword triggers decide first: every tool with a keyword in the text is
+    selected. Without a keyword hit the text is embedded and the ``top_n``
+    tools closest to it (cosine similarity to each tool's embedded
+    description) are selected. Selections keep catalog order, so the same set
+    always yields the same prompt and bound model. When the catalog has at
+    most ``top_n`` tools (or ``top_n`` is 0) every tool is selected.
+    """
+
+    def __init__(
+        self,
+        specs: Sequence[ToolSpec],
+        top_n: int,
+        embeddings_factory: Optional[Callable[[], Any]] = None,
+        max_cached_queries: int = 1024,
+    ):
+        self.specs = list(specs)
+        self.names = tuple(s.name for s in self.specs)
+        self.top_n = top_n
+        self._by_name = {s.name: s for s in self.specs}
+        self._order = {name: i for i, name in enumerate(self.names)}
+        self._keywords = AhoCorasick((kw.lower(), s.name) for s in self.specs for kw in s.keywords)
+        self._embeddings_factory = embeddings_factory
+        self._embeddings = None
+        self._matrix = None  # normalized tool embeddings, one row per spec
+        self._lock = threading.Lock()
+        # Query text -> selected names, so repeated steps skip the embedding call.
+        self._selected: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self._max_cached = max_cached_queries
+
+    def prompt_lines(self, names: Sequence[str]) -> str:
+        """The "- name: summary" lines listing these tools in a system prompt."""
+        return "\n".join(f"- {name}: {self._by_name[name].summary}" for name in names)
+
+    def select(self, text: str) -> tuple[str, ...]:
+        """Names of the tools to bind for text, in catalog order."""
+        if self.top_n <= 0 or len(self.names) <= self.top_n:
+            TOOL_SELECTIONS.inc(method="all")
+            return self.names
+        hits = {m.value for m in self._keywords.iter_matches(text.lower())}
+        if hits:
+            TOOL_SELECTIONS.inc(method="keyword")
+            return tuple(sorted(hits, key=self._order.__getitem__))
+        if self._embeddings_factory is None:
+            TOOL_SELECTIONS.inc(method="all")
+            return self.names
+
+        key = normalize_text(text)
+        with self._lock:
+            selected = self._selected.get(key)
+            if selected is not None:
+                self._selected.move_to_end(key)
+        if selected is None:
+            try:
+                selected = self._nearest(text)
+            except Exception:
+                logger.warning("Tool selection by embedding failed; binding all tools", exc_info=True)
+                TOOL_SELECTIONS.inc(method="all")
+                return self.names
+            with self._lock:
+                self._selected[key] = selected
+                while len(self._selected) > self._max_cached:
+                    self._selected.popitem(last=False)
+        TOOL_SELECTIONS.inc(method="embedding")
+        return selected
+
+    def _nearest(self, text: str) -> tuple[str, ...]:
+        import numpy as np
+
+        matrix = self._matrix
+        if matrix is None:
+            # Built outside the lock: concurrent first queries may each embed
+            # the catalog, but none waits on another's embedding call.
+            embeddings = self._embeddings_factory()
+            docs = [
+                " ".join(filter(None, (s.name, s.summary, s.description, " ".join(s.keywords))))
+                for s in self.specs
+            ]
+            with embedding_slot(), span("embedding", "tools", count=len(docs)):
+                vectors = np.asarray(embeddings.embed_documents(docs), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            matrix = vectors / np.maximum(norms, 1e-12)
+            with self._lock:
+                if self._matrix is None:
+                    self._embeddings, self._matrix = embeddings, matrix
+                matrix = self._matrix
+        with embedding_slot(), span("embedding", "tool_query"):
+            query = np.asarray(self._embeddings.embed_query(text), dtype=np.float32)
+        scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        top = np.argpartition(-scores, self.top_n - 1)[: self.top_n]
+        return tuple(self.names[i] for i in sorted(top))
+
+
+class BoundModels:
+    """``bind_tools()`` variants of one chat model, built once per tool set.
+
+    Binding converts every tool to its JSON schema, so each distinct set is
+    bound on first use and kept (LRU, ``max_entries`` sets).
+    """
+
+    def __init__(self, model, tools: Sequence, agent: str, max_entries: int = 64, **bind_kwargs):
+        self._model = model
+        self._tools = {t.name: t for t in tools}
+        self._agent = agent
+        self._bind_kwargs = bind_kwargs
+        self._max_entries = max_entries
+        self._bound: OrderedDict[tuple[str, ...], Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, names: Sequence[str]):
+        key = tuple(names)
+        TOOLS_BOUND.observe(len(key), agent=self._agent)
+        with self._lock:
+            bound = self._bound.get(key)
+            if bound is not None:
+                self._bound.move_to_end(key)
+                return bound
+        bound = self._model.bind_tools([self._tools[n] for n in key], **self._bind_kwargs)
+        with self._lock:
+            self._bound[key] = bound
+            while len(self._bound) > self._max_entries:
+                self._bound.popitem(last=False)
+        return bound
@@ -1,41 +1,70 @@
-from langchain_core.tools import tool
-
-_WEATHER_DATA = {
-    "北京": {"temperature": 5, "condition": "晴", "humidity": 30, "wind": "北风3级",
-             "suggestion": "天气寒冷干燥，建议穿羽绒服、围巾和手套，注意保暖防风。"},
-    "上海": {"temperature": 12, "condition": "多云", "humidity": 65, "wind": "东南风2级",
-             "suggestion": "气温适中偏凉，建议穿薄外套或风衣，可搭配毛衣。"},
-    "广州": {"temperature": 22, "condition": "阴", "humidity": 80, "wind": "南风2级",
-             "suggestion": "温暖湿润，穿长袖衬衫或薄外套即可，建议随身带伞。"},
-    "深圳": {"temperature": 23, "condition": "多云转晴", "humidity": 75, "wind": "东南风3级",
-             "suggestion": "天气温暖，穿T恤或薄长袖即可，户外注意防晒。"},
-    "成都": {"temperature": 14, "condition": "阴天", "humidity": 70, "wind": "微风",
-             "suggestion": "阴冷潮湿，建议穿厚外套或夹克，注意保暖。"},
-    "杭州": {"temperature": 10, "condition": "小雨", "humidity": 85, "wind": "东风2级",
-             "suggestion": "有小雨，建议穿防水外套，随身带雨伞。穿毛衣搭配风衣为佳。"},
-    "武汉": {"temperature": 8, "condition": "晴转多云", "humidity": 50, "wind": "北风2级",
-             "suggestion": "早晚温差大，建议穿大衣或厚外套，中午可适当减衣。"},
-    "西安": {"temperature": 3, "condition": "晴", "humidity": 25, "wind": "西北风3级",
-             "suggestion": "天气寒冷，建议穿棉衣或羽绒服，戴帽子和手套。"},
-}
-
-
-@tool
+import json
+import logging
+import unicodedata
+
+from app.config import settings
+from app.observability.tracing import traced
+from app.search.aho_corasick import AhoCorasick
+
+logger = logging.getLogger("smartflow.tools")
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).strip().lower()
+
+
+def _load_cities(path: str) -> tuple[dict[str, dict], AhoCorasick]:
+    """Weather per city and a matcher from every name, alias and district to (city, district).
+
+    City names are added first, then aliases, then districts, so a name that
+    is both a city and another city's district alias resolves to the city.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            cities = {c["name"]: c for c in json.load(f)["cities"]}
+    except FileNotFoundError:
+        logger.warning("Weather data %s not found, weather_query has no cities", path)
+        cities = {}
+
+    patterns = [(name, (name, "")) for name in cities]
+    for name, city in cities.items():
+        patterns.extend((alias, (name, "")) for alias in city.get("aliases", []))
+    for name, city in cities.items():
+        for district, aliases in city.get("districts", {}).items():
+            patterns.extend((n, (name, district)) for n in [district, *aliases])
+    return cities, AhoCorasick((_normalize(p), value) for p, value in patterns)
+
+
+# Compiled once at import; a lookup is one pass over the query whatever the city count.
+_WEATHER_DATA, _CITY_MATCHER = _load_cities(settings.WEATHER_DATA_PATH)
+
+
+@traced("tool", "weather_query")
 def weather_query(city: str) -> str:
     """Query the weather information for a Chinese city.
 
     Args:
         city: The name of the city in Chinese, e.g. "北京"
     """
-    for city_name, data in _WEATHER_DATA.items():
-        if city_name in city:
-            return (
-                f"🌤 {city_name}天气信息:\n"
-                f"  温度: {data['temperature']}°C\n"
-                f"  天气: {data['condition']}\n"
-                f"  湿度: {data['humidity']}%\n"
-                f"  风力: {data['wind']}\n"
-                f"  穿衣建议: {data['suggestion']}"
-            )
-
-    return f"抱歉，暂无 {city} 的天气数据。目前支持查询的城市有：{', '.join(_WEATHER_DATA.keys())}"
+    # The longest name found wins ("朝阳区" over "朝阳", "西安市" over "西安"); on a
+    # tie a district beats a city ("上海浦东"), then the leftmost match.
+    match = max(
+        _CITY_MATCHER.iter_matches(_normalize(city)),
+        key=lambda m: (m.end - m.start, bool(m.value[1]), -m.start),
+        default=None,
+    )
+    if match is None:
+        names = list(_WEATHER_DATA)
+        supported = ", ".join(names[:20]) + (f" 等 {len(names)} 个城市" if len(names) > 20 else "")
+        return f"抱歉，暂无 {city} 的天气数据。目前支持查询的城市有：{supported}"
+
+    city_name, district = match.value
+    data = _WEATHER_DATA[city_name]
+    return (
+        f"🌤 {city_name}{district}天气信息:\n"
+        f"  温度: {data['temperature']}°C\n"
+        f"  天气: {data['condition']}\n"
+        f"  湿度: {data['humidity']}%\n"
+        f"  风力: {data['wind']}\n"
+        f"  穿衣建议: {data['suggestion']}"
+    )
@@ -0,0 +1,228 @@
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from app.config import settings
+from app.observability.metrics import Counter, Gauge, Histogram
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "smartflow_llm_admission_in_flight",
+    "Provider calls currently holding an admission slot.",
+    labelnames=("provider",),
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "smartflow_llm_admission_queue_depth",
+    "Provider calls waiting for an admission slot.",
+    labelnames=("provider",),
+)
+ADMISSION_WAIT = Histogram(
+    "smartflow_llm_admission_wait_seconds",
+    "Time spent waiting for an admission slot before a provider call.",
+    labelnames=("provider", "priority"),
+)
+ADMISSION_REJECTED = Counter(
+    "smartflow_llm_admission_rejected_total",
+    "Provider calls shed by admission control; reason is 'queue_full' or 'timeout'.",
+    labelnames=("provider", "reason"),
+)
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a provider call is shed because the provider is saturated."""
+
+    def __init__(self, provider: str, reason: str, retry_after: int):
+        super().__init__(f"{provider} is overloaded ({reason}), retry after {retry_after}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority(level: int):
+    """Run provider calls made inside this block (and threads it spawns) at the given priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded priority wait queue for one provider.
+
+    At most ``max_concurrency`` calls run at once. Further callers wait in a
+    queue ordered by priority, then arrival; when ``max_queue`` callers are
+    already waiting a new caller is rejected immediately. Background callers
+    may only fill half of the queue (at least one place) so interactive
+    traffic keeps room.
+    ``max_concurrency <= 0`` disables limiting.
+    """
+
+    def __init__(self, provider: str, max_concurrency: int, max_queue: int, timeout: float):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: list[tuple[int, int, threading.Event]] = []
+        self._seq = itertools.count()
+        # Moving average of slot hold time, used to estimate Retry-After.
+        self._avg_hold = 1.0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._avg_hold / max(self.max_concurrency, 1)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(provider=self.provider, reason=reason)
+        return AdmissionRejected(self.provider, reason, self._retry_after())
+
+    def _acquire(self, level: int) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._waiters:
+                self._in_flight += 1
+                ADMISSION_IN_FLIGHT.set(self._in_flight, provider=self.provider)
+                ADMISSION_WAIT.observe(0.0, provider=self.provider, priority=_PRIORITY_NAMES[level])
+                return
+            limit = self.max_queue
+            if level != INTERACTIVE and limit > 0:
+                # At least one place, or a queue of one would always shed background work.
+                limit = max(1, limit // 2)
+            if len(self._waiters) >= limit:
+                raise self._reject("queue_full")
+            entry = (level, next(self._seq), threading.Event())
+            heapq.heappush(self._waiters, entry)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters), provider=self.provider)
+
+        granted = entry[2].wait(self.timeout)
+        with self._lock:
+            if not granted and not entry[2].is_set():
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters), provider=self.provider)
+                raise self._reject("timeout")
+        # The releasing thread already transferred its slot to us.
+        ADMISSION_WAIT.observe(time.perf_counter() - start, provider=self.provider, priority=_PRIORITY_NAMES[level])
+
+    def _release(self, held: float) -> None:
+        with self._lock:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            if self._waiters:
+                # Hand the slot straight to the best waiter; in_flight is unchanged.
+                _, _, event = heapq.heappop(self._waiters)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters), provider=self.provider)
+                event.set()
+            else:
+                self._in_flight -= 1
+                ADMISSION_IN_FLIGHT.set(self._in_flight, provider=self.provider)
+
+    @contextmanager
+    def slot(self, level: Optional[int] = None):
+        if self.max_concurrency <= 0:
+            yield
+            return
+        with self.take_slot(level):
+            yield
+
+    def take_slot(self, level: Optional[int] = None):
+        """Wait for a slot now; returns a context manager that releases it on exit.
+
+        The slot can be handed to the thread that makes the call, so it stays
+        held while the call runs even after the caller stops waiting for it.
+        """
+        if self.max_concurrency <= 0:
+            return nullcontext()
+        self._acquire(_priority.get() if level is None else level)
+        return self._held()
+
+    def try_slot(self):
+        """A slot taken only if one is free right now (nobody queued), else None.
+
+        Returns a context manager that releases the slot on exit, possibly in
+        another thread; for optional calls that should not queue, like hedges.
+        """
+        if self.max_concurrency <= 0:
+            return nullcontext()
+        with self._lock:
+            if self._in_flight >= self.max_concurrency or self._waiters:
+                return None
+            self._in_flight += 1
+            ADMISSION_IN_FLIGHT.set(self._in_flight, provider=self.provider)
+        return self._held()
+
+    @contextmanager
+    def _held(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - start)
+
+
+_controllers: dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(provider: str) -> AdmissionController:
+    """Return the shared controller for a provider, configured from Settings.
+
+    Limits are read from ``<PROVIDER>_MAX_CONCURRENCY`` / ``<PROVIDER>_MAX_QUEUE``;
+    providers without such settings (e.g. the in-process local embedder) are
+    not limited.
+    """
+    with _controllers_lock:
+        controller = _controllers.get(provider)
+        if controller is None:
+            prefix = provider.upper()
+            controller = AdmissionController(
+                provider,
+                max_concurrency=getattr(settings, f"{prefix}_MAX_CONCURRENCY", 0),
+                max_queue=getattr(settings, f"{prefix}_MAX_QUEUE", 0),
+                timeout=settings.LLM_ADMISSION_TIMEOUT,
+            )
+            _controllers[provider] = controller
+        return controller
+
+
+def llm_slot(provider: Optional[str] = None, level: Optional[int] = None):
+    """Hold an admission slot for one chat-model call (or embedding call, given its provider).
+
+    With LLM_RESILIENCE_ENABLED, chat models admit each provider call
+    themselves (primary, hedge and fallback alike; see ResilientChatModel), so
+    a chat-model slot here is a no-op.
+    """
+    if not settings.LLM_ADMISSION_ENABLED or (provider is None and settings.LLM_RESILIENCE_ENABLED):
+        return nullcontext()
+    return get_controller(provider or settings.LLM_PROVIDER).slot(level)
+
+
+def take_llm_slot(provider: Optional[str] = None, level: Optional[int] = None):
+    """Wait for a provider slot and return it held (see AdmissionController.take_slot)."""
+    if not settings.LLM_ADMISSION_ENABLED:
+        return nullcontext()
+    return get_controller(provider or settings.LLM_PROVIDER).take_slot(level)
+
+
+def try_llm_slot(provider: Optional[str] = None):
+    """A provider slot if one is free without queueing, else None (see AdmissionController.try_slot)."""
+    if not settings.LLM_ADMISSION_ENABLED:
+        return nullcontext()
+    return get_controller(provider or settings.LLM_PROVIDER).try_slot()
+
+
+def embedding_slot(level: Optional[int] = None):
+    """Hold an admission slot for one call to the configured embedding provider."""
+    return llm_slot(settings.EMBEDDING_PROVIDER or settings.LLM_PROVIDER, level)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from app.observability.metrics import Gauge, Histogram
+
+SESSION_LOCKS = Gauge(
+    "smartflow_session_locks",
+    "Sessions with a turn currently running or waiting.",
+)
+SESSION_LOCK_WAIT = Histogram(
+    "smartflow_session_lock_wait_seconds",
+    "Time a chat turn waited for earlier turns of the same session.",
+)
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class SessionLocks:
+    """Per-session FIFO locks for the event loop.
+
+    Turns of one session run one at a time in arrival order (asyncio.Lock
+    wakes waiters first-come first-served), while different sessions never
+    contend. An entry is dropped as soon as no turn holds or waits on it, so
+    idle sessions don't leak locks.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = _Entry()
+            SESSION_LOCKS.set(len(self._entries))
+        entry.users += 1
+        start = time.perf_counter()
+        try:
+            async with entry.lock:
+                SESSION_LOCK_WAIT.observe(time.perf_counter() - start)
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[session_id]
+                SESSION_LOCKS.set(len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
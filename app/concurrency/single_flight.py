@@ -0,0 +1,77 @@
+import threading
+import unicodedata
+from typing import Callable, Hashable, TypeVar
+
+from app.config import settings
+from app.observability.metrics import Counter
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "smartflow_single_flight_calls_total",
+    "Calls through a single-flight group; outcome is 'leader' (executed) or 'coalesced' (shared an in-flight result).",
+    labelnames=("group", "outcome"),
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a query for use in a coalescing key (NFKC, collapsed whitespace)."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls so only one of them executes.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is in flight block until it finishes and
+    receive the same result object (or exception). Nothing is cached once the
+    call completes. Shared results must be treated as read-only.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args, **kwargs) -> tuple[T, bool]:
+        """Run fn(*args, **kwargs) once per in-flight key. Returns (result, shared)."""
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn(*args, **kwargs), False
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(group=self.group, outcome="coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        SINGLE_FLIGHT_CALLS.inc(group=self.group, outcome="leader")
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -1,8 +1,10 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    # LLM Provider: "openai" or "ollama"
+    # LLM Provider: "openai", "ollama" or "fake" (offline, deterministic)
     LLM_PROVIDER: str = "openai"
 
     # OpenAI
@@ -16,15 +18,175 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "llama3.1"
     OLLAMA_EMBEDDING_MODEL: str = "nomic-embed-text"
 
+    # Embeddings: "openai", "ollama", "local" (in-process CPU) or "fake";
+    # empty follows LLM_PROVIDER
+    EMBEDDING_PROVIDER: str = ""
+    LOCAL_EMBEDDING_DIM: int = 384
+    LOCAL_EMBEDDING_NGRAM_MAX: int = 3
+    LOCAL_EMBEDDING_IDF_PATH: str = ""  # optional .npy IDF table from LocalEmbeddings.fit_idf
+    LOCAL_EMBEDDING_THREADS: int = 4
+
+    # Fake provider (benchmarks / offline runs)
+    FAKE_LLM_LATENCY_MS: float = 0.0
+    FAKE_LLM_JITTER_MS: float = 0.0
+    FAKE_LLM_SCRIPT: str = ""  # optional JSON file with a list of scripted responses, replayed in call order across all roles
+    FAKE_LLM_TOKEN_LATENCY_MS: float = 0.0  # simulated decode time per completion token
+    FAKE_LLM_MODEL_LATENCY_MS: str = ""  # per-model base latency, e.g. "fake=150,fake-mini=25"
+    FAKE_LLM_REPEAT_RATE: float = 0.0  # chance of re-issuing the previous tool calls instead of answering
+    FAKE_EMBEDDING_DIM: int = 256
+    FAKE_EMBEDDING_LATENCY_MS: float = 0.0
+
     # LLM parameters
     LLM_TEMPERATURE: float = 0.7
     LLM_MAX_TOKENS: int = 4096
+    LLM_PROMPT_PRICE_PER_1K: float = 0.0  # used for cost accounting only
+    LLM_COMPLETION_PRICE_PER_1K: float = 0.0
+    USAGE_MAX_SESSIONS: int = 10000  # sessions kept in /api/usage/sessions, least recently used dropped first
+
+    # Per-role model routing: LLM_<ROLE>_MODEL / _MAX_TOKENS / _TEMPERATURE override
+    # the provider model, LLM_MAX_TOKENS and LLM_TEMPERATURE for one agent role
+    # (CLASSIFIER, PLANNER, EXECUTOR, SUMMARIZER, REACT); unset inherits.
+    # LLM_<ROLE>_PROMPT_PRICE_PER_1K / _COMPLETION_PRICE_PER_1K price that role's
+    # model for cost accounting, defaulting to the global prices.
+    LLM_CLASSIFIER_MODEL: Optional[str] = None
+    LLM_CLASSIFIER_MAX_TOKENS: Optional[int] = 5  # the answer is a single label
+    LLM_CLASSIFIER_TEMPERATURE: Optional[float] = 0.0
+    LLM_CLASSIFIER_PROMPT_PRICE_PER_1K: Optional[float] = None
+    LLM_CLASSIFIER_COMPLETION_PRICE_PER_1K: Optional[float] = None
+    LLM_PLANNER_MODEL: Optional[str] = None
+    LLM_PLANNER_MAX_TOKENS: Optional[int] = 1024
+    LLM_PLANNER_TEMPERATURE: Optional[float] = None
+    LLM_PLANNER_PROMPT_PRICE_PER_1K: Optional[float] = None
+    LLM_PLANNER_COMPLETION_PRICE_PER_1K: Optional[float] = None
+    LLM_EXECUTOR_MODEL: Optional[str] = None
+    LLM_EXECUTOR_MAX_TOKENS: Optional[int] = None
+    LLM_EXECUTOR_TEMPERATURE: Optional[float] = None
+    LLM_EXECUTOR_PROMPT_PRICE_PER_1K: Optional[float] = None
+    LLM_EXECUTOR_COMPLETION_PRICE_PER_1K: Optional[float] = None
+    LLM_SUMMARIZER_MODEL: Optional[str] = None
+    LLM_SUMMARIZER_MAX_TOKENS: Optional[int] = None
+    LLM_SUMMARIZER_TEMPERATURE: Optional[float] = None
+    LLM_SUMMARIZER_PROMPT_PRICE_PER_1K: Optional[float] = None
+    LLM_SUMMARIZER_COMPLETION_PRICE_PER_1K: Optional[float] = None
+    LLM_REACT_MODEL: Optional[str] = None
+    LLM_REACT_MAX_TOKENS: Optional[int] = None
+    LLM_REACT_TEMPERATURE: Optional[float] = None
+    LLM_REACT_PROMPT_PRICE_PER_1K: Optional[float] = None
+    LLM_REACT_COMPLETION_PRICE_PER_1K: Optional[float] = None
+
+    # LLM resilience: per-role deadlines (LLM_<ROLE>_TIMEOUT overrides LLM_TIMEOUT),
+    # hedged duplicate requests after the observed p95, and circuit-breaker
+    # failover to LLM_FALLBACK_PROVIDER ("ollama" / "openai", empty disables)
+    LLM_RESILIENCE_ENABLED: bool = True
+    LLM_TIMEOUT: float = 60.0
+    LLM_CLASSIFIER_TIMEOUT: float = 10.0
+    LLM_PLANNER_TIMEOUT: float = 30.0
+    LLM_EXECUTOR_TIMEOUT: float = 60.0
+    LLM_SUMMARIZER_TIMEOUT: float = 60.0
+    LLM_REACT_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 1  # client-level retries inside each deadline
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # latencies observed per role before hedging starts
+    LLM_FALLBACK_PROVIDER: str = ""
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
 
     # ChromaDB
     CHROMA_PERSIST_DIR: str = "./data/chroma_db"
 
+    # Business database (SQLite) behind database_query; built from the CSV/JSON
+    # fixtures in SALES_DB_FIXTURES_DIR when SALES_DB_PATH does not exist yet
+    SALES_DB_PATH: str = "./data/sales.db"
+    SALES_DB_FIXTURES_DIR: str = "./data/db"
+
+    # City list with aliases, districts and (mock) weather behind weather_query;
+    # names are matched with a multi-pattern automaton compiled at import
+    WEATHER_DATA_PATH: str = "./data/weather/cities.json"
+
+    # Local full-text search behind web_search: BM25 index over the documents in
+    # SEARCH_DOCS_DIR (*.jsonl / *.txt / *.md), rebuilt into SEARCH_INDEX_DIR
+    # whenever the corpus changes and memory-mapped from there. Posting lists are
+    # impact-ordered; SEARCH_MAX_POSTINGS caps how many are read per query term
+    # (0 reads all), which bounds latency for very common terms on large corpora
+    SEARCH_DOCS_DIR: str = "./data/search_docs"
+    SEARCH_INDEX_DIR: str = "./data/search_index"
+    SEARCH_TOP_K: int = 3
+    SEARCH_MAX_POSTINGS: int = 10000
+
+    # Plan-Execute
+    PLAN_STEP_TOKEN_BUDGET: int = 2000  # max estimated prompt tokens per executor call
+    PLAN_STEP_DIGEST_TOKENS: int = 100  # previous step results are cut to this size
+
+    # Tool calls: identical (tool, args) calls within one request are answered from
+    # a per-request memo; a ReAct round that only repeats answered calls counts as
+    # a loop, and more than REACT_LOOP_TOLERANCE such rounds force a final answer.
+    TOOL_MEMO_ENABLED: bool = True
+    REACT_LOOP_TOLERANCE: int = 0
+    # Cross-request result cache for pure tools: results are fresh for the tool's
+    # TTL (seconds, 0 disables caching that tool), then served for up to
+    # TOOL_CACHE_STALE_SECONDS more while being refreshed in the background.
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_WEB_SEARCH_TTL: float = 3600.0
+    TOOL_CACHE_WEATHER_QUERY_TTL: float = 600.0
+    TOOL_CACHE_DATABASE_QUERY_TTL: float = 60.0
+    TOOL_CACHE_STALE_SECONDS: float = 300.0
+    # Calculator bounds: expressions over the char/node limits are rejected before
+    # evaluation; integer powers and products are size-checked before computing.
+    # Results needing more than CALCULATOR_INLINE_DIGITS digits are evaluated in a
+    # separate process that is killed after CALCULATOR_TIMEOUT seconds.
+    CALCULATOR_MAX_CHARS: int = 500
+    CALCULATOR_MAX_NODES: int = 200
+    CALCULATOR_MAX_EXPONENT: int = 10000
+    CALCULATOR_MAX_DIGITS: int = 10000
+    CALCULATOR_INLINE_DIGITS: int = 1000
+    CALCULATOR_TIMEOUT: float = 2.0
+    CALCULATOR_MAX_WORKERS: int = 2  # concurrent worker processes
+    CALCULATOR_MAX_ROWS: int = 1000  # rows per batch (variables) evaluation
+    # Bind only the tools relevant to each query: keyword triggers first, then the
+    # TOOL_SELECTION_TOP_N tools closest by embedding (TOOL_SELECTION_EMBEDDINGS).
+    # Catalogs of at most TOOL_SELECTION_TOP_N tools are always bound whole.
+    TOOL_SELECTION_ENABLED: bool = True
+    TOOL_SELECTION_TOP_N: int = 3
+    TOOL_SELECTION_EMBEDDINGS: bool = True
+
+    # RAG
+    RAG_FETCH_K: int = 8  # candidate chunks fetched before packing
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1500
+    RAG_DEDUP_THRESHOLD: float = 0.8  # shingle Jaccard similarity treated as duplicate
+
     # Memory
     SHORT_TERM_MAX_MESSAGES: int = 20
+    LONG_TERM_MAX_AGE_DAYS: int = 90  # 0 disables time-based retention
+    LONG_TERM_MAX_PER_SESSION: int = 500  # 0 disables size-based retention
+    LONG_TERM_DEDUP_THRESHOLD: float = 0.95  # cosine similarity to treat as duplicate
+    LONG_TERM_MAINTENANCE_INTERVAL: int = 3600  # seconds, 0 disables the background job
+
+    # Concurrency
+    SINGLE_FLIGHT_ENABLED: bool = True  # coalesce identical in-flight stateless chats, query embeddings and searches
+    # Admission control per provider: <PROVIDER>_MAX_CONCURRENCY calls run at once,
+    # up to <PROVIDER>_MAX_QUEUE wait; beyond that calls are shed (429/503 + Retry-After).
+    # A concurrency of 0 disables limiting for that provider.
+    LLM_ADMISSION_ENABLED: bool = True
+    LLM_ADMISSION_TIMEOUT: float = 30.0  # max seconds a call waits in the queue
+    OPENAI_MAX_CONCURRENCY: int = 16
+    OPENAI_MAX_QUEUE: int = 64
+    OLLAMA_MAX_CONCURRENCY: int = 2
+    OLLAMA_MAX_QUEUE: int = 16
+    FAKE_MAX_CONCURRENCY: int = 0
+    FAKE_MAX_QUEUE: int = 0
+    BATCH_CHAT_CONCURRENCY: int = 8  # default parallelism of /api/chat/batch
+    BATCH_CHAT_MAX_REQUESTS: int = 10000
+
+    # Observability
+    TRACING_ENABLED: bool = True
+    OTEL_ENABLED: bool = False
+    OTEL_EXPORTER_ENDPOINT: str = ""  # OTLP gRPC endpoint, e.g. http://localhost:4317
+
+    # Startup warm-up
+    WARMUP_ENABLED: bool = False
+    WARMUP_COLLECTIONS: str = "*"  # comma-separated collection names, "*" for all
+    WARMUP_PRIME_LLM: bool = False  # send one tiny completion to open the LLM connection pool
 
     # API
     API_HOST: str = "0.0.0.0"
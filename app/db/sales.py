@@ -0,0 +1,287 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger("smartflow.db")
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id   TEXT PRIMARY KEY,
+    order_date TEXT NOT NULL,
+    month      TEXT NOT NULL,
+    product    TEXT NOT NULL,
+    amount     REAL NOT NULL,
+    status     TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_orders_month ON orders (month);
+
+-- Materialized aggregates, maintained by the trigger below on every insert.
+CREATE TABLE IF NOT EXISTS monthly_sales (
+    month  TEXT PRIMARY KEY,
+    total  REAL NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS monthly_product_sales (
+    month   TEXT NOT NULL,
+    product TEXT NOT NULL,
+    total   REAL NOT NULL DEFAULT 0,
+    orders  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, product)
+);
+CREATE INDEX IF NOT EXISTS idx_monthly_product_rank ON monthly_product_sales (month, total DESC);
+CREATE TABLE IF NOT EXISTS annual_sales (
+    year   TEXT PRIMARY KEY,
+    total  REAL NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS orders_aggregate AFTER INSERT ON orders
+BEGIN
+    INSERT INTO monthly_sales (month, total, orders) VALUES (NEW.month, NEW.amount, 1)
+        ON CONFLICT (month) DO UPDATE SET total = total + excluded.total, orders = orders + 1;
+    INSERT INTO monthly_product_sales (month, product, total, orders) VALUES (NEW.month, NEW.product, NEW.amount, 1)
+        ON CONFLICT (month, product) DO UPDATE SET total = total + excluded.total, orders = orders + 1;
+    INSERT INTO annual_sales (year, total, orders) VALUES (substr(NEW.month, 1, 4), NEW.amount, 1)
+        ON CONFLICT (year) DO UPDATE SET total = total + excluded.total, orders = orders + 1;
+END;
+"""
+
+# Statements are parameterized constants so each connection's statement cache
+# compiles them once and reuses the prepared form.
+INSERT_ORDER = """
+INSERT INTO orders (order_id, order_date, month, product, amount, status)
+VALUES (upper(trim(?1)), ?2, substr(?2, 1, 7), ?3, ?4, ?5)
+"""
+SELECT_ORDER = "SELECT order_id, order_date, product, amount, status FROM orders WHERE order_id = ?"
+SELECT_MONTH = "SELECT total, orders FROM monthly_sales WHERE month = ?"
+SELECT_TOP_PRODUCT = "SELECT product FROM monthly_product_sales WHERE month = ? ORDER BY total DESC LIMIT 1"
+SELECT_MONTHS = "SELECT month FROM monthly_sales ORDER BY month"
+SELECT_YEAR = "SELECT total, orders FROM annual_sales WHERE year = ?"
+SELECT_LATEST_YEAR = "SELECT max(year) FROM annual_sales"
+SELECT_BEST_MONTH = """
+SELECT month, total, (SELECT count(*) FROM monthly_sales WHERE month BETWEEN ?1 || '-01' AND ?1 || '-12')
+FROM monthly_sales WHERE month BETWEEN ?1 || '-01' AND ?1 || '-12'
+ORDER BY total DESC LIMIT 1
+"""
+# Pre-aggregated history (months before order-level data) is added to the same tables.
+ADD_MONTHLY = """
+INSERT INTO monthly_sales (month, total, orders) VALUES (?1, ?2, ?3)
+    ON CONFLICT (month) DO UPDATE SET total = total + excluded.total, orders = orders + excluded.orders
+"""
+ADD_MONTHLY_PRODUCT = """
+INSERT INTO monthly_product_sales (month, product, total, orders) VALUES (?1, ?2, ?3, ?4)
+    ON CONFLICT (month, product) DO UPDATE SET total = total + excluded.total, orders = orders + excluded.orders
+"""
+ADD_ANNUAL = """
+INSERT INTO annual_sales (year, total, orders) VALUES (substr(?1, 1, 4), ?2, ?3)
+    ON CONFLICT (year) DO UPDATE SET total = total + excluded.total, orders = orders + excluded.orders
+"""
+
+_ORDER_FIELDS = ("order_id", "order_date", "product", "amount", "status")
+
+
+def _order_row(record: dict) -> tuple:
+    return (
+        str(record["order_id"]),
+        str(record["order_date"]),
+        str(record["product"]),
+        float(record["amount"]),
+        str(record.get("status") or ""),
+    )
+
+
+class SalesDatabase:
+    """Embedded SQLite store of orders with materialized monthly/annual aggregates.
+
+    Reads go through one read-only connection per thread (query_only, so they
+    never take the write lock and run in parallel under WAL); writes share a
+    single writer connection. An AFTER INSERT trigger keeps the aggregate
+    tables current, so monthly and annual lookups are primary-key reads no
+    matter how many orders are stored.
+    """
+
+    def __init__(self, path: str, fixtures_dir: Optional[str] = None):
+        self.path = path
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()  # guards the connection list
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        fresh = not os.path.exists(path)
+        self._writer_conn().executescript(SCHEMA)
+        if fresh and fixtures_dir:
+            try:
+                self.load_fixtures(fixtures_dir)
+            except Exception:
+                # Don't leave a half-loaded file that would be reused next time.
+                self.close()
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                raise
+
+    # ---------------- connections ----------------
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, cached_statements=64, check_same_thread=False
+            )
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(self.path, cached_statements=64, check_same_thread=False)
+            conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect(read_only=False)
+        return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect(read_only=True)
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._writer = None
+        self._local = threading.local()
+
+    # ---------------- loading / writes ----------------
+
+    def insert_orders(self, records: Iterable[dict], batch_size: int = 10000) -> int:
+        """Insert orders; aggregates are updated incrementally by the insert trigger."""
+        count = 0
+        batch = []
+        with self._write_lock:
+            conn = self._writer_conn()
+            for record in records:
+                batch.append(_order_row(record))
+                if len(batch) >= batch_size:
+                    with conn:
+                        conn.executemany(INSERT_ORDER, batch)
+                    count += len(batch)
+                    batch.clear()
+            if batch:
+                with conn:
+                    conn.executemany(INSERT_ORDER, batch)
+                count += len(batch)
+        return count
+
+    def add_monthly_history(self, records: Iterable[dict]) -> int:
+        """Add pre-aggregated per-month, per-product sales (history without order rows)."""
+        rows = [(r["month"], r["product"], float(r["total"]), int(r["orders"])) for r in records]
+        totals = [(month, total, orders) for month, _, total, orders in rows]
+        with self._write_lock:
+            conn = self._writer_conn()
+            with conn:
+                conn.executemany(ADD_MONTHLY, totals)
+                conn.executemany(ADD_MONTHLY_PRODUCT, rows)
+                conn.executemany(ADD_ANNUAL, totals)
+        return len(rows)
+
+    def load_fixtures(self, directory: str) -> None:
+        """Load every *.csv (orders) and *.json ({"orders": [...]}, {"monthly_sales": [...]}) file."""
+        if not os.path.isdir(directory):
+            logger.warning("Sales fixtures directory %s not found, database left empty", directory)
+            return
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.endswith(".csv"):
+                with open(path, encoding="utf-8", newline="") as f:
+                    count = self.insert_orders(csv.DictReader(f))
+                logger.info("Loaded %d orders from %s", count, name)
+            elif name.endswith(".json"):
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if "monthly_sales" in data:
+                    count = self.add_monthly_history(data["monthly_sales"])
+                    logger.info("Loaded %d monthly aggregates from %s", count, name)
+                if "orders" in data:
+                    count = self.insert_orders(data["orders"])
+                    logger.info("Loaded %d orders from %s", count, name)
+
+    # ---------------- reads ----------------
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        row = self._reader().execute(SELECT_ORDER, (order_id.strip().upper(),)).fetchone()
+        return dict(zip(_ORDER_FIELDS, row)) if row else None
+
+    def get_month(self, month: str) -> Optional[dict]:
+        """Monthly totals, top product and growth against the previous month."""
+        conn = self._reader()
+        row = conn.execute(SELECT_MONTH, (month,)).fetchone()
+        if row is None:
+            return None
+        total, orders = row
+        top = conn.execute(SELECT_TOP_PRODUCT, (month,)).fetchone()
+        prev = conn.execute(SELECT_MONTH, (_previous_month(month),)).fetchone()
+        growth = (total - prev[0]) / prev[0] * 100 if prev and prev[0] else None
+        return {
+            "month": month,
+            "total": total,
+            "orders": orders,
+            "top_product": top[0] if top else "-",
+            "growth": growth,
+        }
+
+    def get_year(self, year: Optional[str] = None) -> Optional[dict]:
+        """Annual totals with the best month; defaults to the latest year on record."""
+        conn = self._reader()
+        year = year or conn.execute(SELECT_LATEST_YEAR).fetchone()[0]
+        if not year:
+            return None
+        row = conn.execute(SELECT_YEAR, (year,)).fetchone()
+        if row is None:
+            return None
+        best_month, best_total, months = conn.execute(SELECT_BEST_MONTH, (year,)).fetchone()
+        return {
+            "year": year,
+            "total": row[0],
+            "orders": row[1],
+            "best_month": best_month,
+            "best_month_total": best_total,
+            "months": months,
+        }
+
+    def months(self) -> list[str]:
+        return [m for (m,) in self._reader().execute(SELECT_MONTHS)]
+
+    def sample_order_ids(self, limit: int = 5) -> list[str]:
+        return [o for (o,) in self._reader().execute("SELECT order_id FROM orders LIMIT ?", (limit,))]
+
+
+def _previous_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year - 1}-12" if mon == 1 else f"{year}-{mon - 1:02d}"
+
+
+_db: Optional[SalesDatabase] = None
+_db_lock = threading.Lock()
+
+
+def get_sales_db() -> SalesDatabase:
+    """Shared database at SALES_DB_PATH, built from SALES_DB_FIXTURES_DIR on first use."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = SalesDatabase(settings.SALES_DB_PATH, settings.SALES_DB_FIXTURES_DIR)
+    return _db
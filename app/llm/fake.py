@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+from app.llm.tokens import estimate_tokens, truncate_to_tokens
+
+_EXPRESSION_RE = re.compile(r"[\d.\s()+\-*/%]*\d[\d.\s()+\-*/%]*[+\-*/%][\d.\s()+\-*/%]*\d[\d.\s()]*\)?")
+_MONTH_RE = re.compile(r"\d{4}-\d{2}")
+_ORDER_RE = re.compile(r"ORD-\d{4}-\d{3,}", re.IGNORECASE)
+_STEP_SPLIT_RE = re.compile(r"然后|，并且|，并|；|;|，再|再")
+_MULTI_STEP_HINTS = ("然后", "并且", "对比", "比较", "分析", "再", "；")
+
+_script_counters: dict[str, Any] = {}
+_script_counters_lock = threading.Lock()
+
+
+def script_counter(path: str):
+    """Call counter shared by every model replaying the script at path.
+
+    Each role gets its own model, so a per-model counter would restart every
+    role at the first entry; sharing one lets a script list a multi-role run
+    (planner, executor, ..., summarizer) in call order.
+    """
+    with _script_counters_lock:
+        return _script_counters.setdefault(path, itertools.count())
+
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model for benchmarks and local runs (LLM_PROVIDER=fake).
+
+    Answers from ``script`` when one is given, otherwise follows simple rules that
+    mimic the real agents: classifies queries, produces plans, calls the tool
+    matching a request and answers once a tool result is available.
+    """
+
+    model_name: str = "fake"
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    """Simulated decode time per completion token, added to ``latency_ms``."""
+    max_tokens: Optional[int] = None
+    """Cap on text completion tokens (longer answers are truncated)."""
+    repeat_rate: float = 0.0
+    """Chance of re-issuing the previous tool calls after a tool result instead of
+    answering, mimicking the tool-call loops real models fall into."""
+    seed: int = 0
+    script: list[dict] = Field(default_factory=list)
+    """Responses returned in order (cycled), each ``{"content": ..., "tool_calls": [...]}``."""
+    script_calls: Any = None
+    """Counter positioning ``script`` (see script_counter); default: one per model."""
+
+    _calls: Any = PrivateAttr(default_factory=itertools.count)
+    _rng: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        if self.script_calls is not None:
+            self._calls = self.script_calls
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, tool_choice: Optional[str] = None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    # ---------------- generation ----------------
+
+    def _delay(self, result: ChatResult) -> float:
+        completion_tokens = result.generations[0].message.usage_metadata["output_tokens"]
+        base = self.latency_ms + completion_tokens * self.token_latency_ms
+        if base <= 0 and self.jitter_ms <= 0:
+            return 0.0
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(base + jitter, 0.0) / 1000
+
+    @staticmethod
+    def _tools(kwargs: dict) -> list[dict]:
+        return [] if kwargs.get("tool_choice") == "none" else kwargs.get("tools") or []
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._result(messages, self._tools(kwargs))
+        delay = self._delay(result)
+        if delay:
+            time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._result(messages, self._tools(kwargs))
+        delay = self._delay(result)
+        if delay:
+            await asyncio.sleep(delay)
+        return result
+
+    def _result(self, messages: list[BaseMessage], tools: list[dict]) -> ChatResult:
+        call_no = next(self._calls)
+        if self.script:
+            entry = self.script[call_no % len(self.script)]
+            message = AIMessage(content=entry.get("content", ""), tool_calls=entry.get("tool_calls", []))
+        else:
+            message = self._respond(messages, tools, call_no)
+        if self.max_tokens and isinstance(message.content, str):
+            message.content = truncate_to_tokens(message.content, self.max_tokens)
+        message.response_metadata = {"model_name": self.model_name}
+
+        prompt_tokens = sum(estimate_tokens(_text(m)) for m in messages)
+        prompt_tokens += sum(estimate_tokens(json.dumps(t, ensure_ascii=False)) for t in tools)
+        completion_tokens = estimate_tokens(_text(message)) + sum(
+            estimate_tokens(json.dumps(tc["args"], ensure_ascii=False)) for tc in message.tool_calls
+        )
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    # ---------------- rule-based behaviour ----------------
+
+    def _respond(self, messages: list[BaseMessage], tools: list[dict], call_no: int) -> AIMessage:
+        tool_names = [t["function"]["name"] for t in tools]
+        system = next((_text(m) for m in messages if isinstance(m, SystemMessage)), "")
+        query = next((_text(m) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+        if "Plan" in tool_names:
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": "Plan", "args": {"steps": self._plan(query)}, "id": f"call_{call_no}"}],
+            )
+        if "react 或 plan_execute" in system:
+            return AIMessage(content=self._classify(query))
+        if "任务规划专家" in system:
+            return AIMessage(content="\n".join(f"{i}. {s}" for i, s in enumerate(self._plan(query), 1)))
+
+        last = messages[-1] if messages else None
+        if isinstance(last, ToolMessage):
+            if tool_names and self.repeat_rate and self._rng.random() < self.repeat_rate:
+                previous = next(m for m in reversed(messages) if isinstance(m, AIMessage) and m.tool_calls)
+                calls = [{**tc, "id": f"call_{call_no}_{i}"} for i, tc in enumerate(previous.tool_calls)]
+                return AIMessage(content="", tool_calls=calls)
+            return AIMessage(content=f"根据 {last.name} 的结果: {_text(last)[:200]}")
+        tool_result = next((m for m in reversed(messages) if isinstance(m, ToolMessage)), None)
+        if tool_result is not None and not tool_names:
+            return AIMessage(content=f"根据 {tool_result.name} 的结果: {_text(tool_result)[:200]}")
+
+        call = self._match_tool(query, tool_names)
+        if call is not None:
+            name, args = call
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{call_no}"}])
+        return AIMessage(content=f"好的，关于「{query[:50]}」的回答已完成。")
+
+    @staticmethod
+    def _classify(query: str) -> str:
+        return "plan_execute" if any(h in query for h in _MULTI_STEP_HINTS) else "react"
+
+    @staticmethod
+    def _plan(query: str) -> list[str]:
+        query = query.replace("请为以下任务制定执行计划:", "").strip()
+        parts = [p.strip(" ，,。") for p in _STEP_SPLIT_RE.split(query) if p.strip(" ，,。")]
+        return (parts or [query])[:4] + ["汇总结果并回复用户"]
+
+    @staticmethod
+    def _match_tool(text: str, tool_names: list[str]) -> Optional[tuple[str, dict]]:
+        text = text.replace("请执行:", "").strip()
+        if "汇总结果" in text:
+            return None
+        if "weather_query" in tool_names and "天气" in text:
+            return "weather_query", {"city": text}
+        if "database_query" in tool_names:
+            order = _ORDER_RE.search(text)
+            if order:
+                return "database_query", {"query_type": "order", "params": order.group(0)}
+            if "销售" in text or "营收" in text:
+                month = _MONTH_RE.search(text)
+                if month:
+                    return "database_query", {"query_type": "sales", "params": month.group(0)}
+                return "database_query", {"query_type": "summary", "params": ""}
+        if "calculator" in tool_names:
+            expr = _EXPRESSION_RE.search(text)
+            if expr:
+                return "calculator", {"expression": expr.group(0).strip()}
+        if "web_search" in tool_names and any(k in text for k in ("搜索", "查找", "最新", "趋势")):
+            return "web_search", {"query": text}
+        return None
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic feature-hashing embedder (character n-grams, signed buckets)."""
+
+    def __init__(self, dim: int = 256, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+
+    @staticmethod
+    def _features(text: str) -> list[str]:
+        text = text.lower()
+        feats = re.findall(r"[a-z0-9]+", text)
+        cjk = [ch for ch in text if "一" <= ch <= "鿿"]
+        feats.extend(cjk)
+        feats.extend(a + b for a, b in zip(cjk, cjk[1:]))
+        return feats
+
+    def _embed(self, text: str) -> list[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feat in self._features(text):
+            digest = hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
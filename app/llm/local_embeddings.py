@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Odd 64-bit multipliers used to mix code points into n-gram hashes.
+_PRIMES = np.array(
+    [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD],
+    dtype=np.uint64,
+)
+_PROJECTION_MIX = np.uint64(0xC4CEB9FE1A85EC53)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Below this many texts per call, threading costs more than it saves.
+_PARALLEL_THRESHOLD = 64
+
+
+class LocalEmbeddings(Embeddings):
+    """In-process CPU embedder: hashed character n-grams with optional IDF.
+
+    Each text is turned into character n-gram hashes with vectorized NumPy
+    arithmetic (no per-token Python loop), weighted by sublinear TF and, when an
+    IDF table is loaded, by IDF, then projected to ``dim`` dimensions with
+    signed feature hashing and L2-normalized. No network round trip.
+    """
+
+    VERSION = "hash-ngram-v1"
+
+    def __init__(
+        self,
+        dim: int = 384,
+        ngram_range: tuple[int, int] = (1, 3),
+        n_features: int = 1 << 20,
+        idf_path: Optional[str] = None,
+        threads: int = 4,
+    ):
+        if not 1 <= ngram_range[0] <= ngram_range[1] <= len(_PRIMES):
+            raise ValueError(f"ngram_range must be within 1..{len(_PRIMES)}, got {ngram_range}")
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        self.threads = max(threads, 1)
+        self._feature_shift = np.uint64(64 - n_features.bit_length() + 1)
+        self.idf: Optional[np.ndarray] = None
+        self._idf_digest: Optional[str] = None
+        if idf_path and os.path.exists(idf_path):
+            self.load_idf(idf_path)
+
+    @property
+    def model_id(self) -> str:
+        """Identifier recorded on collections so mismatched models are detected."""
+        lo, hi = self.ngram_range
+        model_id = f"local:{self.VERSION}:dim={self.dim}:ngram={lo}-{hi}:features={self.n_features}"
+        if self._idf_digest is not None:
+            model_id += ":idf=" + self._idf_digest
+        return model_id
+
+    # ---------------- features ----------------
+
+    def _feature_ids(self, text: str) -> np.ndarray:
+        text = _WHITESPACE_RE.sub(" ", text.lower()).strip()
+        cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        length = len(cps)
+        grams = []
+        lo, hi = self.ngram_range
+        for n in range(lo, min(hi, length) + 1):
+            h = cps[: length - n + 1] * _PRIMES[0] + np.uint64(n)
+            for j in range(1, n):
+                h = (h ^ (cps[j : length - n + 1 + j] * _PRIMES[j])) * _PRIMES[0]
+            grams.append(h)
+        if not grams:
+            return np.empty(0, dtype=np.uint64)
+        return np.concatenate(grams) >> self._feature_shift
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        ids = self._feature_ids(text)
+        if ids.size == 0:
+            return vec
+        ids, counts = np.unique(ids, return_counts=True)
+        weights = 1.0 + np.log(counts.astype(np.float32))
+        if self.idf is not None:
+            weights *= self.idf[ids.astype(np.int64)]
+        mixed = ids * _PROJECTION_MIX
+        buckets = ((mixed >> np.uint64(32)) % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where((mixed >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+        vec += np.bincount(buckets, weights=weights * signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            out[i] = self._embed_one(text)
+        return out
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix, splitting large batches across threads."""
+        if len(texts) < _PARALLEL_THRESHOLD or self.threads == 1:
+            return self._embed_batch(texts)
+        chunk = -(-len(texts) // self.threads)
+        parts = [texts[i : i + chunk] for i in range(0, len(texts), chunk)]
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            return np.vstack(list(pool.map(self._embed_batch, parts)))
+
+    # ---------------- IDF ----------------
+
+    def fit_idf(self, texts: list[str]) -> None:
+        """Compute smoothed IDF weights over the hashed feature space from a corpus."""
+        df = np.zeros(self.n_features, dtype=np.int64)
+        for text in texts:
+            df[np.unique(self._feature_ids(text)).astype(np.int64)] += 1
+        self._set_idf(np.log((1 + len(texts)) / (1 + df)) + 1)
+
+    def save_idf(self, path: str) -> None:
+        if self.idf is None:
+            raise ValueError("No IDF table to save; call fit_idf first")
+        np.save(path, self.idf)
+
+    def load_idf(self, path: str) -> None:
+        idf = np.load(path)
+        if idf.shape != (self.n_features,):
+            raise ValueError(f"IDF table has shape {idf.shape}, expected ({self.n_features},)")
+        self._set_idf(idf)
+
+    def _set_idf(self, idf: np.ndarray) -> None:
+        # Hashed once here; model_id is read on every collection check.
+        self.idf = idf.astype(np.float32)
+        self._idf_digest = hashlib.sha1(self.idf.tobytes()).hexdigest()[:8]
+
+    # ---------------- Embeddings interface ----------------
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_one(text).tolist()
@@ -1,19 +1,107 @@
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.embeddings import Embeddings
+import json
+import os
+from typing import TYPE_CHECKING, Optional
 
 from app.config import settings
 
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
 
-def get_chat_model() -> BaseChatModel:
-    """Get the chat model based on the configured provider."""
-    if settings.LLM_PROVIDER == "ollama":
+
+def role_setting(role: str, name: str, default):
+    """Per-role override ``LLM_<ROLE>_<NAME>`` from Settings, falling back to default."""
+    value = getattr(settings, f"LLM_{role.upper()}_{name}", None)
+    return default if value is None else value
+
+
+def get_chat_model(role: str = "default") -> "BaseChatModel":
+    """Get the chat model for an agent role based on the configured provider.
+
+    ``LLM_<ROLE>_MODEL``, ``LLM_<ROLE>_MAX_TOKENS`` and ``LLM_<ROLE>_TEMPERATURE``
+    route a role to a smaller model or a tighter budget (e.g. the classifier
+    only needs a one-word label). Unless LLM_RESILIENCE_ENABLED is off, the model is wrapped with the role's
+    deadline, hedged requests and circuit-breaker failover to
+    LLM_FALLBACK_PROVIDER (see app.llm.resilient).
+    """
+    deadline = role_setting(role, "TIMEOUT", settings.LLM_TIMEOUT)
+    max_tokens = role_setting(role, "MAX_TOKENS", settings.LLM_MAX_TOKENS)
+    temperature = role_setting(role, "TEMPERATURE", settings.LLM_TEMPERATURE)
+    model = _build_chat_model(
+        settings.LLM_PROVIDER,
+        deadline,
+        model_name=role_setting(role, "MODEL", None),
+        max_tokens=max_tokens,
+        temperature=temperature,
+    )
+    if not settings.LLM_RESILIENCE_ENABLED:
+        return model
+
+    from app.llm.resilient import ResilientChatModel
+
+    fallback_provider = settings.LLM_FALLBACK_PROVIDER
+    if fallback_provider == settings.LLM_PROVIDER:
+        fallback_provider = ""
+    # The role's model name belongs to the primary provider; the fallback keeps its default model.
+    fallback = None
+    if fallback_provider:
+        fallback = _build_chat_model(fallback_provider, deadline, max_tokens=max_tokens, temperature=temperature)
+    return ResilientChatModel(
+        model=model,
+        provider=settings.LLM_PROVIDER,
+        fallback=fallback,
+        fallback_provider=fallback_provider,
+        role=role,
+        deadline=deadline,
+    )
+
+
+def _fake_model_latency(model_name: str) -> float:
+    """Base latency for a fake model name from FAKE_LLM_MODEL_LATENCY_MS ("name=ms,...")."""
+    for item in settings.FAKE_LLM_MODEL_LATENCY_MS.split(","):
+        name, _, ms = item.partition("=")
+        if name.strip() == model_name and ms.strip():
+            return float(ms)
+    return settings.FAKE_LLM_LATENCY_MS
+
+
+def _build_chat_model(
+    provider: str,
+    timeout: float,
+    model_name: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+) -> "BaseChatModel":
+    max_tokens = settings.LLM_MAX_TOKENS if max_tokens is None else max_tokens
+    temperature = settings.LLM_TEMPERATURE if temperature is None else temperature
+    if provider == "ollama":
         from langchain_ollama import ChatOllama
 
         return ChatOllama(
             base_url=settings.OLLAMA_BASE_URL,
-            model=settings.OLLAMA_MODEL,
-            temperature=settings.LLM_TEMPERATURE,
-            num_predict=settings.LLM_MAX_TOKENS,
+            model=model_name or settings.OLLAMA_MODEL,
+            temperature=temperature,
+            num_predict=max_tokens,
+            client_kwargs={"timeout": timeout},
+        )
+    elif provider == "fake":
+        from app.llm.fake import FakeChatModel, script_counter
+
+        script, script_calls = [], None
+        if settings.FAKE_LLM_SCRIPT:
+            with open(settings.FAKE_LLM_SCRIPT, "r", encoding="utf-8") as f:
+                script = json.load(f)
+            script_calls = script_counter(os.path.abspath(settings.FAKE_LLM_SCRIPT))
+        model_name = model_name or "fake"
+        return FakeChatModel(
+            model_name=model_name,
+            latency_ms=_fake_model_latency(model_name),
+            jitter_ms=settings.FAKE_LLM_JITTER_MS,
+            token_latency_ms=settings.FAKE_LLM_TOKEN_LATENCY_MS,
+            repeat_rate=settings.FAKE_LLM_REPEAT_RATE,
+            max_tokens=max_tokens,
+            script=script,
+            script_calls=script_calls,
         )
     else:
         from langchain_openai import ChatOpenAI
@@ -21,21 +109,44 @@ def get_chat_model() -> BaseChatModel:
         return ChatOpenAI(
             api_key=settings.OPENAI_API_KEY,
             base_url=settings.OPENAI_BASE_URL,
-            model=settings.OPENAI_MODEL,
-            temperature=settings.LLM_TEMPERATURE,
-            max_tokens=settings.LLM_MAX_TOKENS,
+            model=model_name or settings.OPENAI_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            max_retries=settings.LLM_MAX_RETRIES,
         )
 
 
-def get_embeddings() -> Embeddings:
+def _embedding_provider() -> str:
+    return settings.EMBEDDING_PROVIDER or settings.LLM_PROVIDER
+
+
+def get_embeddings() -> "Embeddings":
     """Get the embedding model based on the configured provider."""
-    if settings.LLM_PROVIDER == "ollama":
+    provider = _embedding_provider()
+    if provider == "ollama":
         from langchain_ollama import OllamaEmbeddings
 
         return OllamaEmbeddings(
             base_url=settings.OLLAMA_BASE_URL,
             model=settings.OLLAMA_EMBEDDING_MODEL,
         )
+    elif provider == "local":
+        from app.llm.local_embeddings import LocalEmbeddings
+
+        return LocalEmbeddings(
+            dim=settings.LOCAL_EMBEDDING_DIM,
+            ngram_range=(1, settings.LOCAL_EMBEDDING_NGRAM_MAX),
+            idf_path=settings.LOCAL_EMBEDDING_IDF_PATH or None,
+            threads=settings.LOCAL_EMBEDDING_THREADS,
+        )
+    elif provider == "fake":
+        from app.llm.fake import HashingEmbeddings
+
+        return HashingEmbeddings(
+            dim=settings.FAKE_EMBEDDING_DIM,
+            latency_ms=settings.FAKE_EMBEDDING_LATENCY_MS,
+        )
     else:
         from langchain_openai import OpenAIEmbeddings
 
@@ -44,3 +155,18 @@ def get_embeddings() -> Embeddings:
             base_url=settings.OPENAI_BASE_URL,
             model=settings.OPENAI_EMBEDDING_MODEL,
         )
+
+
+def get_embedding_model_id(embeddings: "Embeddings | None" = None) -> str:
+    """Stable identifier of the embedding model, recorded on vector collections."""
+    model_id = getattr(embeddings, "model_id", None)
+    if model_id:
+        return model_id
+    provider = _embedding_provider()
+    if provider == "ollama":
+        return f"ollama:{settings.OLLAMA_EMBEDDING_MODEL}"
+    elif provider == "fake":
+        return f"fake:hashing:dim={settings.FAKE_EMBEDDING_DIM}"
+    elif provider == "local":
+        return get_embeddings().model_id
+    return f"openai:{settings.OPENAI_EMBEDDING_MODEL}"
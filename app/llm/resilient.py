@@ -0,0 +1,289 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.concurrency.admission import AdmissionRejected, take_llm_slot, try_llm_slot
+from app.config import settings
+from app.observability.metrics import Counter, Gauge
+from app.observability.usage import record_usage
+
+logger = logging.getLogger("smartflow.llm")
+
+LLM_HEDGES = Counter(
+    "smartflow_llm_hedges_total",
+    "Duplicate LLM requests due after the hedge delay; outcome is which copy answered first, "
+    "or 'not_admitted' when the provider had no free admission slot and no hedge was sent.",
+    labelnames=("role", "provider", "outcome"),
+)
+LLM_FAILURES = Counter(
+    "smartflow_llm_failures_total",
+    "LLM calls that failed or missed their deadline, before any failover.",
+    labelnames=("role", "provider", "reason"),
+)
+LLM_FAILOVERS = Counter(
+    "smartflow_llm_failovers_total",
+    "LLM calls answered by the fallback provider.",
+    labelnames=("role", "provider"),
+)
+CIRCUIT_STATE = Gauge(
+    "smartflow_llm_circuit_state",
+    "Circuit breaker state per provider: 0 closed, 1 open, 2 half-open.",
+    labelnames=("provider",),
+)
+
+# Calls run on these pools so the caller can enforce a deadline and fire hedges.
+# A call that loses a hedge race or misses its deadline finishes in the
+# background (bounded by the client's own timeout); its result is dropped but
+# its usage is still recorded. Fallback calls get their own pool, so a primary
+# provider that hangs and fills its pool cannot also block the failover.
+_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+_fallback_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-fallback")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every provider for a call has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after ``threshold`` consecutive failures; after ``reset_timeout``
+    seconds one trial call is let through (half-open) and its outcome closes
+    or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, provider: str, threshold: int, reset_timeout: float):
+        self.provider = provider
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(state, provider=self.provider)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Circuit for %s closed", self.provider)
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit for %s opened after %d failures", self.provider, self._failures)
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(
+                provider, settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS
+            )
+        return breaker
+
+
+def _get_latency(provider: str, role: str) -> LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault((provider, role), LatencyTracker())
+
+
+class ResilientChatModel(BaseChatModel):
+    """Chat model wrapper adding a per-role deadline, hedged requests and failover.
+
+    - Each call must finish within ``deadline`` seconds.
+    - Once enough latencies are observed, a duplicate request is fired if the
+      first has not answered after the role's LLM_HEDGE_PERCENTILE latency;
+      the first successful answer wins.
+    - Failures and missed deadlines feed a per-provider circuit breaker; when
+      the primary fails or its circuit is open the call goes to ``fallback``.
+    """
+
+    model: Any
+    provider: str
+    fallback: Any = None
+    fallback_provider: str = ""
+    role: str = "default"
+    deadline: float = 60.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={
+            "model": self.model.bind_tools(tools, **kwargs),
+            "fallback": self.fallback.bind_tools(tools, **kwargs) if self.fallback is not None else None,
+        })
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._call(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _call(self, messages: list[BaseMessage], **kwargs) -> AIMessage:
+        targets = [(self.provider, self.model)]
+        if self.fallback is not None:
+            targets.append((self.fallback_provider, self.fallback))
+
+        error: Optional[Exception] = None
+        for provider, model in targets:
+            breaker = get_breaker(provider)
+            if not breaker.allow():
+                continue
+            try:
+                message = self._hedged(provider, model, messages, kwargs)
+            except AdmissionRejected:
+                # The provider is saturated, not failing: shed the call.
+                raise
+            except Exception as e:
+                reason = "deadline" if isinstance(e, TimeoutError) else "error"
+                LLM_FAILURES.inc(role=self.role, provider=provider, reason=reason)
+                logger.warning("LLM %s call to %s failed (%s): %s", self.role, provider, reason, e)
+                breaker.record_failure()
+                error = e
+                continue
+            breaker.record_success()
+            if provider != self.provider:
+                LLM_FAILOVERS.inc(role=self.role, provider=provider)
+            return message
+
+        if error is None:
+            raise CircuitOpenError(f"No LLM provider available for {self.role}: circuit open")
+        raise error
+
+    def _submit(self, provider: str, model, messages, kwargs, slot) -> Future:
+        """Run model.invoke on the provider's pool, holding the admission slot until it returns.
+
+        The slot is released by the call itself, so a copy the caller gave up
+        on (lost hedge, missed deadline) still counts against the provider.
+        """
+
+        def call() -> AIMessage:
+            with slot:
+                return model.invoke(messages, **kwargs)
+
+        start = time.perf_counter()
+        pool = _pool if provider == self.provider else _fallback_pool
+        future = pool.submit(contextvars.copy_context().run, call)
+        tracker = _get_latency(provider, self.role)
+
+        def observe(f: Future) -> None:
+            if not f.cancelled() and f.exception() is None:
+                tracker.observe(time.perf_counter() - start)
+
+        future.add_done_callback(observe)
+        return future
+
+    def _hedged(self, provider: str, model, messages, kwargs) -> AIMessage:
+        hedge_after = None
+        if settings.LLM_HEDGE_ENABLED:
+            hedge_after = _get_latency(provider, self.role).percentile(
+                settings.LLM_HEDGE_PERCENTILE, settings.LLM_HEDGE_MIN_SAMPLES
+            )
+
+        # Queueing for admission happens before the deadline starts.
+        slot = take_llm_slot(provider)
+        start = time.perf_counter()
+        first = self._submit(provider, model, messages, kwargs, slot)
+        pending = {first}
+        hedge: Optional[Future] = None
+        error: Optional[BaseException] = None
+        while pending:
+            elapsed = time.perf_counter() - start
+            remaining = self.deadline - elapsed
+            if remaining <= 0:
+                self._record_abandoned(pending)
+                raise TimeoutError(f"no answer within the {self.deadline:.1f}s {self.role} deadline")
+            timeout = remaining
+            if hedge is None and hedge_after is not None:
+                timeout = min(timeout, max(hedge_after - elapsed, 0.0))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedge is not None:
+                        outcome = "hedge_won" if future is hedge else "primary_won"
+                        LLM_HEDGES.inc(role=self.role, provider=provider, outcome=outcome)
+                        self._record_abandoned(pending)
+                    return future.result()
+                error = future.exception()
+
+            if hedge is None and hedge_after is not None and time.perf_counter() - start >= hedge_after:
+                # The first copy holds its own admission slot; the hedge needs
+                # another, and is skipped rather than queued when the provider
+                # is saturated.
+                slot = try_llm_slot(provider)
+                if slot is None:
+                    LLM_HEDGES.inc(role=self.role, provider=provider, outcome="not_admitted")
+                    hedge_after = None
+                    continue
+                hedge = self._submit(provider, model, messages, kwargs, slot)
+                pending.add(hedge)
+        raise error
+
+    def _record_abandoned(self, pending: set[Future]) -> None:
+        """Record the usage of copies the caller no longer waits for, once they finish.
+
+        The caller records only the message it returns, but a copy that lost
+        the hedge race or missed the deadline is billed all the same.
+        """
+        context = contextvars.copy_context()
+
+        def record(f: Future) -> None:
+            if not f.cancelled() and f.exception() is None:
+                context.run(record_usage, self.role, f.result())
+
+        for future in pending:
+            future.add_done_callback(record)
@@ -1,62 +1,215 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
-from typing import Optional
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import TYPE_CHECKING, Callable, Optional
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
+from app.concurrency.admission import BACKGROUND, AdmissionRejected, priority
+from app.concurrency.session_lock import SessionLocks
 from app.config import settings
 from app.schemas.models import (
+    BatchChatRequest,
+    BatchChatResult,
     ChatRequest,
     ChatResponse,
     IntermediateStep,
     DocumentUploadResponse,
     CollectionInfo,
+    MemoryMaintenanceResponse,
+    UsageReport,
     HealthResponse,
+    ReadinessResponse,
 )
-from app.agent.supervisor import SupervisorAgent
-from app.rag.document_processor import DocumentProcessor
-from app.rag.vector_store import VectorStoreManager
-from app.memory.short_term import clear_session, list_sessions
+from app.observability.metrics import render_prometheus
+from app.observability.tracing import request_trace, span
+from app.observability.usage import get_session_usage, list_session_usage
+
+if TYPE_CHECKING:
+    from app.agent.supervisor import SupervisorAgent
+    from app.rag.document_processor import DocumentProcessor
+    from app.rag.vector_store import VectorStoreManager
+    from app.memory.long_term import LongTermMemory
 
 logger = logging.getLogger("smartflow")
 
 # --- Global singletons (initialized lazily) ---
-_supervisor: SupervisorAgent | None = None
-_doc_processor: DocumentProcessor | None = None
-_vector_store: VectorStoreManager | None = None
-
-
-def get_supervisor() -> SupervisorAgent:
+# Agent, RAG and memory modules are imported on first use so that importing
+# app.main (health checks, tooling) does not load langgraph / chromadb.
+_supervisor: "SupervisorAgent | None" = None
+_doc_processor: "DocumentProcessor | None" = None
+_vector_store: "VectorStoreManager | None" = None
+_long_term_memory: "LongTermMemory | None" = None
+_ready = False
+# Essential warm-up steps whose last attempt failed; /api/ready names them while they are retried.
+_warmup_failed: list[str] = []
+# Serializes turns within a session; different sessions run in parallel.
+_session_locks = SessionLocks()
+
+
+def get_supervisor() -> "SupervisorAgent":
     global _supervisor
     if _supervisor is None:
+        from app.agent.supervisor import SupervisorAgent
+
         _supervisor = SupervisorAgent()
     return _supervisor
 
 
-def get_doc_processor() -> DocumentProcessor:
+def get_doc_processor() -> "DocumentProcessor":
     global _doc_processor
     if _doc_processor is None:
+        from app.rag.document_processor import DocumentProcessor
+
         _doc_processor = DocumentProcessor()
     return _doc_processor
 
 
-def get_vector_store() -> VectorStoreManager:
+def get_vector_store() -> "VectorStoreManager":
     global _vector_store
     if _vector_store is None:
+        from app.rag.vector_store import VectorStoreManager
+
         _vector_store = VectorStoreManager()
     return _vector_store
 
 
+def get_long_term_memory() -> "LongTermMemory":
+    global _long_term_memory
+    if _long_term_memory is None:
+        from app.memory.long_term import LongTermMemory
+
+        _long_term_memory = LongTermMemory()
+    return _long_term_memory
+
+
+async def _memory_maintenance_loop(interval: int) -> None:
+    """Periodically apply long-term memory retention and compaction."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(get_long_term_memory().run_maintenance)
+        except Exception:
+            logger.exception("Long-term memory maintenance failed")
+
+
+def _run_warmup_steps(steps: dict[str, Callable[[], object]]) -> list[str]:
+    """Run warm-up steps in order, logging each one's time; returns the names that failed."""
+    failed = []
+    for name, step in steps.items():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            failed.append(name)
+            logger.exception("Warm-up step %s failed after %.3fs", name, time.perf_counter() - start)
+        else:
+            logger.info("Warm-up step %s done in %.3fs", name, time.perf_counter() - start)
+    return failed
+
+
+def _preload_collections() -> None:
+    store = get_supervisor().vector_store
+    if settings.WARMUP_COLLECTIONS.strip() == "*":
+        names = [c["name"] for c in store.list_collections()]
+    else:
+        names = [n.strip() for n in settings.WARMUP_COLLECTIONS.split(",") if n.strip()]
+    for name in names:
+        logger.info("Warm-up collection %s: %d chunks", name, store.preload_collection(name))
+
+
+def _prime_llm() -> None:
+    limit = {"num_predict": 1} if settings.LLM_PROVIDER == "ollama" else {"max_tokens": 1}
+    get_supervisor().llm.invoke("ping", **limit)
+
+
+def _start_calculator_worker() -> None:
+    from app.agent.tools.calculator import start_worker_server
+
+    start_worker_server()
+
+
+def _open_search_index() -> None:
+    from app.search.index import get_search_index
+
+    get_search_index()
+
+
+# Steps that gate readiness: the app cannot serve chats without them.
+_ESSENTIAL_WARMUP_STEPS: dict[str, Callable[[], object]] = {
+    "react_agent": lambda: get_supervisor().react_agent,
+    "plan_execute_agent": lambda: get_supervisor().plan_execute_agent,
+    "rag_retriever": lambda: (get_supervisor().rag_retriever, get_vector_store(), get_doc_processor()),
+    "collections": _preload_collections,
+}
+# Steps that only save the first requests some latency; failures are logged.
+_OPTIONAL_WARMUP_STEPS: dict[str, Callable[[], object]] = {
+    "search_index": _open_search_index,
+    "calculator_worker": _start_calculator_worker,
+    "embeddings": lambda: get_supervisor().vector_store.embed_query("warm-up"),
+}
+_WARMUP_RETRY_MAX_DELAY = 60.0
+
+
+async def _run_warm_up() -> None:
+    """Build agents, compile graphs, load vector indexes and prime client pools.
+
+    Essential steps that fail are retried with exponential backoff (up to
+    _WARMUP_RETRY_MAX_DELAY apart) until they succeed; meanwhile /api/ready
+    reports them. Optional steps run once and never block readiness.
+    """
+    global _ready
+    start = time.perf_counter()
+    pending = dict(_ESSENTIAL_WARMUP_STEPS)
+    delay = 1.0
+    while True:
+        failed = await asyncio.to_thread(_run_warmup_steps, pending)
+        _warmup_failed[:] = failed
+        if not failed:
+            break
+        logger.warning("Warm-up steps %s failed; retrying in %.0fs", ", ".join(failed), delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _WARMUP_RETRY_MAX_DELAY)
+        pending = {name: _ESSENTIAL_WARMUP_STEPS[name] for name in failed}
+
+    optional = dict(_OPTIONAL_WARMUP_STEPS)
+    if settings.WARMUP_PRIME_LLM:
+        optional["llm"] = _prime_llm
+    failed = await asyncio.to_thread(_run_warmup_steps, optional)
+    if failed:
+        logger.warning("Optional warm-up steps %s failed; serving without them", ", ".join(failed))
+    _ready = True
+    logger.info("Warm-up complete in %.3fs", time.perf_counter() - start)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global _ready
     logger.info(
         "SmartFlow AI Agent starting | provider=%s model=%s",
         settings.LLM_PROVIDER,
         settings.OPENAI_MODEL if settings.LLM_PROVIDER == "openai" else settings.OLLAMA_MODEL,
     )
+    maintenance_task = None
+    if settings.LONG_TERM_MAINTENANCE_INTERVAL > 0:
+        maintenance_task = asyncio.create_task(
+            _memory_maintenance_loop(settings.LONG_TERM_MAINTENANCE_INTERVAL)
+        )
+    warmup_task = None
+    if settings.WARMUP_ENABLED:
+        # Serve liveness immediately; /api/ready reports 503 until warm-up is done.
+        warmup_task = asyncio.create_task(_run_warm_up())
+    else:
+        _ready = True
     yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if maintenance_task is not None:
+        maintenance_task.cancel()
     logger.info("SmartFlow AI Agent shutting down")
 
 
@@ -76,39 +229,161 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Shed load fast when an LLM provider is saturated: 429 if its queue is full, 503 on queue timeout."""
+    return JSONResponse(
+        status_code=429 if exc.reason == "queue_full" else 503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ======================== Chat ========================
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Process a chat message through the agent system."""
-    try:
-        supervisor = get_supervisor()
-        result = supervisor.invoke(
+async def _run_chat(
+    request: ChatRequest,
+    rag_context: Optional[str] = None,
+    limit: Optional[asyncio.Semaphore] = None,
+) -> dict:
+    """Run one chat turn off the event loop, in order with other turns of its session."""
+    supervisor = get_supervisor()
+    # Stateless requests neither read nor write history, so they skip the session lock.
+    turn = nullcontext() if request.stateless else _session_locks.hold(request.session_id)
+    # The session turn is taken first so queued turns don't hold a concurrency slot.
+    async with turn, limit or nullcontext():
+        # Run off the event loop so concurrent chats overlap (and can coalesce).
+        return await asyncio.to_thread(
+            supervisor.invoke,
             query=request.message,
             session_id=request.session_id,
             mode=request.agent_mode,
             use_rag=request.use_rag,
             collection_name=request.collection_name,
+            stateless=request.stateless,
+            rag_context=rag_context,
         )
-        steps = [
-            IntermediateStep(
-                tool=s.get("tool", ""),
-                tool_input=s.get("tool_input", ""),
-                output=s.get("output", ""),
-            )
-            for s in result.get("intermediate_steps", [])
-        ]
-        return ChatResponse(
-            response=result["response"],
-            intermediate_steps=steps,
-            sources=result.get("sources", []),
-            agent_mode=result.get("agent_mode", ""),
+
+
+def _chat_response(result: dict) -> ChatResponse:
+    steps = [
+        IntermediateStep(
+            tool=s.get("tool", ""),
+            tool_input=s.get("tool_input", ""),
+            output=s.get("output", ""),
+        )
+        for s in result.get("intermediate_steps", [])
+    ]
+    return ChatResponse(
+        response=result["response"],
+        intermediate_steps=steps,
+        sources=result.get("sources", []),
+        agent_mode=result.get("agent_mode", ""),
+        step_prompt_tokens=result.get("step_prompt_tokens", []),
+        usage=result.get("usage", {}),
+        coalesced=result.get("coalesced", False),
+        iterations=result.get("iterations", 0),
+        stop_reason=result.get("stop_reason", ""),
+    )
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Process a chat message through the agent system."""
+    try:
+        with request_trace("/api/chat"):
+            result = await _run_chat(request)
+        usage = result.get("usage", {})
+        logger.info(
+            "Chat usage | session=%s mode=%s total=%s by_role=%s",
+            request.session_id,
+            result.get("agent_mode", ""),
+            usage.get("total"),
+            {role: u["total_tokens"] for role, u in usage.get("by_role", {}).items()},
         )
+        return _chat_response(result)
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.exception("Chat error")
         raise HTTPException(status_code=500, detail=f"Agent execution error: {e}")
 
 
+def _prefetch_batch_context(requests: list[ChatRequest]) -> dict[int, str]:
+    """Retrieve RAG context for every RAG request of a batch, one batched
+    embedding + search per collection with duplicate questions searched once."""
+    by_collection: dict[str, list[int]] = {}
+    for i, req in enumerate(requests):
+        if req.use_rag:
+            by_collection.setdefault(req.collection_name, []).append(i)
+
+    retriever = get_supervisor().rag_retriever
+    contexts: dict[int, str] = {}
+    for collection, indices in by_collection.items():
+        try:
+            with span("rag", "retrieve_batch", collection=collection, count=len(indices)):
+                found = retriever.retrieve_many_as_context(
+                    [requests[i].message for i in indices], collection
+                )
+        except Exception:
+            # Leave these to per-request retrieval so each reports its own error.
+            logger.exception("Batch retrieval failed for collection %s", collection)
+            continue
+        contexts.update(zip(indices, found))
+    return contexts
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(batch: BatchChatRequest):
+    """Run many chat requests concurrently, streaming NDJSON lines
+    ({"index", "result" | "error"}) in completion order.
+
+    Items without an explicit session_id run stateless, so they don't share
+    (and queue on) the "default" session. Items that name the same session
+    run one after another in batch order, as consecutive turns.
+    """
+    if len(batch.requests) > settings.BATCH_CHAT_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(batch.requests)} requests, limit is {settings.BATCH_CHAT_MAX_REQUESTS}",
+        )
+    requests = [
+        r if r.stateless or "session_id" in r.model_fields_set else r.model_copy(update={"stateless": True})
+        for r in batch.requests
+    ]
+    limit = asyncio.Semaphore(batch.concurrency or settings.BATCH_CHAT_CONCURRENCY)
+    contexts = await asyncio.to_thread(_prefetch_batch_context, requests)
+
+    async def run_one(index: int, request: ChatRequest) -> BatchChatResult:
+        try:
+            with request_trace("/api/chat/batch"):
+                result = await _run_chat(request, contexts.get(index), limit)
+            return BatchChatResult(index=index, result=_chat_response(result))
+        except Exception as e:
+            logger.warning("Batch item %d failed: %s", index, e)
+            return BatchChatResult(index=index, error=str(e))
+
+    async def stream():
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(run_one(i, r)) for i, r in enumerate(requests)]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                errors += item.error is not None
+                yield item.model_dump_json() + "\n"
+        finally:
+            # Client went away: don't keep running the rest of the batch.
+            for task in tasks:
+                task.cancel()
+        logger.info(
+            "Chat batch | requests=%d errors=%d elapsed=%.2fs",
+            len(tasks), errors, time.perf_counter() - start,
+        )
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # ======================== Documents / RAG ========================
 
 @app.post("/api/documents/upload", response_model=DocumentUploadResponse)
@@ -133,13 +408,17 @@ async def upload_document(
         docs = processor.load_bytes(content, file.filename)
 
         store = get_vector_store()
-        num_chunks = store.add_documents(docs, collection_name)
+        # Ingestion embeddings queue behind interactive chat at the provider.
+        with priority(BACKGROUND):
+            num_chunks = await asyncio.to_thread(store.add_documents, docs, collection_name)
 
         return DocumentUploadResponse(
             collection_name=collection_name,
             num_chunks=num_chunks,
             message=f"Successfully uploaded {file.filename}: {num_chunks} chunks indexed.",
         )
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.exception("Document upload error")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
@@ -150,7 +429,10 @@ async def list_collections():
     """List all knowledge base collections."""
     store = get_vector_store()
     collections = store.list_collections()
-    return [CollectionInfo(name=c["name"], count=c["count"]) for c in collections]
+    return [
+        CollectionInfo(name=c["name"], count=c["count"], embedder=c.get("embedder", ""))
+        for c in collections
+    ]
 
 
 @app.delete("/api/documents/collections/{name}")
@@ -168,7 +450,11 @@ async def delete_collection(name: str):
 @app.post("/api/memory/clear")
 async def clear_memory(session_id: str = "default"):
     """Clear conversation memory for a session."""
-    existed = clear_session(session_id)
+    from app.memory.short_term import clear_session
+
+    # Wait for in-flight turns so a clear doesn't race with their history writes.
+    async with _session_locks.hold(session_id):
+        existed = clear_session(session_id)
     return {
         "message": f"Session '{session_id}' cleared."
         if existed
@@ -176,13 +462,40 @@ async def clear_memory(session_id: str = "default"):
     }
 
 
+@app.post("/api/memory/compact", response_model=MemoryMaintenanceResponse)
+async def compact_memory(session_id: Optional[str] = None):
+    """Apply retention and merge near-duplicate long-term memories."""
+    memory = get_long_term_memory()
+    report = await asyncio.to_thread(memory.run_maintenance, session_id)
+    return MemoryMaintenanceResponse(**report)
+
+
 @app.get("/api/memory/sessions")
 async def get_sessions():
     """List all active sessions."""
+    from app.memory.short_term import list_sessions
+
     return {"sessions": list_sessions()}
 
 
-# ======================== Health ========================
+# ======================== Usage ========================
+
+@app.get("/api/usage/sessions", response_model=dict[str, UsageReport])
+async def get_all_usage():
+    """Rolling token usage and cost totals for every session."""
+    return list_session_usage()
+
+
+@app.get("/api/usage/sessions/{session_id}", response_model=UsageReport)
+async def get_usage(session_id: str):
+    """Rolling token usage and cost totals for one session, by LLM role."""
+    usage = get_session_usage(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for session '{session_id}'")
+    return usage
+
+
+# ======================== Health / Metrics ========================
 
 @app.get("/api/health", response_model=HealthResponse)
 async def health_check():
@@ -199,6 +512,24 @@ async def health_check():
     )
 
 
+@app.get("/api/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness probe: 503 until the optional startup warm-up has succeeded."""
+    if _warmup_failed:
+        raise HTTPException(status_code=503, detail=f"Warm-up failed, retrying: {', '.join(_warmup_failed)}")
+    if not _ready:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return ReadinessResponse(status="ready")
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms and counters in Prometheus text format."""
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,12 +1,17 @@
+import logging
+import time
 import uuid
 from typing import Optional
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-
+from app.concurrency.admission import BACKGROUND, embedding_slot
 from app.config import settings
 from app.llm.provider import get_embeddings
 
+logger = logging.getLogger("smartflow.memory")
+
+# Memories whose metadata is fetched per call when scanning the whole collection.
+_SCAN_PAGE_SIZE = 1000
+
 
 class LongTermMemory:
     """ChromaDB-based long-term semantic memory for storing important conversation
@@ -15,6 +20,9 @@ class LongTermMemory:
     COLLECTION_NAME = "long_term_memory"
 
     def __init__(self):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
         self._client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIR,
             settings=ChromaSettings(anonymized_telemetry=False),
@@ -30,16 +38,22 @@ class LongTermMemory:
             self._embeddings = get_embeddings()
         return self._embeddings
 
+    def count(self) -> int:
+        """Number of memories currently stored across all sessions."""
+        return self._collection.count()
+
     def save_memory(
         self, session_id: str, content: str, metadata: Optional[dict] = None
     ) -> str:
         """Save a piece of memory (e.g. conversation summary) to long-term storage."""
         doc_id = str(uuid.uuid4())
-        meta = {"session_id": session_id}
+        meta = {"session_id": session_id, "created_at": time.time()}
         if metadata:
             meta.update(metadata)
 
-        embedding = self._get_embeddings().embed_query(content)
+        # Saving memories is off the user's critical path, so it yields to chat traffic.
+        with embedding_slot(BACKGROUND):
+            embedding = self._get_embeddings().embed_query(content)
         self._collection.add(
             ids=[doc_id],
             embeddings=[embedding],
@@ -53,7 +67,8 @@ class LongTermMemory:
     ) -> list[dict]:
         """Search long-term memory by semantic similarity."""
         where_filter = {"session_id": session_id} if session_id else None
-        embedding = self._get_embeddings().embed_query(query)
+        with embedding_slot():
+            embedding = self._get_embeddings().embed_query(query)
 
         results = self._collection.query(
             query_embeddings=[embedding],
@@ -76,12 +91,180 @@ class LongTermMemory:
     def clear(self, session_id: Optional[str] = None) -> None:
         """Clear memories. If session_id given, only clear that session."""
         if session_id:
-            existing = self._collection.get(where={"session_id": session_id})
-            if existing["ids"]:
-                self._collection.delete(ids=existing["ids"])
+            # Filtered delete runs inside Chroma; nothing is shipped back to Python.
+            self._collection.delete(where={"session_id": session_id})
         else:
             self._client.delete_collection(self.COLLECTION_NAME)
             self._collection = self._client.get_or_create_collection(
                 name=self.COLLECTION_NAME,
                 metadata={"hnsw:space": "cosine"},
             )
+
+    # ======================== Maintenance ========================
+
+    def _session_ids(self) -> list[str]:
+        """Distinct session IDs present in the collection.
+
+        Metadata is read in pages of _SCAN_PAGE_SIZE, so a maintenance run
+        never loads the metadata of every memory at once.
+        """
+        sessions: set[str] = set()
+        offset = 0
+        while True:
+            page = self._collection.get(include=["metadatas"], limit=_SCAN_PAGE_SIZE, offset=offset)
+            sessions.update(m.get("session_id", "") for m in page["metadatas"] if m)
+            if len(page["ids"]) < _SCAN_PAGE_SIZE:
+                return sorted(sessions)
+            offset += _SCAN_PAGE_SIZE
+
+    def _backfill_created_at(self, session_id: Optional[str] = None) -> int:
+        """Stamp memories saved without ``created_at`` with the current time.
+
+        Chroma's where filters can't match a missing key, so such memories
+        would never age out; once stamped they expire max_age_days from now.
+        Returns number of memories stamped.
+        """
+        where = {"session_id": session_id} if session_id else None
+        now = time.time()
+        stamped = 0
+        offset = 0
+        while True:
+            page = self._collection.get(
+                where=where, include=["metadatas"], limit=_SCAN_PAGE_SIZE, offset=offset
+            )
+            missing = [
+                (doc_id, {**(meta or {}), "created_at": now})
+                for doc_id, meta in zip(page["ids"], page["metadatas"])
+                if not meta or "created_at" not in meta
+            ]
+            if missing:
+                self._collection.update(
+                    ids=[doc_id for doc_id, _ in missing],
+                    metadatas=[meta for _, meta in missing],
+                )
+                stamped += len(missing)
+            if len(page["ids"]) < _SCAN_PAGE_SIZE:
+                break
+            offset += _SCAN_PAGE_SIZE
+        if stamped:
+            logger.info("Backfilled created_at on %d long-term memories", stamped)
+        return stamped
+
+    def apply_retention(
+        self,
+        session_id: Optional[str] = None,
+        max_age_days: Optional[int] = None,
+        max_per_session: Optional[int] = None,
+    ) -> int:
+        """Drop memories older than max_age_days and cap each session at
+        max_per_session entries (oldest first). Returns number of memories removed."""
+        if max_age_days is None:
+            max_age_days = settings.LONG_TERM_MAX_AGE_DAYS
+        if max_per_session is None:
+            max_per_session = settings.LONG_TERM_MAX_PER_SESSION
+
+        before = self.count()
+
+        if max_age_days > 0:
+            self._backfill_created_at(session_id)
+            cutoff = time.time() - max_age_days * 86400
+            age_filter = {"created_at": {"$lt": cutoff}}
+            if session_id:
+                age_filter = {"$and": [{"session_id": session_id}, age_filter]}
+            self._collection.delete(where=age_filter)
+
+        if max_per_session > 0:
+            sessions = [session_id] if session_id else self._session_ids()
+            for sid in sessions:
+                existing = self._collection.get(
+                    where={"session_id": sid}, include=["metadatas"]
+                )
+                overflow = len(existing["ids"]) - max_per_session
+                if overflow <= 0:
+                    continue
+                ordered = sorted(
+                    zip(existing["ids"], existing["metadatas"]),
+                    key=lambda item: item[1].get("created_at", 0.0),
+                )
+                self._collection.delete(ids=[doc_id for doc_id, _ in ordered[:overflow]])
+
+        return before - self.count()
+
+    def compact(
+        self, session_id: Optional[str] = None, threshold: Optional[float] = None
+    ) -> int:
+        """Merge near-duplicate memories within each session.
+
+        The newest memory of each duplicate group is kept and its ``merged_count``
+        metadata is bumped; the older copies are deleted. Returns number removed.
+        """
+        import numpy as np
+
+        if threshold is None:
+            threshold = settings.LONG_TERM_DEDUP_THRESHOLD
+
+        removed = 0
+        sessions = [session_id] if session_id else self._session_ids()
+        for sid in sessions:
+            existing = self._collection.get(
+                where={"session_id": sid}, include=["metadatas", "embeddings"]
+            )
+            if len(existing["ids"]) < 2:
+                continue
+
+            ids = existing["ids"]
+            metas = existing["metadatas"]
+            order = sorted(
+                range(len(ids)),
+                key=lambda i: metas[i].get("created_at", 0.0),
+                reverse=True,
+            )
+            vectors = np.asarray(existing["embeddings"], dtype=np.float32)[order]
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            similarity = vectors @ vectors.T
+
+            kept: list[int] = []
+            merged_into: dict[int, int] = {}
+            for pos in range(len(order)):
+                if kept:
+                    best = max(kept, key=lambda k: similarity[pos, k])
+                    if similarity[pos, best] >= threshold:
+                        merged_into[pos] = best
+                        continue
+                kept.append(pos)
+
+            if not merged_into:
+                continue
+
+            merge_counts: dict[int, int] = {}
+            for target in merged_into.values():
+                merge_counts[target] = merge_counts.get(target, 0) + 1
+
+            update_ids, update_metas = [], []
+            for target, extra in merge_counts.items():
+                meta = dict(metas[order[target]])
+                meta["merged_count"] = meta.get("merged_count", 0) + extra
+                update_ids.append(ids[order[target]])
+                update_metas.append(meta)
+            self._collection.update(ids=update_ids, metadatas=update_metas)
+            self._collection.delete(ids=[ids[order[pos]] for pos in merged_into])
+            removed += len(merged_into)
+
+        return removed
+
+    def run_maintenance(self, session_id: Optional[str] = None) -> dict:
+        """Apply retention then compaction, reporting collection size before and after."""
+        size_before = self.count()
+        expired = self.apply_retention(session_id)
+        merged = self.compact(session_id)
+        size_after = self.count()
+        logger.info(
+            "Long-term memory maintenance | before=%d after=%d expired=%d merged=%d",
+            size_before, size_after, expired, merged,
+        )
+        return {
+            "size_before": size_before,
+            "size_after": size_after,
+            "expired": expired,
+            "merged": merged,
+        }
@@ -0,0 +1,148 @@
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.observability.metrics import Histogram
+
+logger = logging.getLogger("smartflow.tracing")
+
+SPAN_DURATION = Histogram(
+    "smartflow_span_duration_seconds",
+    "Duration of traced operations (routing, embedding, vector query, LLM, tool, graph node).",
+    labelnames=("kind", "name"),
+)
+REQUEST_DURATION = Histogram(
+    "smartflow_request_duration_seconds",
+    "End-to-end latency of API requests.",
+    labelnames=("endpoint",),
+)
+
+
+@dataclass
+class SpanRecord:
+    kind: str
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: dict = field(default_factory=dict)
+
+
+@dataclass
+class RequestTrace:
+    """Spans recorded while handling a single request."""
+
+    endpoint: str
+    spans: list[SpanRecord] = field(default_factory=list)
+
+    def summary(self) -> dict[str, float]:
+        """Total seconds spent per span kind/name."""
+        totals: dict[str, float] = {}
+        for s in self.spans:
+            key = f"{s.kind}:{s.name}"
+            totals[key] = totals.get(key, 0.0) + s.duration
+        return totals
+
+
+_current_trace: contextvars.ContextVar[RequestTrace | None] = contextvars.ContextVar(
+    "smartflow_trace", default=None
+)
+_NOOP = nullcontext()
+_tracer = None
+
+
+def _get_otel_tracer():
+    """Lazily set up an OpenTelemetry tracer when OTEL export is enabled."""
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+
+            if settings.OTEL_EXPORTER_ENDPOINT:
+                from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+                provider = TracerProvider(resource=Resource.create({"service.name": "smartflow"}))
+                provider.add_span_processor(
+                    BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_ENDPOINT))
+                )
+                trace.set_tracer_provider(provider)
+            _tracer = trace.get_tracer("smartflow")
+        except ImportError:
+            logger.warning("OTEL_ENABLED is set but opentelemetry is not installed")
+            _tracer = False
+    return _tracer or None
+
+
+@contextmanager
+def _span(kind: str, name: str, attributes: dict):
+    otel_cm = None
+    tracer = _get_otel_tracer() if settings.OTEL_ENABLED else None
+    if tracer is not None:
+        otel_cm = tracer.start_as_current_span(f"{kind}.{name}", attributes=attributes)
+        otel_cm.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        SPAN_DURATION.observe(duration, kind=kind, name=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(SpanRecord(kind, name, start, duration, attributes))
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+
+
+def span(kind: str, name: str, **attributes):
+    """Time a block of work as a span of the given kind (e.g. "llm", "tool").
+
+    Returns a shared no-op context manager when tracing is disabled.
+    """
+    if not settings.TRACING_ENABLED:
+        return _NOOP
+    return _span(kind, name, attributes)
+
+
+def traced(kind: str, name: str):
+    """Decorator form of span(); preserves the wrapped signature and docstring."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def request_trace(endpoint: str):
+    """Collect all spans emitted while handling one request."""
+    trace = RequestTrace(endpoint)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        duration = time.perf_counter() - start
+        if settings.TRACING_ENABLED:
+            REQUEST_DURATION.observe(duration, endpoint=endpoint)
+            logger.info(
+                "Request trace | endpoint=%s total=%.3fs spans=%s",
+                endpoint,
+                duration,
+                {k: round(v, 4) for k, v in trace.summary().items()},
+            )
+
+
+def current_trace() -> RequestTrace | None:
+    return _current_trace.get()
@@ -0,0 +1,152 @@
+import contextvars
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.llm.provider import role_setting
+from app.observability.metrics import Counter
+
+LLM_TOKENS = Counter(
+    "smartflow_llm_tokens_total",
+    "Tokens consumed by LLM calls.",
+    labelnames=("role", "type"),
+)
+LLM_CALLS = Counter(
+    "smartflow_llm_calls_total",
+    "Number of LLM calls.",
+    labelnames=("role",),
+)
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    calls: int = 0
+    cost: float = 0.0  # priced per call at the role's rates, so sums stay right across roles
+
+    def add(self, other: "TokenUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.total_tokens += other.total_tokens
+        self.calls += other.calls
+        self.cost += other.cost
+
+    def as_dict(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "calls": self.calls,
+            "cost": round(self.cost, 6),
+        }
+
+
+@dataclass
+class UsageRecorder:
+    """Token usage broken down by LLM role (classifier, planner, executor, ...)."""
+
+    by_role: dict[str, TokenUsage] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, role: str, usage: TokenUsage) -> None:
+        with self._lock:
+            self.by_role.setdefault(role, TokenUsage()).add(usage)
+
+    def merge(self, other: "UsageRecorder") -> None:
+        for role, usage in list(other.by_role.items()):
+            self.add(role, usage)
+
+    @property
+    def total(self) -> TokenUsage:
+        total = TokenUsage()
+        for usage in list(self.by_role.values()):
+            total.add(usage)
+        return total
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total.as_dict(),
+            "by_role": {role: u.as_dict() for role, u in sorted(self.by_role.items())},
+        }
+
+
+_current_usage: contextvars.ContextVar[UsageRecorder | None] = contextvars.ContextVar(
+    "smartflow_usage", default=None
+)
+# Rolling totals per session, least recently used first. Session ids come from
+# clients, so only the USAGE_MAX_SESSIONS most recently active are kept.
+_session_usage: OrderedDict[str, UsageRecorder] = OrderedDict()
+_session_lock = threading.Lock()
+
+
+def _usage_from_message(message) -> TokenUsage:
+    """Read token counts from an AIMessage across OpenAI / Ollama metadata shapes."""
+    meta = getattr(message, "usage_metadata", None)
+    if meta:
+        prompt = meta.get("input_tokens", 0)
+        completion = meta.get("output_tokens", 0)
+        return TokenUsage(prompt, completion, meta.get("total_tokens", prompt + completion), 1)
+
+    response_meta = getattr(message, "response_metadata", None) or {}
+    token_usage = response_meta.get("token_usage") or {}
+    prompt = token_usage.get("prompt_tokens", response_meta.get("prompt_eval_count", 0)) or 0
+    completion = token_usage.get("completion_tokens", response_meta.get("eval_count", 0)) or 0
+    return TokenUsage(prompt, completion, prompt + completion, 1)
+
+
+def _price(role: str, usage: TokenUsage) -> float:
+    """Cost of usage at the role's LLM_<ROLE>_*_PRICE_PER_1K (default: the global prices)."""
+    prompt_price = role_setting(role, "PROMPT_PRICE_PER_1K", settings.LLM_PROMPT_PRICE_PER_1K)
+    completion_price = role_setting(role, "COMPLETION_PRICE_PER_1K", settings.LLM_COMPLETION_PRICE_PER_1K)
+    return (usage.prompt_tokens * prompt_price + usage.completion_tokens * completion_price) / 1000
+
+
+def record_usage(role: str, message) -> None:
+    """Attribute the usage reported on an LLM response message to role."""
+    usage = _usage_from_message(message)
+    usage.cost = _price(role, usage)
+    LLM_CALLS.inc(role=role)
+    LLM_TOKENS.inc(usage.prompt_tokens, role=role, type="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens, role=role, type="completion")
+    recorder = _current_usage.get()
+    if recorder is not None:
+        recorder.add(role, usage)
+
+
+@contextmanager
+def track_usage():
+    """Collect usage of every LLM call made within the block."""
+    recorder = UsageRecorder()
+    token = _current_usage.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_usage.reset(token)
+
+
+def add_session_usage(session_id: str, recorder: UsageRecorder) -> None:
+    """Fold a request's usage into the rolling totals for its session."""
+    with _session_lock:
+        session = _session_usage.get(session_id)
+        if session is None:
+            session = _session_usage[session_id] = UsageRecorder()
+        else:
+            _session_usage.move_to_end(session_id)
+        while len(_session_usage) > max(settings.USAGE_MAX_SESSIONS, 1):
+            _session_usage.popitem(last=False)
+    session.merge(recorder)
+
+
+def get_session_usage(session_id: str) -> dict | None:
+    session = _session_usage.get(session_id)
+    return session.as_dict() if session is not None else None
+
+
+def list_session_usage() -> dict[str, dict]:
+    with _session_lock:
+        sessions = dict(_session_usage)
+    return {sid: rec.as_dict() for sid, rec in sessions.items()}
@@ -0,0 +1,162 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from app.llm.tokens import estimate_tokens, truncate_to_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Minimum shared prefix/suffix (in characters) for two chunks without start
+# offsets to be treated as neighbouring pieces of the same text.
+MIN_TEXT_OVERLAP = 20
+SHINGLE_SIZE = 3
+MMR_LAMBDA = 0.7
+
+
+@dataclass
+class _Block:
+    """A run of merged chunks from one (source, page)."""
+
+    source: str
+    page: object
+    text: str
+    rank: int  # best (lowest) retrieval rank among merged chunks
+    start: int | None = None
+    end: int | None = None
+    shingles: set = field(default_factory=set)
+
+
+def _shingles(text: str) -> set:
+    compact = "".join(text.split())
+    if len(compact) <= SHINGLE_SIZE:
+        return {compact} if compact else set()
+    return {compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    limit = min(len(left), len(right))
+    for size in range(limit, MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_group(blocks: list[_Block]) -> list[_Block]:
+    """Merge overlapping or adjacent chunks that come from the same source/page."""
+    positioned = sorted((b for b in blocks if b.start is not None), key=lambda b: b.start)
+    merged: list[_Block] = []
+    for block in positioned:
+        prev = merged[-1] if merged else None
+        if prev is not None and block.start <= prev.end:
+            if block.end > prev.end:
+                prev.text += block.text[prev.end - block.start:]
+                prev.end = block.end
+            prev.rank = min(prev.rank, block.rank)
+        else:
+            merged.append(block)
+
+    # Chunks ingested before start offsets were recorded: fall back to
+    # detecting the splitter overlap directly in the text.
+    for block in sorted((b for b in blocks if b.start is None), key=lambda b: b.rank):
+        for other in merged:
+            if other.start is not None:
+                continue
+            if block.text in other.text:
+                other.rank = min(other.rank, block.rank)
+                break
+            overlap = _text_overlap(other.text, block.text)
+            if overlap:
+                other.text += block.text[overlap:]
+                other.rank = min(other.rank, block.rank)
+                break
+            overlap = _text_overlap(block.text, other.text)
+            if overlap:
+                other.text = block.text + other.text[overlap:]
+                other.rank = min(other.rank, block.rank)
+                break
+        else:
+            merged.append(block)
+    return merged
+
+
+def pack_context(
+    docs: list["Document"],
+    token_budget: int,
+    dedup_threshold: float = 0.8,
+) -> list["Document"]:
+    """Pack retrieved chunks into at most token_budget tokens.
+
+    Args:
+        docs: Retrieved chunks, most relevant first.
+        token_budget: Maximum estimated tokens of chunk text to return.
+        dedup_threshold: Shingle Jaccard similarity above which a block is
+            considered a near-duplicate of one already selected.
+
+    Returns merged, de-duplicated Documents in relevance order.
+    """
+    groups: dict[tuple, list[_Block]] = {}
+    for rank, doc in enumerate(docs):
+        meta = doc.metadata or {}
+        start = meta.get("start_index")
+        block = _Block(
+            source=meta.get("source", "未知"),
+            page=meta.get("page", ""),
+            text=doc.page_content,
+            rank=rank,
+            start=start if isinstance(start, int) and start >= 0 else None,
+        )
+        if block.start is not None:
+            block.end = block.start + len(block.text)
+        groups.setdefault((block.source, block.page), []).append(block)
+
+    candidates: list[_Block] = []
+    for group in groups.values():
+        candidates.extend(_merge_group(group))
+    for block in candidates:
+        block.shingles = _shingles(block.text)
+
+    # MMR-style selection: relevance decays with rank, redundancy with what
+    # has already been picked. Blocks past the duplicate threshold are dropped.
+    total = max(len(docs), 1)
+    selected: list[_Block] = []
+    remaining = sorted(candidates, key=lambda b: b.rank)
+    used = 0
+    while remaining and used < token_budget:
+        best, best_score, best_sim = None, float("-inf"), 0.0
+        for block in remaining:
+            sim = max((_jaccard(block.shingles, s.shingles) for s in selected), default=0.0)
+            relevance = 1.0 - block.rank / total
+            score = MMR_LAMBDA * relevance - (1 - MMR_LAMBDA) * sim
+            if score > best_score:
+                best, best_score, best_sim = block, score, sim
+        remaining.remove(best)
+        if best_sim >= dedup_threshold:
+            continue
+
+        cost = estimate_tokens(best.text)
+        if used + cost > token_budget:
+            if selected:
+                continue
+            best.text = truncate_to_tokens(best.text, token_budget)
+            cost = estimate_tokens(best.text)
+        selected.append(best)
+        used += cost
+
+    from langchain_core.documents import Document
+
+    packed = []
+    for block in selected:
+        meta = {"source": block.source}
+        if block.page != "":
+            meta["page"] = block.page
+        if block.start is not None:
+            meta["start_index"] = block.start
+        packed.append(Document(page_content=block.text, metadata=meta))
+    return packed
@@ -12,6 +12,7 @@ class DocumentProcessor:
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
+            add_start_index=True,
             separators=["\n\n", "\n", "。", "！", "？", ".", " ", ""],
         )
 
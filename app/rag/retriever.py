@@ -1,27 +1,74 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from langchain_core.documents import Document
+from app.concurrency.single_flight import normalize_text
+from app.config import settings
+from app.rag.context_packer import pack_context
 
-from app.rag.vector_store import VectorStoreManager
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+    from app.rag.vector_store import VectorStoreManager
 
 
 class RAGRetriever:
     """High-level retrieval interface that wraps VectorStoreManager."""
 
-    def __init__(self, vector_store: VectorStoreManager):
+    def __init__(self, vector_store: "VectorStoreManager"):
         self._store = vector_store
 
     def retrieve(
         self, query: str, collection_name: str, k: int = 4
-    ) -> list[Document]:
+    ) -> list["Document"]:
         """Retrieve relevant documents for a query."""
         return self._store.similarity_search(query, collection_name, k=k)
 
     def retrieve_as_context(
-        self, query: str, collection_name: str, k: int = 4
+        self,
+        query: str,
+        collection_name: str,
+        k: int = 4,
+        token_budget: Optional[int] = None,
     ) -> str:
-        """Retrieve documents and format them as a context string for the LLM."""
-        docs = self.retrieve(query, collection_name, k=k)
+        """Retrieve documents and format them as a context string for the LLM.
+
+        Up to max(k, RAG_FETCH_K) candidates are fetched, then overlapping chunks
+        from the same source/page are merged and near-duplicates dropped until
+        the token budget is filled.
+        """
+        fetch_k = max(k, settings.RAG_FETCH_K)
+        docs = self.retrieve(query, collection_name, k=fetch_k)
+        return self._pack(docs, token_budget)
+
+    def retrieve_many_as_context(
+        self,
+        queries: list[str],
+        collection_name: str,
+        k: int = 4,
+        token_budget: Optional[int] = None,
+    ) -> list[str]:
+        """Like retrieve_as_context for many queries, embedding and searching each
+        distinct (normalized) query once. Returns contexts in input order."""
+        distinct: dict[str, str] = {}
+        for query in queries:
+            distinct.setdefault(normalize_text(query), query)
+        fetch_k = max(k, settings.RAG_FETCH_K)
+        results = self._store.similarity_search_many(list(distinct.values()), collection_name, k=fetch_k)
+        contexts = {key: self._pack(docs, token_budget) for key, docs in zip(distinct, results)}
+        return [contexts[normalize_text(query)] for query in queries]
+
+    def _pack(self, docs: list["Document"], token_budget: Optional[int]) -> str:
+        if not docs:
+            return ""
+        docs = pack_context(
+            docs,
+            token_budget=token_budget or settings.RAG_CONTEXT_TOKEN_BUDGET,
+            dedup_threshold=settings.RAG_DEDUP_THRESHOLD,
+        )
+        return self.format_context(docs)
+
+    @staticmethod
+    def format_context(docs: list["Document"]) -> str:
+        """Render documents as numbered, source-annotated context fragments."""
         if not docs:
             return ""
 
@@ -1,74 +1,177 @@
-from typing import Optional
-
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain_core.documents import Document
+from typing import TYPE_CHECKING, Optional
 
+from app.concurrency.admission import embedding_slot
+from app.concurrency.single_flight import SingleFlight, normalize_text
 from app.config import settings
-from app.llm.provider import get_embeddings
+from app.llm.provider import get_embeddings, get_embedding_model_id
+from app.observability.tracing import span
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Identical concurrent queries (e.g. a burst of users asking the same question)
+# share one embedding call and one Chroma query.
+_embed_flight = SingleFlight("embed_query")
+_search_flight = SingleFlight("similarity_search")
 
 
 class VectorStoreManager:
     """Manages ChromaDB collections for RAG document storage and retrieval."""
 
     def __init__(self):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
         self._client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIR,
             settings=ChromaSettings(anonymized_telemetry=False),
         )
         self._embeddings = None
+        # Collection ids already checked against the embedder; a collection
+        # deleted and re-created elsewhere gets a new id and is checked again.
+        self._checked: set = set()
 
     def _get_embeddings(self):
         if self._embeddings is None:
             self._embeddings = get_embeddings()
         return self._embeddings
 
-    def add_documents(self, docs: list[Document], collection_name: str) -> int:
+    def _check_embedder(self, collection) -> None:
+        """Refuse to mix vectors from different embedding models in one collection."""
+        if collection.id in self._checked:
+            return
+        recorded = (collection.metadata or {}).get("embedder")
+        current = get_embedding_model_id(self._get_embeddings())
+        if recorded and recorded != current:
+            raise ValueError(
+                f"Collection '{collection.name}' was built with embedder '{recorded}', "
+                f"but the configured embedder is '{current}'. Re-index the collection "
+                f"or switch EMBEDDING_PROVIDER back."
+            )
+        self._checked.add(collection.id)
+
+    def add_documents(self, docs: list["Document"], collection_name: str) -> int:
         """Add documents to a named collection. Returns number of chunks added."""
+        embeddings_model = self._get_embeddings()
         collection = self._client.get_or_create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"},
+            metadata={
+                "hnsw:space": "cosine",
+                "embedder": get_embedding_model_id(embeddings_model),
+            },
         )
-        embeddings_model = self._get_embeddings()
+        self._check_embedder(collection)
 
-        texts = [doc.page_content for doc in docs]
-        metadatas = [doc.metadata for doc in docs]
-        embeddings = embeddings_model.embed_documents(texts)
-        ids = [f"{collection_name}_{i}" for i in range(collection.count(), collection.count() + len(docs))]
+        start = collection.count()
+        # Chroma rejects inserts larger than the client's max batch size.
+        batch_size = self._client.get_max_batch_size()
+        for offset in range(0, len(docs), batch_size):
+            batch = docs[offset:offset + batch_size]
+            texts = [doc.page_content for doc in batch]
+            metadatas = [doc.metadata for doc in batch]
+            with embedding_slot(), span("embedding", "documents", count=len(texts)):
+                embeddings = embeddings_model.embed_documents(texts)
+            first = start + offset
+            ids = [f"{collection_name}_{i}" for i in range(first, first + len(batch))]
 
-        collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=texts,
-            metadatas=metadatas,
-        )
+            with span("vector", "add", collection=collection_name):
+                collection.add(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=texts,
+                    metadatas=metadatas,
+                )
         return len(docs)
 
+    def embed_query(self, query: str) -> list[float]:
+        """Embed a query, sharing the call with identical in-flight queries."""
+        embeddings = self._get_embeddings()
+
+        def embed() -> list[float]:
+            with embedding_slot():
+                return embeddings.embed_query(query)
+
+        with span("embedding", "query"):
+            vector, _ = _embed_flight.do((id(embeddings), normalize_text(query)), embed)
+        return vector
+
     def similarity_search(
         self, query: str, collection_name: str, k: int = 4
-    ) -> list[Document]:
+    ) -> list["Document"]:
         """Search a collection for documents similar to the query."""
+        key = (id(self), collection_name, k, normalize_text(query))
+        docs, _ = _search_flight.do(key, self._similarity_search, query, collection_name, k)
+        return list(docs)
+
+    def _similarity_search(
+        self, query: str, collection_name: str, k: int
+    ) -> list["Document"]:
         try:
             collection = self._client.get_collection(name=collection_name)
         except Exception:
             return []
+        self._check_embedder(collection)
 
-        embedding = self._get_embeddings().embed_query(query)
-        results = collection.query(query_embeddings=[embedding], n_results=k)
+        embedding = self.embed_query(query)
+        with span("vector", "query", collection=collection_name, k=k):
+            results = collection.query(query_embeddings=[embedding], n_results=k)
+        return self._to_documents(results)[0]
 
-        docs = []
-        if results and results["documents"]:
-            for text, meta in zip(results["documents"][0], results["metadatas"][0]):
-                docs.append(Document(page_content=text, metadata=meta))
-        return docs
+    def similarity_search_many(
+        self, queries: list[str], collection_name: str, k: int = 4
+    ) -> list[list["Document"]]:
+        """Search many queries at once: one embedding call and one Chroma query for the batch."""
+        if not queries:
+            return []
+        try:
+            collection = self._client.get_collection(name=collection_name)
+        except Exception:
+            return [[] for _ in queries]
+        self._check_embedder(collection)
+
+        with embedding_slot(), span("embedding", "queries", count=len(queries)):
+            embeddings = self._get_embeddings().embed_documents(queries)
+        with span("vector", "query_many", collection=collection_name, k=k, count=len(queries)):
+            results = collection.query(query_embeddings=embeddings, n_results=k)
+        return self._to_documents(results, len(queries))
+
+    @staticmethod
+    def _to_documents(results, n_queries: int = 1) -> list[list["Document"]]:
+        from langchain_core.documents import Document
+
+        if not results or not results["documents"]:
+            return [[] for _ in range(n_queries)]
+        return [
+            [Document(page_content=text, metadata=meta) for text, meta in zip(texts, metas)]
+            for texts, metas in zip(results["documents"], results["metadatas"])
+        ]
+
+    def preload_collection(self, collection_name: str) -> int:
+        """Open a collection and run one query so its HNSW index is loaded into memory.
+
+        Returns the number of chunks in the collection (0 if missing or empty).
+        """
+        try:
+            collection = self._client.get_collection(name=collection_name)
+        except Exception:
+            return 0
+        sample = collection.get(limit=1, include=["embeddings"])
+        if sample["embeddings"] is None or len(sample["embeddings"]) == 0:
+            return 0
+        collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1)
+        return collection.count()
 
     def list_collections(self) -> list[dict]:
-        """List all collections with document counts."""
+        """List all collections with document counts and the embedder that built them."""
         collections = self._client.list_collections()
         result = []
         for col in collections:
             c = self._client.get_collection(col.name)
-            result.append({"name": col.name, "count": c.count()})
+            result.append({
+                "name": col.name,
+                "count": c.count(),
+                "embedder": (c.metadata or {}).get("embedder", ""),
+            })
         return result
 
     def delete_collection(self, collection_name: str) -> bool:
@@ -8,6 +8,10 @@ class ChatRequest(BaseModel):
     agent_mode: str = Field(default="auto", description="Agent mode: react, plan_execute, or auto")
     use_rag: bool = Field(default=False, description="Whether to use RAG knowledge base")
     collection_name: str = Field(default="default", description="RAG collection name to search")
+    stateless: bool = Field(
+        default=False,
+        description="Answer without reading or updating session history; identical concurrent stateless requests are coalesced",
+    )
 
 
 class IntermediateStep(BaseModel):
@@ -16,11 +20,60 @@ class IntermediateStep(BaseModel):
     output: str = ""
 
 
+class TokenUsageInfo(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    calls: int = 0
+    cost: float = 0.0
+
+
+class UsageReport(BaseModel):
+    total: TokenUsageInfo = TokenUsageInfo()
+    by_role: dict[str, TokenUsageInfo] = {}
+
+
 class ChatResponse(BaseModel):
     response: str
     intermediate_steps: list[IntermediateStep] = []
     sources: list[str] = []
     agent_mode: str = ""
+    step_prompt_tokens: list[int] = Field(
+        default=[], description="Estimated prompt tokens of each Plan-Execute executor call"
+    )
+    usage: UsageReport = Field(
+        default_factory=UsageReport, description="Token usage of this request by LLM role"
+    )
+    coalesced: bool = Field(
+        default=False, description="Whether the answer was shared from an identical in-flight request"
+    )
+    iterations: int = Field(
+        default=0, description="LLM rounds of the ReAct loop, or executor calls of Plan-Execute"
+    )
+    stop_reason: str = Field(
+        default="", description="Why ReAct was cut short with a forced answer: 'loop' or 'max_iterations'"
+    )
+
+
+class BatchChatRequest(BaseModel):
+    requests: list[ChatRequest] = Field(
+        ...,
+        description=(
+            "Chat requests to run; items without a session_id run stateless, "
+            "items sharing a session_id run in batch order"
+        ),
+    )
+    concurrency: Optional[int] = Field(
+        default=None, ge=1, description="Requests run at once (default BATCH_CHAT_CONCURRENCY)"
+    )
+
+
+class BatchChatResult(BaseModel):
+    """One NDJSON line of a /api/chat/batch response."""
+
+    index: int = Field(..., description="Position of the request in the batch")
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
 
 
 class DocumentUploadResponse(BaseModel):
@@ -32,9 +85,21 @@ class DocumentUploadResponse(BaseModel):
 class CollectionInfo(BaseModel):
     name: str
     count: int
+    embedder: str = ""
+
+
+class MemoryMaintenanceResponse(BaseModel):
+    size_before: int
+    size_after: int
+    expired: int
+    merged: int
 
 
 class HealthResponse(BaseModel):
     status: str
     llm_provider: str
     model: str
+
+
+class ReadinessResponse(BaseModel):
+    status: str
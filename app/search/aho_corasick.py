@@ -0,0 +1,71 @@
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    value: Any
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher (Aho-Corasick automaton).
+
+    Built once from (pattern, value) pairs; a scan is O(len(text)) no matter
+    how many patterns there are. When the same pattern is added twice the
+    first value wins.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, Any]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Longest pattern ending at each state (own or via the fail chain): (length, value).
+        self._out: list[Optional[tuple[int, Any]]] = [None]
+        self._size = 0
+        for pattern, value in patterns:
+            self._add(pattern, value)
+        self._link()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _add(self, pattern: str, value: Any) -> None:
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            state = nxt
+        if self._out[state] is None:
+            self._out[state] = (len(pattern), value)
+            self._size += 1
+
+    def _link(self) -> None:
+        """Breadth-first fail links; a state without its own pattern inherits its fail state's output."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                if self._out[nxt] is None:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """The longest pattern ending at each position of text, left to right."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = out[state]
+            if found is not None:
+                yield Match(i + 1 - found[0], i + 1, found[1])
@@ -0,0 +1,537 @@
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger("smartflow.search")
+
+FORMAT_NAME = "smartflow-search-index"  # marks directories build() may replace
+FORMAT_VERSION = 1
+_SEPARATOR = "\x1f"  # between title, url and text in the document store
+_DOC_BREAK = "\x1e"  # between documents tokenized together
+
+# Query evaluation: candidates rescored from text at most, and query terms
+# kept (rarest first; one bit each in the per-document seen mask).
+_RESCORE_LIMIT = 64
+_MAX_QUERY_TERMS = 32
+# Snippets are placed within this many leading characters of a document,
+# using at most this many occurrences of each query term.
+_SNIPPET_SCAN_CHARS = 4000
+_SNIPPET_HITS_PER_TERM = 64
+
+# Mixing constants for term hashes (bigram halves, isolated CJK chars, ASCII words).
+_M1 = np.uint64(0x9E3779B97F4A7C15)
+_M2 = np.uint64(0xC2B2AE3D27D4EB4F)
+_M3 = np.uint64(0x165667B19E3779F9)
+_M4 = np.uint64(0xD6E8FEB86659FD93)
+_F1 = np.uint64(0xFF51AFD7ED558CCD)
+_F2 = np.uint64(0xC4CEB9FE1A85EC53)
+
+_CJK_RUN_RE = re.compile(r"[㐀-鿿]+")
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _finalize(h: np.ndarray) -> np.ndarray:
+    """murmur3 fmix64, applied in place on a uint64 array."""
+    h ^= h >> np.uint64(33)
+    h *= _F1
+    h ^= h >> np.uint64(33)
+    h *= _F2
+    h ^= h >> np.uint64(33)
+    return h
+
+
+def term_hashes(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Tokenize normalized text into 64-bit term hashes, vectorized.
+
+    Terms are overlapping bigrams of CJK runs (a lone CJK character is its own
+    term) and lowercase ASCII alphanumeric words. Returns (hashes, positions)
+    where positions are code-point offsets of each term's start.
+    """
+    cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    n = len(cps)
+    if n == 0:
+        empty = np.empty(0, dtype=np.uint64)
+        return empty, empty.astype(np.int64)
+
+    cjk = (cps >= 0x3400) & (cps <= 0x9FFF)
+    prev_cjk = np.concatenate(([False], cjk[:-1]))
+    next_cjk = np.concatenate((cjk[1:], [False]))
+
+    bigram_pos = np.flatnonzero(cjk & next_cjk)
+    bigrams = cps[bigram_pos] * _M1 + cps[bigram_pos + 1] * _M2 + np.uint64(1)
+
+    single_pos = np.flatnonzero(cjk & ~prev_cjk & ~next_cjk)
+    singles = cps[single_pos] * _M3 + np.uint64(2)
+
+    alnum = ((cps >= 48) & (cps <= 57)) | ((cps >= 97) & (cps <= 122))
+    word_chars = np.flatnonzero(alnum)
+    if len(word_chars):
+        prev_alnum = np.concatenate(([False], alnum[:-1]))
+        word_pos = np.flatnonzero(alnum & ~prev_alnum)
+        # Index into word_chars where each word starts, and each char's offset in its word.
+        starts = np.searchsorted(word_chars, word_pos)
+        lengths = np.diff(np.append(starts, len(word_chars)))
+        offset = np.arange(len(word_chars)) - np.repeat(starts, lengths)
+        powers = np.cumprod(np.full(int(lengths.max()), _M4, dtype=np.uint64))
+        words = np.add.reduceat(cps[word_chars] * powers[offset], starts)
+        words += lengths.astype(np.uint64) * _M2 + np.uint64(3)
+    else:
+        word_pos = np.empty(0, dtype=np.int64)
+        words = np.empty(0, dtype=np.uint64)
+
+    hashes = _finalize(np.concatenate((bigrams, singles, words)))
+    positions = np.concatenate((bigram_pos, single_pos, word_pos))
+    return hashes, positions
+
+
+def _tokenize_docs(texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Term hashes of several documents in one pass: (hashes, doc index per term, terms per doc).
+
+    Documents are joined with a separator that is never part of a term, so
+    no term spans two documents.
+    """
+    joined = _normalize(_DOC_BREAK.join(texts))
+    hashes, positions = term_hashes(joined)
+    starts = np.cumsum([0] + [len(part) + 1 for part in joined.split(_DOC_BREAK)[:-1]])
+    docs = np.searchsorted(starts, positions, side="right") - 1
+    return hashes, docs, np.bincount(docs, minlength=len(texts))
+
+
+def query_terms(text: str) -> list[str]:
+    """The same terms as term_hashes, as strings (used to place snippets)."""
+    text = _normalize(text)
+    terms = []
+    for run in _CJK_RUN_RE.findall(text):
+        terms.extend([run] if len(run) == 1 else [run[i : i + 2] for i in range(len(run) - 1)])
+    terms.extend(_WORD_RE.findall(text))
+    return terms
+
+
+@dataclass
+class SearchHit:
+    title: str
+    url: str
+    snippet: str
+    score: float
+
+
+class SearchIndex:
+    """Immutable BM25 inverted index, memory-mapped from disk.
+
+    Files in the index directory (all arrays as .npy, opened with mmap):
+      terms      sorted unique term hashes (uint64)
+      offsets    postings range per term (uint64, len(terms) + 1)
+      idf        BM25 idf per term (float32)
+      postings   doc ids per term, in descending impact order (uint32)
+      impacts    BM25 tf/length component per posting (float32), so a
+                 document's score is sum(idf * impact) over query terms
+      doc_offsets byte ranges in docs.bin (uint64, n_docs + 1)
+      docs.bin   "title \\x1f url \\x1f text" per document, UTF-8
+      meta.json  format version, counts, BM25 parameters, corpus signature
+    Nothing is parsed at open time, so opening is O(1) in corpus size and
+    pages are loaded by the OS as queries touch them.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_NAME or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{directory} is not a {FORMAT_NAME} v{FORMAT_VERSION} index")
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self.terms = load("terms")
+        self.offsets = load("offsets")
+        self.idf = load("idf")
+        self.postings = load("postings")
+        self.impacts = load("impacts")
+        self.doc_offsets = load("doc_offsets")
+        self._docs_file = open(os.path.join(directory, "docs.bin"), "rb")
+        size = os.fstat(self._docs_file.fileno()).st_size
+        self._docs = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._local = threading.local()
+
+    def __len__(self) -> int:
+        return int(self.meta["n_docs"])
+
+    def close(self) -> None:
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._docs_file.close()
+
+    def document(self, doc_id: int) -> tuple[str, str, str]:
+        start, end = int(self.doc_offsets[doc_id]), int(self.doc_offsets[doc_id + 1])
+        title, url, text = self._docs[start:end].decode("utf-8").split(_SEPARATOR, 2)
+        return title, url, text
+
+    def _buffers(self) -> tuple[np.ndarray, np.ndarray]:
+        """Per-thread dense score and seen-term arrays; callers reset what they touch."""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = (np.zeros(len(self), dtype=np.float32), np.zeros(len(self), dtype=np.uint32))
+        return buffers
+
+    def search(self, query: str, k: int = 3, max_postings: int = 0, snippet_chars: int = 80) -> list[SearchHit]:
+        """Top-k documents by BM25, with snippets.
+
+        ``max_postings`` (0 = unlimited) caps how many postings are read per
+        query term. Lists are impact-ordered, so only the low-impact tail of
+        very common terms is skipped; candidates that may be missing a
+        skipped contribution and could still reach the top k are rescored
+        exactly from their text.
+        """
+        hashes, _ = term_hashes(_normalize(query))
+        if len(hashes) == 0 or len(self.terms) == 0:
+            return []
+        hashes = np.unique(hashes)
+        idx = np.searchsorted(self.terms, hashes)
+        inside = idx < len(self.terms)
+        idx, hashes = idx[inside], hashes[inside]
+        idx = idx[self.terms[idx] == hashes]
+        if len(idx) == 0:
+            return []
+        idx = idx[np.argsort(-self.idf[idx], kind="stable")][:_MAX_QUERY_TERMS]
+        idf = np.asarray(self.idf[idx])
+
+        # Term-at-a-time into per-thread dense arrays. ``seen`` has one
+        # bit per query term, ``skipped`` the best impact left unread per term.
+        scores, seen = self._buffers()
+        candidates = []
+        skipped = np.zeros(len(idx), dtype=np.float32)
+        try:
+            for i, t in enumerate(idx):
+                start, end = int(self.offsets[t]), int(self.offsets[t + 1])
+                if max_postings and end - start > max_postings:
+                    end = start + max_postings
+                    skipped[i] = idf[i] * self.impacts[end]
+                docs = self.postings[start:end].astype(np.intp)  # intp indexes fastest
+                candidates.append(docs[seen[docs] == 0])
+                np.add.at(scores, docs, idf[i] * self.impacts[start:end])
+                seen[docs] |= np.uint32(1 << i)
+            pool = np.concatenate(candidates)
+            partial = scores[pool]
+            mask = seen[pool]
+        finally:
+            for docs in candidates:
+                scores[docs] = 0
+                seen[docs] = 0
+
+        exact = np.ones(len(pool), dtype=bool)
+        if skipped.any():
+            missing = np.zeros(len(pool), dtype=np.float32)
+            for i in np.flatnonzero(skipped):
+                missing[(mask & np.uint32(1 << i)) == 0] += skipped[i]
+            exact = missing == 0
+            theta = _kth_largest(partial, k)
+            upper = partial + missing
+            open_ = np.flatnonzero(~exact & (upper > theta))
+            if len(open_) > _RESCORE_LIMIT:
+                open_ = open_[np.argpartition(-upper[open_], _RESCORE_LIMIT - 1)[:_RESCORE_LIMIT]]
+            if len(open_):
+                partial[open_] = self._rescore(pool[open_], np.asarray(self.terms[idx]), idf)
+                exact[open_] = True
+
+        final = np.flatnonzero(exact)
+        if len(final) > k:
+            final = final[np.argpartition(-partial[final], k - 1)[:k]]
+        final = final[np.argsort(-partial[final], kind="stable")]
+
+        terms = query_terms(query)
+        hits = []
+        for i in final:
+            if partial[i] <= 0:
+                break
+            title, url, text = self.document(int(pool[i]))
+            hits.append(SearchHit(title, url, make_snippet(text, terms, snippet_chars), float(partial[i])))
+        return hits
+
+    def _rescore(self, doc_ids: np.ndarray, term_hashes_: np.ndarray, idf: np.ndarray) -> np.ndarray:
+        """Exact BM25 of a few documents for the given terms, from their stored text."""
+        texts = []
+        for doc_id in doc_ids:
+            title, _, text = self.document(int(doc_id))
+            texts.append(f"{title}\n{text}")
+        hashes, docs, doc_len = _tokenize_docs(texts)
+
+        order = np.argsort(term_hashes_)
+        pos = np.searchsorted(term_hashes_[order], hashes)
+        pos = np.minimum(pos, len(order) - 1)
+        match = term_hashes_[order][pos] == hashes
+        term_index = order[pos[match]]
+        tf = np.zeros((len(texts), len(term_hashes_)), dtype=np.float32)
+        np.add.at(tf, (docs[match], term_index), 1)
+
+        k1, b = self.meta["k1"], self.meta["b"]
+        norm = k1 * (1 - b + b * doc_len / max(self.meta["avgdl"], 1e-9))
+        impacts = tf * (k1 + 1) / (tf + norm[:, None])
+        return (impacts * idf).sum(axis=1).astype(np.float32)
+
+    # ---------------- building ----------------
+
+    @staticmethod
+    def build(
+        documents: Iterable[dict],
+        directory: str,
+        signature: str = "",
+        chunk_size: int = 20000,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> "SearchIndex":
+        """Index documents ({"title", "url", "text"}) into directory, replacing any index there.
+
+        The index is written to a private temporary directory next to the
+        target and renamed into place, so concurrent builders (several workers
+        starting at once) never touch each other's files. A directory that is
+        not a search index is never replaced.
+        """
+        directory = os.path.abspath(directory)
+        if os.path.isdir(directory) and os.listdir(directory) and _index_meta(directory) is None:
+            raise ValueError(f"{directory} exists and is not a search index; refusing to replace it")
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=os.path.basename(directory) + ".building-", dir=parent)
+        try:
+            SearchIndex._write(documents, tmp, signature, chunk_size, k1, b)
+            _install(tmp, directory, signature)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)  # already gone once installed
+        return SearchIndex(directory)
+
+    @staticmethod
+    def _write(documents: Iterable[dict], tmp: str, signature: str, chunk_size: int, k1: float, b: float) -> None:
+        term_parts, doc_parts, tf_parts, lengths = [], [], [], []
+        doc_offsets = [0]
+        n_docs = 0
+        with open(os.path.join(tmp, "docs.bin"), "wb") as store:
+            for chunk in _chunks(documents, chunk_size):
+                texts = []
+                for doc in chunk:
+                    title, url, text = doc.get("title", ""), doc.get("url", ""), doc.get("text", "")
+                    record = f"{title}{_SEPARATOR}{url}{_SEPARATOR}{text}".encode("utf-8")
+                    store.write(record)
+                    doc_offsets.append(doc_offsets[-1] + len(record))
+                    texts.append(f"{title}\n{text}")
+                hashes, docs, doc_len = _tokenize_docs(texts)
+                lengths.append(doc_len)
+
+                # Term frequency per (term, doc) pair.
+                order = np.lexsort((docs, hashes))
+                hashes, docs = hashes[order], docs[order]
+                boundary = np.ones(len(hashes), dtype=bool)
+                boundary[1:] = (hashes[1:] != hashes[:-1]) | (docs[1:] != docs[:-1])
+                first = np.flatnonzero(boundary)
+                term_parts.append(hashes[first])
+                doc_parts.append((docs[first] + n_docs).astype(np.uint32))
+                tf_parts.append(np.diff(np.append(first, len(hashes))).astype(np.uint32))
+                n_docs += len(texts)
+
+        term_col = np.concatenate(term_parts) if term_parts else np.empty(0, dtype=np.uint64)
+        doc_col = np.concatenate(doc_parts) if doc_parts else np.empty(0, dtype=np.uint32)
+        tf_col = np.concatenate(tf_parts).astype(np.float32) if tf_parts else np.empty(0, dtype=np.float32)
+        del term_parts, doc_parts, tf_parts
+        doc_len = np.concatenate(lengths).astype(np.float32) if lengths else np.empty(0, dtype=np.float32)
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+
+        # BM25 impact per posting, then group by term with each posting list in
+        # descending impact order (ties in doc order), so a prefix of a list
+        # holds the documents where the term matters most.
+        norm = k1 * (1 - b + b * doc_len[doc_col] / max(avgdl, 1e-9))
+        impacts = (tf_col * (k1 + 1) / (tf_col + norm)).astype(np.float32)
+        del tf_col, norm
+        order = np.lexsort((doc_col, -impacts, term_col))
+        term_col, doc_col, impacts = term_col[order], doc_col[order], impacts[order]
+        del order
+        boundary = np.ones(len(term_col), dtype=bool)
+        boundary[1:] = term_col[1:] != term_col[:-1]
+        first = np.flatnonzero(boundary)
+        terms = term_col[first]
+        offsets = np.append(first, len(term_col)).astype(np.uint64)
+        df = np.diff(offsets).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        for name, array in (
+            ("terms", terms), ("offsets", offsets), ("idf", idf), ("postings", doc_col),
+            ("impacts", impacts), ("doc_offsets", np.array(doc_offsets, dtype=np.uint64)),
+        ):
+            np.save(os.path.join(tmp, f"{name}.npy"), array)
+        meta = {
+            "format": FORMAT_NAME, "version": FORMAT_VERSION, "n_docs": n_docs, "n_terms": len(terms), "n_postings": len(doc_col),
+            "avgdl": avgdl, "k1": k1, "b": b, "signature": signature,
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+def _index_meta(directory: str) -> Optional[dict]:
+    """meta.json of a search index in directory; None if it is not one of ours."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) and meta.get("format") == FORMAT_NAME else None
+
+
+def _install(tmp: str, directory: str, signature: str) -> None:
+    """Rename the finished index tmp to directory, retiring the index there."""
+    for _ in range(5):
+        if os.path.isdir(directory):
+            meta = _index_meta(directory)
+            if meta is None:
+                if os.listdir(directory):
+                    raise ValueError(f"{directory} exists and is not a search index; refusing to replace it")
+                os.rmdir(directory)
+            elif signature and meta.get("signature") == signature and meta.get("version") == FORMAT_VERSION:
+                return  # another process installed the same index meanwhile
+            else:
+                retired = tempfile.mkdtemp(prefix=os.path.basename(directory) + ".old-", dir=os.path.dirname(directory))
+                try:
+                    os.replace(directory, retired)
+                except FileNotFoundError:
+                    pass  # retired by another process first
+                shutil.rmtree(retired, ignore_errors=True)
+        try:
+            os.replace(tmp, directory)
+            return
+        except OSError:
+            continue  # another process put a directory there in between; look again
+    raise OSError(f"Could not install search index into {directory}")
+
+
+def _kth_largest(values: np.ndarray, k: int) -> float:
+    if len(values) <= k:
+        return float(values.min()) if len(values) else 0.0
+    return float(np.partition(values, len(values) - k)[len(values) - k])
+
+
+def make_snippet(text: str, terms: list[str], width: int = 80) -> str:
+    """Window of about ``width`` characters covering the most distinct query terms.
+
+    Only the start of the document is searched (_SNIPPET_SCAN_CHARS, at most
+    _SNIPPET_HITS_PER_TERM hits per term), so long documents cost no more
+    than short ones.
+    """
+    head = text[: _SNIPPET_SCAN_CHARS * 2]
+    flat = " ".join(head.split())
+    if len(flat) <= width:
+        return flat
+    lowered = _normalize(flat[:_SNIPPET_SCAN_CHARS])
+    hits = sorted(
+        (m.start(), term)
+        for term in set(terms)
+        for m in itertools.islice(re.finditer(re.escape(term), lowered), _SNIPPET_HITS_PER_TERM)
+    )
+    # Sliding window over the hits, counting each term inside [hits[lo], hits[lo] + width).
+    best_start, best_count = 0, 0
+    counts: dict[str, int] = {}
+    hi = 0
+    for pos, term in hits:
+        while hi < len(hits) and hits[hi][0] < pos + width:
+            counts[hits[hi][1]] = counts.get(hits[hi][1], 0) + 1
+            hi += 1
+        if len(counts) > best_count:
+            best_start, best_count = pos, len(counts)
+        counts[term] -= 1
+        if not counts[term]:
+            del counts[term]
+    start = max(0, min(best_start - width // 4, len(flat) - width))
+    snippet = flat[start : start + width]
+    more = start + width < len(flat) or len(head) < len(text)
+    return ("…" if start > 0 else "") + snippet + ("…" if more else "")
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------- corpus ----------------
+
+
+def load_corpus(directory: str) -> Iterator[dict]:
+    """Documents from *.jsonl (one {"title", "url", "text"} per line) and *.txt / *.md files."""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        elif name.endswith((".txt", ".md")):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            title = next((line.strip("# ").strip() for line in text.splitlines() if line.strip()), name)
+            yield {"title": title, "url": f"file://{name}", "text": text}
+
+
+def corpus_signature(directory: str) -> str:
+    """Changes whenever a corpus file is added, removed or modified."""
+    h = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        st = os.stat(os.path.join(directory, name))
+        h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """Shared index over SEARCH_DOCS_DIR, (re)built into SEARCH_INDEX_DIR when missing or stale."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _open_or_build(settings.SEARCH_DOCS_DIR, settings.SEARCH_INDEX_DIR)
+    return _index
+
+
+def _open_or_build(docs_dir: str, index_dir: str) -> Optional[SearchIndex]:
+    if not os.path.isdir(docs_dir):
+        if os.path.isdir(index_dir):
+            return SearchIndex(index_dir)
+        logger.warning("Search corpus %s not found, web_search has no index", docs_dir)
+        return None
+    signature = corpus_signature(docs_dir)
+    try:
+        index = SearchIndex(index_dir)
+        if index.meta.get("signature") == signature:
+            return index
+        index.close()
+    except (OSError, ValueError):
+        pass
+    logger.info("Building search index for %s", docs_dir)
+    try:
+        index = SearchIndex.build(load_corpus(docs_dir), index_dir, signature=signature)
+    except ValueError:
+        logger.error("Not building the search index", exc_info=True)
+        return None
+    logger.info("Indexed %d documents (%d terms)", len(index), index.meta["n_terms"])
+    return index
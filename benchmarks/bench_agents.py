@@ -0,0 +1,147 @@
+"""In-process end-to-end benchmark of the agents on the offline fake provider.
+
+Usage:
+    python -m benchmarks.bench_agents --scenario all --requests 200 --concurrency 1,8,32
+    python -m benchmarks.bench_agents --scenario rag --llm-latency-ms 50 --json report.json
+    python -m benchmarks.bench_agents --scenario react --llm-repeat-rate 0.5 [--no-loop-guard]
+"""
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import SAMPLE_DOCS_DIR, WORKLOADS, latency_summary, use_fake_provider, write_json
+
+SCENARIOS = ("react", "plan_execute", "auto", "rag")
+RAG_COLLECTION = "bench_docs"
+
+
+def _ingest_sample_docs(supervisor) -> int:
+    import os
+
+    from app.rag.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    total = 0
+    for name in sorted(os.listdir(SAMPLE_DOCS_DIR)):
+        docs = processor.load_file(os.path.join(SAMPLE_DOCS_DIR, name))
+        total += supervisor.vector_store.add_documents(docs, RAG_COLLECTION)
+    return total
+
+
+def run_scenario(supervisor, scenario: str, requests: int, concurrency: int, stateless: bool = False) -> dict:
+    from app.observability.tracing import request_trace
+
+    queries = WORKLOADS[scenario]
+    mode = "react" if scenario == "rag" else scenario
+    counter = itertools.count()
+
+    def one(i: int):
+        query = queries[i % len(queries)]
+        with request_trace(f"bench:{scenario}") as trace:
+            start = time.perf_counter()
+            result = supervisor.invoke(
+                query=query,
+                session_id=f"bench-{scenario}-{next(counter) % concurrency}",
+                mode=mode,
+                use_rag=scenario == "rag",
+                collection_name=RAG_COLLECTION,
+                stateless=stateless,
+            )
+            elapsed = time.perf_counter() - start
+        return elapsed, trace.summary(), result.get("iterations", 0)
+
+    # Warm up graphs, clients and caches outside the measured window.
+    one(0)
+
+    latencies, stage_totals, iterations, errors = [], {}, 0, 0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one, i) for i in range(requests)]
+        for fut in futures:
+            try:
+                elapsed, stages, rounds = fut.result()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            iterations += rounds
+            for key, seconds in stages.items():
+                stage_totals[key] = stage_totals.get(key, 0.0) + seconds
+    wall = time.perf_counter() - wall_start
+
+    done = len(latencies)
+    return {
+        "scenario": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(done / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "mean_iterations": round(iterations / max(done, 1), 2),
+        "stages_ms_per_request": {
+            k: round(v * 1000 / max(done, 1), 3) for k, v in sorted(stage_totals.items())
+        },
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    header = f"{'scenario':<14}{'conc':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'iters':>7}{'err':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["latency_ms"]
+        print(
+            f"{r['scenario']:<14}{r['concurrency']:>6}{r['throughput_rps']:>10.1f}"
+            f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{lat['p99']:>10.2f}{r['mean_iterations']:>7.2f}{r['errors']:>6}"
+        )
+    for r in results:
+        print(f"\n[{r['scenario']} @ {r['concurrency']}] per-stage mean ms/request")
+        for key, ms in sorted(r["stages_ms_per_request"].items(), key=lambda kv: -kv[1]):
+            print(f"  {key:<40}{ms:>10.3f}")
+
+
+def main(argv=None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="all", choices=("all",) + SCENARIOS)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated worker counts")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-repeat-rate", type=float, default=0.0, help="chance the model repeats its tool calls")
+    parser.add_argument("--no-loop-guard", action="store_true", help="disable the tool memo and ReAct loop detection")
+    parser.add_argument("--stateless", action="store_true", help="send stateless requests (identical in-flight ones coalesce)")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    if args.no_loop_guard:
+        overrides.update(TOOL_MEMO_ENABLED="false", REACT_LOOP_TOLERANCE=100)
+    use_fake_provider(
+        FAKE_LLM_LATENCY_MS=args.llm_latency_ms,
+        FAKE_LLM_JITTER_MS=args.llm_jitter_ms,
+        FAKE_EMBEDDING_LATENCY_MS=args.embedding_latency_ms,
+        FAKE_LLM_REPEAT_RATE=args.llm_repeat_rate,
+        **overrides,
+    )
+    from app.agent.supervisor import SupervisorAgent
+
+    supervisor = SupervisorAgent()
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    if "rag" in scenarios:
+        _ingest_sample_docs(supervisor)
+
+    results = []
+    for scenario in scenarios:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            results.append(run_scenario(supervisor, scenario, args.requests, concurrency, args.stateless))
+
+    print_report(results)
+    write_json(results, args.json)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Throughput of /api/chat/batch against sequential /api/chat calls.
+
+Runs in-process against the ASGI app on the offline fake provider: the same
+question set (benchmark workloads, a share of them RAG over data/sample_docs)
+is sent once as sequential /api/chat calls and once as a single batch, and
+the throughput of both is reported.
+
+Usage:
+    python -m benchmarks.bench_batch --requests 200 --concurrency 16 --llm-latency-ms 50
+    python -m benchmarks.bench_batch --requests 1000 --sequential 100 --json batch.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import SAMPLE_DOCS_DIR, WORKLOADS, use_fake_provider, write_json
+
+COLLECTION = "bench_batch"
+
+
+def _build_requests(count: int, sessions: int) -> list[dict]:
+    questions = [(q, False) for q in WORKLOADS["react"]] + [(q, True) for q in WORKLOADS["rag"]]
+    requests = []
+    for i in range(count):
+        query, use_rag = questions[i % len(questions)]
+        requests.append({
+            "message": query,
+            "session_id": f"batch-{i % sessions}",
+            "agent_mode": "react",
+            "use_rag": use_rag,
+            "collection_name": COLLECTION,
+        })
+    return requests
+
+
+async def _run(args) -> dict:
+    import httpx
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+        for name in sorted(os.listdir(SAMPLE_DOCS_DIR)):
+            with open(os.path.join(SAMPLE_DOCS_DIR, name), "rb") as f:
+                resp = await client.post(
+                    "/api/documents/upload", files={"file": (name, f.read())}, data={"collection_name": COLLECTION}
+                )
+            resp.raise_for_status()
+
+        requests = _build_requests(args.requests, args.sessions)
+
+        sequential = requests[: args.sequential or len(requests)]
+        start = time.perf_counter()
+        for payload in sequential:
+            (await client.post("/api/chat", json=payload)).raise_for_status()
+        seq_seconds = time.perf_counter() - start
+
+        errors = 0
+        start = time.perf_counter()
+        body = {"requests": requests, "concurrency": args.concurrency}
+        async with client.stream("POST", "/api/chat/batch", json=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                errors += json.loads(line)["error"] is not None
+        batch_seconds = time.perf_counter() - start
+
+    seq_rps = len(sequential) / seq_seconds if seq_seconds else 0.0
+    batch_rps = len(requests) / batch_seconds if batch_seconds else 0.0
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "sessions": args.sessions,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "sequential": {"requests": len(sequential), "seconds": round(seq_seconds, 3), "rps": round(seq_rps, 2)},
+        "batch": {
+            "requests": len(requests),
+            "seconds": round(batch_seconds, 3),
+            "rps": round(batch_rps, 2),
+            "errors": errors,
+        },
+        "speedup": round(batch_rps / seq_rps, 2) if seq_rps else 0.0,
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="questions in the batch")
+    parser.add_argument("--sequential", type=int, default=0, help="sequential calls to time (0 = same as --requests)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=50, help="distinct session IDs across the batch")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    use_fake_provider(FAKE_LLM_LATENCY_MS=args.llm_latency_ms)
+    report = asyncio.run(_run(args))
+
+    seq, batch = report["sequential"], report["batch"]
+    print(f"sequential  n={seq['requests']:<6} {seq['seconds']:>8.2f}s  {seq['rps']:>8.2f} req/s")
+    print(
+        f"batch       n={batch['requests']:<6} {batch['seconds']:>8.2f}s  {batch['rps']:>8.2f} req/s  errors={batch['errors']}"
+    )
+    print(f"speedup     {report['speedup']:.2f}x")
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Calculator latency on ordinary expressions and on pathological ones.
+
+Times the everyday expressions agents send (first parse and parse-cache hit),
+then each pathological case: towers like ``9**9**9`` that the old evaluator
+would hang on, huge products, deep nesting and float overflow. Every case
+reports which path handled it (inline, worker, rejected or timeout) and how
+long the caller waited. A final case raises the limits far enough that a power
+runs past ``--timeout`` in the worker, to show it is killed on time.
+
+Batch mode is compared with one call per row: a growth-rate formula over
+``--batch-rows`` months, evaluated as that many scalar calls versus one call
+with ``variables`` (in an agent every scalar call is also an LLM turn).
+
+Usage:
+    python -m benchmarks.bench_calculator
+    python -m benchmarks.bench_calculator --runs 2000 --timeout 1 --json calculator.json
+    python -m benchmarks.bench_calculator --batch-rows 12,120,1000
+"""
+
+import argparse
+import importlib
+import random
+import time
+
+from benchmarks.common import latency_summary, use_fake_provider, write_json
+
+NORMAL = [
+    "(123 + 456) * 2",
+    "(2100000 - 1890000) / 1890000 * 100",
+    "2850000 / 2650000 * 100 - 100",
+    "3.14159 * 12 ** 2",
+    "1000 * (1 + 0.05) ** 10",
+    "2 ** 64 - 1",
+    "17 // 5 + 17 % 5",
+]
+
+PATHOLOGICAL = [
+    ("exponent tower", "9**9**9"),
+    ("huge exponent", "10**10**8"),
+    ("large power (worker)", "2**5000"),
+    ("large product (worker)", "7**9000 * 3**4000"),
+    ("product over digit limit", "2**9999 * 2**9999 * 2**9999 * 2**9999"),
+    ("float overflow", "2.0**5000"),
+    ("too many nodes", "(1+2)*" * 80 + "1"),
+    ("too long", "1+" * 300 + "1"),
+]
+
+
+def _outcome(output: str) -> str:
+    return output.split(": ", 1)[1][:60] if ": " in output else output[:60]
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=1000, help="timed runs per normal expression")
+    parser.add_argument("--timeout", type=float, default=2.0, help="CALCULATOR_TIMEOUT for the worker")
+    parser.add_argument("--batch-rows", default="12,36,120", help="comma-separated row counts for batch mode")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    use_fake_provider(CALCULATOR_TIMEOUT=args.timeout)
+    # The tools package re-exports the function under the module's name.
+    calc = importlib.import_module("app.agent.tools.calculator")
+
+    calc._parse.cache_clear()
+    first, cached = [], []
+    for expression in NORMAL:
+        t = time.perf_counter()
+        calc.calculator(expression)
+        first.append(time.perf_counter() - t)
+        for _ in range(args.runs):
+            t = time.perf_counter()
+            calc.calculator(expression)
+            cached.append(time.perf_counter() - t)
+    # Scaled by 1000 so the summary's "ms" are µs.
+    normal = {"first_parse": latency_summary([v * 1000 for v in first]), "cached": latency_summary([v * 1000 for v in cached])}
+    print(f"\n{'normal expressions (µs)':<28}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for label, lat in normal.items():
+        print(f"{label:<28}{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}")
+
+    calc.start_worker_server()  # as the app's warm-up does
+    cases = []
+    print(f"\n{'case':<28}{'path':<10}{'ms':>10}   result")
+    for label, expression in PATHOLOGICAL:
+        before = {p: calc.CALCULATOR_EVALUATIONS.value(path=p) for p in ("inline", "worker", "rejected", "timeout")}
+        t = time.perf_counter()
+        output = calc.calculator(expression)
+        elapsed = (time.perf_counter() - t) * 1000
+        path = next(p for p in before if calc.CALCULATOR_EVALUATIONS.value(path=p) > before[p])
+        cases.append({"case": label, "path": path, "ms": round(elapsed, 2), "result": _outcome(output)})
+        print(f"{label:<28}{path:<10}{elapsed:>10.2f}   {_outcome(output)}")
+
+    # Limits lifted so the power is accepted; only the timeout stops it.
+    unbounded = calc._Limits(max_nodes=200, max_exponent=10**9, max_digits=10**9, inline_digits=1000)
+    t = time.perf_counter()
+    try:
+        calc._evaluate_in_worker("3**(10**8)", unbounded, args.timeout)
+        result = "finished"
+    except TimeoutError as e:
+        result = str(e)
+    elapsed = (time.perf_counter() - t) * 1000
+    cases.append({"case": "runaway power (limits lifted)", "path": "timeout", "ms": round(elapsed, 2), "result": result})
+    print(f"{'runaway power (lifted)':<28}{'timeout':<10}{elapsed:>10.2f}   {result}")
+
+    rng = random.Random(0)
+    calc.calculator("x + 1", {"x": [1]})  # import numpy outside the timings
+    batch = []
+    print(f"\n{'rows':>6}{'scalar calls ms':>18}{'one batch call ms':>20}{'speedup':>10}")
+    for rows in (int(r) for r in args.batch_rows.split(",")):
+        sales = [rng.randint(1_000_000, 5_000_000) for _ in range(rows + 1)]
+        cur, prev = sales[1:], sales[:-1]
+        t = time.perf_counter()
+        for c, p in zip(cur, prev):
+            calc.calculator(f"({c} - {p}) / {p} * 100")
+        scalar_ms = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        calc.calculator("(cur - prev) / prev * 100", {"cur": cur, "prev": prev})
+        batch_ms = (time.perf_counter() - t) * 1000
+        batch.append({"rows": rows, "scalar_calls_ms": round(scalar_ms, 3), "batch_call_ms": round(batch_ms, 3)})
+        print(f"{rows:>6}{scalar_ms:>18.2f}{batch_ms:>20.2f}{scalar_ms / batch_ms:>9.1f}x")
+
+    report = {"normal": normal, "pathological": cases, "batch": batch}
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
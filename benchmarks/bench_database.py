@@ -0,0 +1,115 @@
+"""Latency of the SQLite sales database as the order table grows.
+
+Builds a throwaway database, grows it step by step with synthetic orders and,
+at each size, times the database_query paths (order lookup by ID, monthly
+sales, annual summary) against the materialized aggregates, next to a
+recompute-from-orders baseline that scans the rows the aggregates replace.
+Also reports bulk load rate and single-order insert latency (aggregates are
+updated by the insert trigger).
+
+Usage:
+    python -m benchmarks.bench_database
+    python -m benchmarks.bench_database --sizes 10000,100000,1000000,3000000 --json db.json
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import latency_summary, write_json
+
+PRODUCTS = ["智能手表Pro", "智能手表Ultra", "无线耳机X1", "无线耳机X2", "蓝牙音箱S3", "平板电脑M1", "充电宝P5"]
+STATUSES = ["已完成", "待发货", "运输中", "已退货"]
+YEARS = (2022, 2023, 2024)
+
+SCAN_MONTH = "SELECT sum(amount), count(*) FROM orders WHERE month = ?"
+SCAN_YEAR = "SELECT sum(amount), count(*) FROM orders WHERE month BETWEEN ? || '-01' AND ? || '-12'"
+
+
+def synthetic_orders(start: int, count: int, seed: int = 0):
+    rng = random.Random(seed + start)
+    for i in range(start, start + count):
+        year = YEARS[rng.randrange(len(YEARS))]
+        yield {
+            "order_id": f"ORD-B{i:09d}",
+            "order_date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "product": PRODUCTS[rng.randrange(len(PRODUCTS))],
+            "amount": rng.randint(99, 4999),
+            "status": STATUSES[rng.randrange(len(STATUSES))],
+        }
+
+
+def _time(fn, args_list) -> dict:
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    summary = latency_summary(latencies)
+    return {k: round(v * 1000, 1) for k, v in summary.items()}  # ms -> µs
+
+
+def measure(db, size: int, lookups: int, rng: random.Random) -> dict:
+    order_ids = [(f"ORD-B{rng.randrange(size):09d}",) for _ in range(lookups)]
+    months = [(f"{YEARS[rng.randrange(len(YEARS))]}-{rng.randint(1, 12):02d}",) for _ in range(lookups)]
+    years = [(str(YEARS[rng.randrange(len(YEARS))]),) for _ in range(lookups)]
+    scans = max(lookups // 20, 5)
+    reader = db._reader()
+
+    result = {
+        "order_lookup": _time(db.get_order, order_ids),
+        "monthly_sales": _time(db.get_month, months),
+        "annual_summary": _time(db.get_year, years),
+        "monthly_scan_baseline": _time(lambda m: reader.execute(SCAN_MONTH, (m,)).fetchone(), months[:scans]),
+        "annual_scan_baseline": _time(lambda y: reader.execute(SCAN_YEAR, (y, y)).fetchone(), years[:scans]),
+    }
+    inserts = list(synthetic_orders(size, 50, seed=1))
+    result["single_insert"] = _time(lambda o: db.insert_orders([o]), [(o,) for o in inserts])
+    return result
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated order counts")
+    parser.add_argument("--lookups", type=int, default=2000, help="timed calls per query type and size")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    from app.db.sales import SalesDatabase
+
+    workdir = tempfile.mkdtemp(prefix="smartflow-bench-db-")
+    db = SalesDatabase(os.path.join(workdir, "sales.db"))
+    rng = random.Random(42)
+    results = []
+    loaded = 0
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            start = time.perf_counter()
+            db.insert_orders(synthetic_orders(loaded, size - loaded))
+            load_seconds = time.perf_counter() - start
+            rate = (size - loaded) / load_seconds if load_seconds else 0.0
+            loaded = size
+            r = {"orders": size, "load_rows_per_s": round(rate), **measure(db, size, args.lookups, rng)}
+            # measure() appended a few orders; keep IDs contiguous for the next step.
+            loaded += 50
+            results.append(r)
+            print(f"\n{size:,} orders  (bulk load {rate:,.0f} rows/s)   latency µs")
+            print(f"  {'query':<24}{'p50':>10}{'p95':>10}{'p99':>10}")
+            for name in ("order_lookup", "monthly_sales", "annual_summary", "single_insert",
+                         "monthly_scan_baseline", "annual_scan_baseline"):
+                lat = r[name]
+                print(f"  {name:<24}{lat['p50']:>10.1f}{lat['p95']:>10.1f}{lat['p99']:>10.1f}")
+    finally:
+        db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"sizes": results}
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
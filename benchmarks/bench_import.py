@@ -0,0 +1,116 @@
+"""Cold import-time benchmark with a budget check.
+
+Imports each target module in a fresh interpreter under ``python -X importtime``,
+reports the cumulative import time (median over --runs) and the heaviest
+transitive imports, and fails when a target exceeds its time budget or pulls in
+a module that should only load on first use.
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --runs 5 --top 15 --json imports.json
+    python -m benchmarks.bench_import --target app.main --budget-scale 1.5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target -> (budget in ms, top-level packages that must not be imported eagerly)
+TARGETS = {
+    "app.config": (400, ("langchain_core", "fastapi")),
+    "app.main": (1500, ("langgraph", "chromadb", "numpy", "langchain_core", "langchain_openai", "langchain_ollama")),
+    "app.agent.tools": (400, ("langchain_core", "langgraph")),
+    "app.agent.supervisor": (1000, ("langgraph", "chromadb", "numpy")),
+    "app.rag.retriever": (600, ("chromadb", "langchain_core", "numpy")),
+    "app.memory.long_term": (600, ("chromadb", "numpy")),
+    "app.llm.provider": (600, ("langchain_core", "langchain_openai", "langchain_ollama")),
+}
+
+
+def _parse_importtime(stderr: str) -> dict[str, float]:
+    """Map module name -> cumulative import time in ms from -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def measure(module: str) -> dict[str, float]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return _parse_importtime(proc.stderr)
+
+
+def run_target(module: str, runs: int, top: int, budget_ms: float, forbidden: tuple) -> dict:
+    samples = [measure(module) for _ in range(runs)]
+    totals = [s.get(module, 0.0) for s in samples]
+    last = samples[-1]
+    heaviest = sorted(
+        ((name, ms) for name, ms in last.items() if name != module and "." not in name),
+        key=lambda kv: -kv[1],
+    )[:top]
+    loaded = {name.split(".")[0] for name in last}
+    violations = []
+    total_ms = statistics.median(totals)
+    if total_ms > budget_ms:
+        violations.append(f"{total_ms:.0f}ms exceeds budget {budget_ms:.0f}ms")
+    for pkg in forbidden:
+        if pkg in loaded:
+            violations.append(f"eagerly imports {pkg}")
+    return {
+        "module": module,
+        "import_ms": round(total_ms, 1),
+        "import_ms_runs": [round(t, 1) for t in totals],
+        "budget_ms": budget_ms,
+        "modules_loaded": len(last),
+        "heaviest": [{"module": name, "ms": round(ms, 1)} for name, ms in heaviest],
+        "violations": violations,
+    }
+
+
+def main(argv=None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="module to measure (repeatable, default all)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply all budgets (slow CI machines)")
+    parser.add_argument("--no-check", action="store_true", help="report only, always exit 0")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.target or TARGETS:
+        budget_ms, forbidden = TARGETS[module]
+        r = run_target(module, args.runs, args.top, budget_ms * args.budget_scale, forbidden)
+        results.append(r)
+        status = "FAIL" if r["violations"] else "ok"
+        print(f"{module:<24}{r['import_ms']:>9.1f} ms  (budget {r['budget_ms']:.0f})  {r['modules_loaded']:>5} modules  {status}")
+        for heavy in r["heaviest"]:
+            print(f"    {heavy['module']:<28}{heavy['ms']:>9.1f} ms")
+        for v in r["violations"]:
+            print(f"    ! {v}")
+
+    write_json(results, args.json)
+    if not args.no_check and any(r["violations"] for r in results):
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
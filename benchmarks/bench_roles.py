@@ -0,0 +1,151 @@
+"""Latency saved by per-role model routing.
+
+Runs the auto-routed workload (classifier, then ReAct or planner / executor /
+summarizer) twice in-process: once with every role on the default model and
+token budget ("baseline"), once with the LLM_<ROLE>_MODEL / _MAX_TOKENS /
+_TEMPERATURE routing ("routed"). Reports per-role LLM call latency, completion
+tokens and the time saved.
+
+By default runs on the offline fake provider, whose latency model is
+``base latency per model name + per-token decode time``; the routed run sends the
+classifier and planner to a faster "fake-mini" model. With --configured the
+providers and routes from .env are used instead (real API calls).
+
+Usage:
+    python -m benchmarks.bench_roles --requests 40
+    python -m benchmarks.bench_roles --route classifier=fake-mini:5 --route summarizer=fake-mini:256
+    python -m benchmarks.bench_roles --configured --requests 20 --json roles.json
+"""
+
+import argparse
+import time
+
+from benchmarks.common import WORKLOADS, latency_summary, use_fake_provider, write_json
+
+ROLES = ("classifier", "planner", "executor", "summarizer", "react")
+FIELDS = ("MODEL", "MAX_TOKENS", "TEMPERATURE")
+DEFAULT_ROUTES = ["classifier=fake-mini:5:0", "planner=fake-mini:1024"]
+
+
+def _parse_route(route: str) -> tuple[str, dict]:
+    """'role=model[:max_tokens[:temperature]]' -> (role, {field: value})."""
+    role, _, spec = route.partition("=")
+    role = role.strip().lower()
+    if role not in ROLES:
+        raise SystemExit(f"unknown role {role!r}, expected one of {', '.join(ROLES)}")
+    parts = spec.split(":")
+    values = {"MODEL": parts[0] or None}
+    if len(parts) > 1 and parts[1]:
+        values["MAX_TOKENS"] = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        values["TEMPERATURE"] = float(parts[2])
+    return role, values
+
+
+def _apply(settings, routes: dict[str, dict]) -> None:
+    """Reset every role override, then apply routes (roles not listed inherit)."""
+    for role in ROLES:
+        for name in FIELDS:
+            setattr(settings, f"LLM_{role.upper()}_{name}", routes.get(role, {}).get(name))
+
+
+def _run(queries: list[str]) -> dict:
+    from app.agent.supervisor import SupervisorAgent
+    from app.observability.tracing import request_trace
+
+    # Models are built with the current settings when the agents are created.
+    supervisor = SupervisorAgent()
+    calls: dict[str, list[float]] = {}
+    tokens: dict[str, int] = {}
+    totals = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        with request_trace("bench") as trace:
+            result = supervisor.invoke(query, session_id=f"roles-{i}", mode="auto", stateless=True)
+        totals.append(time.perf_counter() - start)
+        for s in trace.spans:
+            if s.kind == "llm":
+                calls.setdefault(s.name, []).append(s.duration)
+        for role, u in result["usage"]["by_role"].items():
+            tokens[role] = tokens.get(role, 0) + u["completion_tokens"]
+
+    return {
+        "request": latency_summary(totals),
+        "roles": {
+            role: {
+                "calls": len(durations),
+                "latency": latency_summary(durations),
+                "total_ms": round(sum(durations) * 1000, 1),
+                "completion_tokens": tokens.get(role, 0),
+            }
+            for role, durations in sorted(calls.items())
+        },
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="questions per run (cycled from the auto workload)")
+    parser.add_argument(
+        "--route", action="append",
+        help="role=model[:max_tokens[:temperature]] for the routed run (repeatable; default: settings / fake-mini)",
+    )
+    parser.add_argument("--configured", action="store_true", help="use the providers from .env instead of fake")
+    parser.add_argument("--llm-latency-ms", type=float, default=150.0, help="fake: base latency of the default model")
+    parser.add_argument("--mini-latency-ms", type=float, default=25.0, help="fake: base latency of fake-mini")
+    parser.add_argument("--token-latency-ms", type=float, default=2.0, help="fake: decode time per completion token")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    if not args.configured:
+        use_fake_provider(
+            FAKE_LLM_LATENCY_MS=args.llm_latency_ms,
+            FAKE_LLM_MODEL_LATENCY_MS=f"fake={args.llm_latency_ms},fake-mini={args.mini_latency_ms}",
+            FAKE_LLM_TOKEN_LATENCY_MS=args.token_latency_ms,
+            # Hedging would blur the per-model latency being measured.
+            LLM_HEDGE_ENABLED="false",
+        )
+    from app.config import settings
+
+    if args.route or not args.configured:
+        routes = dict(_parse_route(r) for r in args.route or DEFAULT_ROUTES)
+    else:
+        routes = {
+            role: {name: getattr(settings, f"LLM_{role.upper()}_{name}") for name in FIELDS} for role in ROLES
+        }
+
+    queries = [WORKLOADS["auto"][i % len(WORKLOADS["auto"])] for i in range(args.requests)]
+    _apply(settings, {})
+    baseline = _run(queries)
+    _apply(settings, routes)
+    routed = _run(queries)
+
+    report = {
+        "config": {"requests": args.requests, "provider": settings.LLM_PROVIDER, "routes": routes},
+        "baseline": baseline,
+        "routed": routed,
+        "saved_ms": {},
+    }
+    print(f"{'role':<12}{'calls':>6}{'base p50':>10}{'routed p50':>12}{'base tok':>10}{'routed tok':>12}{'saved/call':>12}")
+    for role, base in baseline["roles"].items():
+        new = routed["roles"].get(role)
+        if not new:
+            continue
+        saved = base["latency"]["mean"] - new["latency"]["mean"]
+        report["saved_ms"][role] = round(saved, 1)
+        print(
+            f"{role:<12}{base['calls']:>6}{base['latency']['p50']:>10.1f}{new['latency']['p50']:>12.1f}"
+            f"{base['completion_tokens']:>10}{new['completion_tokens']:>12}{saved:>10.1f}ms"
+        )
+    saved_request = baseline["request"]["mean"] - routed["request"]["mean"]
+    report["saved_ms"]["request"] = round(saved_request, 1)
+    print(
+        f"{'request':<12}{args.requests:>6}{baseline['request']['p50']:>10.1f}{routed['request']['p50']:>12.1f}"
+        f"{'':>22}{saved_request:>10.1f}ms"
+    )
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
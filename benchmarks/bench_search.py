@@ -0,0 +1,172 @@
+"""Build time, open time and query latency of the local web_search index.
+
+Generates a synthetic Chinese corpus (Zipf-distributed multi-character words,
+with a few ASCII terms mixed in), indexes it with app.search.index, reopens the
+memory-mapped index the way a fresh process would, and times BM25 top-k
+queries of 1-3 words. Query words are drawn from the same Zipf distribution,
+so common words with long posting lists are well represented. Results with
+the per-term posting cap (SEARCH_MAX_POSTINGS) are compared against
+exhaustive scoring (recall@k, ties counted as equal).
+
+A second, small index of long documents (a whole ``.txt`` / ``.md`` file is
+one document) times queries whose hits need rescoring and snippets taken from
+tens of thousands of characters.
+
+Usage:
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --docs 1000000 --queries 2000 --json search.json
+    python -m benchmarks.bench_search --docs 10000 --long-docs 50 --long-chars 200000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import latency_summary, write_json
+
+
+def synthetic_corpus(n_docs: int, vocab: int, words_per_doc: int, seed: int = 0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(2, 5, size=vocab)
+    chars = rng.integers(0x4E00, 0x9FA5, size=int(lengths.sum()))
+    ends = np.cumsum(lengths)
+    words = ["".join(map(chr, chars[e - n : e])) for e, n in zip(ends, lengths)]
+    for i in range(0, vocab, 50):  # sprinkle in ASCII terms
+        words[i] = f"term{i}"
+
+    batch = 10000
+    for start in range(0, n_docs, batch):
+        count = min(batch, n_docs - start)
+        ids = np.minimum(rng.zipf(1.2, size=(count, words_per_doc)) - 1, vocab - 1)
+        for j, row in enumerate(ids):
+            text = "，".join(words[w] for w in row)
+            yield {"title": words[row[0]] + words[row[1]], "url": f"https://example.com/doc/{start + j}", "text": text}
+    synthetic_corpus.words = words
+
+
+def long_corpus(n_docs: int, chars: int, words: list[str], seed: int = 2):
+    """Few documents of about ``chars`` characters each, e.g. manuals saved as one text file."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    per_doc = chars // 4
+    for i in range(n_docs):
+        ids = np.minimum(rng.zipf(1.2, size=per_doc) - 1, len(words) - 1)
+        yield {"title": f"long document {i}", "url": f"file://long-{i}.txt", "text": "，".join(words[w] for w in ids)}
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200000, help="synthetic documents to index")
+    parser.add_argument("--vocab", type=int, default=50000, help="distinct words in the synthetic corpus")
+    parser.add_argument("--words-per-doc", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=1000, help="timed queries")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-postings", type=int, default=None,
+                        help="postings read per query term (default: SEARCH_MAX_POSTINGS, 0 = all)")
+    parser.add_argument("--long-docs", type=int, default=20, help="documents in the long-document index")
+    parser.add_argument("--long-chars", type=int, default=54000, help="approximate characters per long document")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+
+    from app.config import settings
+    from app.search.index import SearchIndex
+
+    cap = settings.SEARCH_MAX_POSTINGS if args.max_postings is None else args.max_postings
+
+    workdir = tempfile.mkdtemp(prefix="smartflow-bench-search-")
+    index_dir = os.path.join(workdir, "index")
+    try:
+        start = time.perf_counter()
+        index = SearchIndex.build(synthetic_corpus(args.docs, args.vocab, args.words_per_doc), index_dir)
+        build_seconds = time.perf_counter() - start
+        index.close()
+
+        start = time.perf_counter()
+        index = SearchIndex(index_dir)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        words = synthetic_corpus.words
+        rng = np.random.default_rng(1)
+        queries = []
+        for _ in range(args.queries):
+            ids = np.minimum(rng.zipf(1.2, size=rng.integers(1, 4)) - 1, len(words) - 1)
+            queries.append(" ".join(words[i] for i in ids))
+
+        for q in queries[:50]:  # fault in the pages a warm server would have
+            index.search(q, k=args.top_k, max_postings=cap)
+        latencies, results = [], []
+        for q in queries:
+            start = time.perf_counter()
+            results.append(index.search(q, k=args.top_k, max_postings=cap))
+            latencies.append(time.perf_counter() - start)
+
+        exact_latencies, found, expected = [], 0, 0
+        for q, hits in zip(queries[:200], results):
+            start = time.perf_counter()
+            exact = index.search(q, k=args.top_k)
+            exact_latencies.append(time.perf_counter() - start)
+            # A hit counts if its score reaches the exhaustive k-th score, so
+            # ties broken differently are not counted as misses.
+            found += sum(h.score >= exact[-1].score - 1e-4 for h in hits) if exact else 0
+            expected += len(exact)
+        index.close()
+
+        long_dir = os.path.join(workdir, "long")
+        long_index = SearchIndex.build(long_corpus(args.long_docs, args.long_chars, words), long_dir)
+        for q in queries[:10]:
+            long_index.search(q, k=args.top_k, max_postings=cap)
+        long_latencies = []
+        for q in queries[:200]:
+            start = time.perf_counter()
+            long_index.search(q, k=args.top_k, max_postings=cap)
+            long_latencies.append(time.perf_counter() - start)
+        long_index.close()
+
+        report = {
+            "docs": args.docs,
+            "terms": index.meta["n_terms"],
+            "postings": index.meta["n_postings"],
+            "index_mb": round(_dir_size(index_dir) / 1e6, 1),
+            "build_s": round(build_seconds, 2),
+            "build_docs_per_s": round(args.docs / build_seconds),
+            "open_ms": round(open_ms, 2),
+            "queries": len(queries),
+            "max_postings": cap,
+            "empty_results": sum(not hits for hits in results),
+            "recall_at_k": round(found / expected, 4) if expected else 1.0,
+            "latency_ms": latency_summary(latencies),
+            "exhaustive_latency_ms": latency_summary(exact_latencies),
+            "long_docs": {"docs": args.long_docs, "chars": args.long_chars, "latency_ms": latency_summary(long_latencies)},
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{report['docs']:,} docs, {report['terms']:,} terms, {report['postings']:,} postings, "
+          f"{report['index_mb']} MB on disk")
+    print(f"build {report['build_s']}s ({report['build_docs_per_s']:,} docs/s), mmap open {report['open_ms']} ms")
+    print(f"  {'query (top-' + str(args.top_k) + ') ms':<28}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}")
+    long_label = f"{args.long_docs} docs x {args.long_chars:,} chars"
+    for label, lat in (
+        (f"max_postings={cap}", report["latency_ms"]),
+        ("exhaustive", report["exhaustive_latency_ms"]),
+        (long_label, report["long_docs"]["latency_ms"]),
+    ):
+        print(f"  {label:<28}{lat['p50']:>8.2f}{lat['p95']:>8.2f}{lat['p99']:>8.2f}{lat['max']:>8.2f}")
+    print(f"recall@{args.top_k} vs exhaustive: {report['recall_at_k']:.4f}")
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
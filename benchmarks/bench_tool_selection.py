@@ -0,0 +1,127 @@
+"""Prompt tokens per agent LLM call as the tool catalog grows.
+
+Adds synthetic tools (name, description, keyword triggers and a two-argument
+schema, like the real ones) to the four built-in tools, then for every
+workload query compares what one ReAct call carries — the system prompt's tool
+list plus the bound tool schemas — when all tools are bound versus only the
+ones the tool registry selects. Also reports how long selection takes and
+whether the tool the query needs was among those selected (recall).
+
+Usage:
+    python -m benchmarks.bench_tool_selection
+    python -m benchmarks.bench_tool_selection --catalog 4,16,64,256 --top-n 3 --json selection.json
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import WORKLOADS, latency_summary, use_fake_provider, write_json
+
+DOMAINS = [
+    ("exchange_rate", "汇率"), ("parcel", "快递"), ("flight", "航班"), ("stock", "股票"),
+    ("translate", "翻译"), ("calendar", "日程"), ("mail", "邮件"), ("map", "地图"),
+    ("inventory", "库存"), ("invoice", "发票"), ("attendance", "考勤"), ("meeting_room", "会议室"),
+    ("ticket", "工单"), ("customer", "客户"), ("contract", "合同"), ("hotel", "酒店"),
+    ("train", "火车票"), ("dictionary", "词典"), ("payroll", "工资"), ("recruiting", "招聘"),
+]
+ACTIONS = [("lookup", "查询"), ("create", "创建"), ("update", "修改"), ("cancel", "取消"),
+           ("report", "统计"), ("remind", "提醒"), ("export", "导出"), ("approve", "审批")]
+
+
+def synthetic_specs(count: int, seed: int = 0) -> list[tuple[dict, object]]:
+    """(OpenAI tool schema, ToolSpec) pairs for count made-up tools."""
+    from app.agent.tools.registry import ToolSpec
+
+    rng = random.Random(seed)
+    tools = []
+    for i in range(count):
+        (domain, domain_zh), (action, action_zh) = DOMAINS[i % len(DOMAINS)], rng.choice(ACTIONS)
+        name = f"{domain}_{action}_{i}"
+        summary = f"{action_zh}{domain_zh}信息"
+        description = f"{action_zh}{domain_zh}相关记录，返回{domain_zh}的详细信息与状态。"
+        schema = {"type": "function", "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": {
+                "query": {"type": "string", "description": f"{domain_zh}的名称或编号"},
+                "options": {"type": "string", "description": "可选的过滤条件"},
+            }, "required": ["query"]},
+        }}
+        tools.append((schema, ToolSpec(name, summary, (f"{domain_zh}{action_zh}", f"{action_zh}{domain_zh}"), description)))
+    return tools
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", default="4,16,64,256", help="comma-separated catalog sizes (built-in tools included)")
+    parser.add_argument("--top-n", type=int, default=3, help="TOOL_SELECTION_TOP_N")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    use_fake_provider()
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    from app.agent.react_agent import SYSTEM_PROMPT
+    from app.agent.tools import get_all_tools, get_tool_registry
+    from app.agent.tools.registry import ToolRegistry
+    from app.llm.fake import FakeChatModel
+    from app.llm.provider import get_embeddings
+    from app.llm.tokens import estimate_tokens
+
+    builtin = get_tool_registry().specs
+    builtin_schemas = {t.name: convert_to_openai_tool(t) for t in get_all_tools()}
+    queries = WORKLOADS["react"] + WORKLOADS["plan_execute"] + WORKLOADS["rag"]
+    # The tool each query needs, as the offline model would pick it with every tool bound.
+    needed = {q: (FakeChatModel._match_tool(q, list(builtin_schemas)) or (None,))[0] for q in queries}
+
+    results = []
+    print(f"\n{'tools':>6}{'all: tokens':>13}{'selected: tokens':>18}{'bound':>7}{'saved':>8}"
+          f"{'select µs p50':>15}{'p95':>8}{'recall':>8}")
+    for size in (int(c) for c in args.catalog.split(",")):
+        extra = synthetic_specs(max(size - len(builtin), 0))
+        specs = list(builtin) + [spec for _, spec in extra]
+        schemas = {**builtin_schemas, **{spec.name: schema for schema, spec in extra}}
+        registry = ToolRegistry(specs, top_n=args.top_n, embeddings_factory=get_embeddings)
+        registry.select("warm-up")  # embeds the catalog once, as the first real query would
+
+        def call_tokens(names) -> int:
+            prompt = SYSTEM_PROMPT.format(tools=registry.prompt_lines(names))
+            return estimate_tokens(prompt) + sum(
+                estimate_tokens(json.dumps(schemas[n], ensure_ascii=False)) for n in names
+            )
+
+        all_tokens = call_tokens(registry.names)
+        selected_tokens, bound, latencies, hits, relevant = [], [], [], 0, 0
+        for q in queries:
+            t = time.perf_counter()
+            names = registry.select(q)
+            latencies.append(time.perf_counter() - t)
+            selected_tokens.append(call_tokens(names))
+            bound.append(len(names))
+            if needed[q] is not None:
+                relevant += 1
+                hits += needed[q] in names
+        mean_tokens = sum(selected_tokens) / len(selected_tokens)
+        # Scaled by 1000 so the summary's "ms" are µs.
+        lat = latency_summary([v * 1000 for v in latencies])
+        recall = hits / relevant if relevant else 1.0
+        results.append({
+            "tools": len(specs),
+            "all_tools_tokens": all_tokens,
+            "selected_tokens_mean": round(mean_tokens, 1),
+            "bound_tools_mean": round(sum(bound) / len(bound), 2),
+            "selection_us": lat,
+            "recall": round(recall, 3),
+        })
+        print(f"{len(specs):>6}{all_tokens:>13}{mean_tokens:>18.1f}{sum(bound) / len(bound):>7.1f}"
+              f"{1 - mean_tokens / all_tokens:>8.0%}{lat['p50']:>15.1f}{lat['p95']:>8.1f}{recall:>8.2f}")
+
+    report = {"top_n": args.top_n, "queries": len(queries), "sizes": results}
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
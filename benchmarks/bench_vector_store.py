@@ -0,0 +1,198 @@
+"""Retrieval and ingestion scale benchmark for VectorStoreManager.
+
+Grows a synthetic corpus (embedded with the deterministic hashing embedder)
+through a series of collection sizes and, at each size, measures:
+
+- ingest throughput of add_documents (chunks/sec)
+- similarity_search latency for each k
+- list_collections latency
+- process RSS and on-disk footprint of the Chroma directory
+- recall@k of the HNSW index against brute-force exact cosine search
+
+Usage:
+    python -m benchmarks.bench_vector_store --sizes 10000,100000 --k 1,4,10
+    python -m benchmarks.bench_vector_store --sizes 100000,1000000 --hnsw-m 32 --hnsw-search-ef 100 --json scale.json
+"""
+
+import argparse
+import os
+import random
+import resource
+import time
+
+import numpy as np
+
+from benchmarks.common import latency_summary, use_fake_provider, write_json
+
+COLLECTION = "bench_scale"
+# Vocabulary of short CJK "words"; documents are random draws with topic bias
+# so that queries have a meaningful nearest-neighbour structure.
+_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理府研质"
+
+
+def _make_corpus(rng: random.Random, count: int, offset: int, topics: int = 500) -> list:
+    from langchain_core.documents import Document
+
+    docs = []
+    for i in range(offset, offset + count):
+        topic = rng.randrange(topics)
+        topic_rng = random.Random(topic)
+        words = [topic_rng.choice(_CHARS) + topic_rng.choice(_CHARS) for _ in range(8)]
+        body = [rng.choice(words) if rng.random() < 0.6 else rng.choice(_CHARS) + rng.choice(_CHARS) for _ in range(40)]
+        docs.append(Document(page_content="".join(body), metadata={"source": f"synthetic_{topic}.txt", "chunk_id": i}))
+    return docs
+
+
+def _make_queries(rng: random.Random, docs_text: list[str], count: int) -> list[str]:
+    queries = []
+    for _ in range(count):
+        text = docs_text[rng.randrange(len(docs_text))]
+        start = rng.randrange(max(len(text) - 20, 1))
+        queries.append(text[start:start + 20])
+    return queries
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+
+def _dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+
+def _exact_top_k(matrix: np.ndarray, query_vecs: np.ndarray, k: int) -> list[set]:
+    scores = query_vecs @ matrix.T
+    k = min(k, matrix.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def main(argv=None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="cumulative collection sizes to measure at")
+    parser.add_argument("--k", default="1,4,10", help="comma-separated k values")
+    parser.add_argument("--queries", type=int, default=200, help="queries per size")
+    parser.add_argument("--batch", type=int, default=5000, help="chunks per add_documents call")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension")
+    parser.add_argument("--hnsw-m", type=int, default=0, help="hnsw:M (0 = Chroma default)")
+    parser.add_argument("--hnsw-construction-ef", type=int, default=0)
+    parser.add_argument("--hnsw-search-ef", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    persist_dir = use_fake_provider(FAKE_EMBEDDING_DIM=args.dim)
+    from app.rag.vector_store import VectorStoreManager
+
+    store = VectorStoreManager()
+    embedder = store._get_embeddings()
+
+    metadata = {"hnsw:space": "cosine"}
+    for key, value in (
+        ("hnsw:M", args.hnsw_m),
+        ("hnsw:construction_ef", args.hnsw_construction_ef),
+        ("hnsw:search_ef", args.hnsw_search_ef),
+    ):
+        if value:
+            metadata[key] = value
+    store._client.get_or_create_collection(name=COLLECTION, metadata=metadata)
+
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    ks = [int(k) for k in args.k.split(",")]
+    texts: list[str] = []
+    vectors: list[np.ndarray] = []
+    rss_start = _rss_mb()
+    results = []
+
+    for size in sizes:
+        to_add = size - len(texts)
+        ingest_seconds = 0.0
+        while to_add > 0:
+            batch = _make_corpus(rng, min(args.batch, to_add), len(texts))
+            start = time.perf_counter()
+            store.add_documents(batch, COLLECTION)
+            ingest_seconds += time.perf_counter() - start
+            batch_texts = [d.page_content for d in batch]
+            texts.extend(batch_texts)
+            # Ground truth reuses the same deterministic embedder (not timed).
+            vectors.append(np.asarray(embedder.embed_documents(batch_texts), dtype=np.float32))
+            to_add -= len(batch)
+
+        matrix = np.concatenate(vectors) if len(vectors) > 1 else vectors[0]
+        vectors = [matrix]
+        queries = _make_queries(rng, texts, args.queries)
+        query_vecs = np.asarray(embedder.embed_documents(queries), dtype=np.float32)
+
+        by_k = {}
+        for k in ks:
+            latencies, hits = [], 0
+            truth = _exact_top_k(matrix, query_vecs, k)
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = store.similarity_search(query, COLLECTION, k=k)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & {d.metadata["chunk_id"] for d in found})
+            by_k[str(k)] = {
+                "latency_ms": latency_summary(latencies),
+                "recall": round(hits / (len(queries) * min(k, len(texts))), 4),
+            }
+
+        list_latencies = []
+        for _ in range(20):
+            start = time.perf_counter()
+            store.list_collections()
+            list_latencies.append(time.perf_counter() - start)
+
+        added = size - (results[-1]["size"] if results else 0)
+        result = {
+            "size": size,
+            "ingest_chunks_per_sec": round(added / ingest_seconds, 1) if ingest_seconds else 0.0,
+            "query": by_k,
+            "list_collections_ms": latency_summary(list_latencies),
+            "rss_mb": round(_rss_mb(), 1),
+            "rss_growth_mb": round(_rss_mb() - rss_start, 1),
+            "disk_mb": round(_dir_size_mb(persist_dir), 1),
+        }
+        results.append(result)
+
+        print(
+            f"size={size:<9} ingest={result['ingest_chunks_per_sec']:>9.1f} chunks/s  "
+            f"rss={result['rss_mb']:.0f}MB (+{result['rss_growth_mb']:.0f})  disk={result['disk_mb']:.1f}MB  "
+            f"list_collections p50={result['list_collections_ms']['p50']:.2f}ms"
+        )
+        for k, r in by_k.items():
+            lat = r["latency_ms"]
+            print(f"    k={k:<4} p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms p99={lat['p99']:.2f}ms recall@k={r['recall']:.4f}")
+
+    report = {
+        "config": {
+            "dim": args.dim,
+            "batch": args.batch,
+            "queries": args.queries,
+            "hnsw": {k: v for k, v in metadata.items() if k != "hnsw:space"},
+        },
+        "results": results,
+    }
+    write_json(report, args.json)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""City matching latency of weather_query as the city list grows.
+
+Generates synthetic city lists (each city with aliases and districts, like the
+national list), then times resolving free-text queries with the compiled
+Aho-Corasick matcher against the previous approach of checking every name
+with ``name in query``. Also reports how long compiling the matcher takes,
+which happens once at import.
+
+Usage:
+    python -m benchmarks.bench_weather
+    python -m benchmarks.bench_weather --cities 100,1000,3000 --queries 5000 --json weather.json
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import latency_summary, write_json
+
+TEMPLATES = ["{}天气怎么样", "明天{}会下雨吗", "{}", "帮我查一下{}的气温", "去{}出差穿什么"]
+
+
+def _name(rng: random.Random, length: int) -> str:
+    return "".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(length))
+
+
+def synthetic_cities(count: int, districts: int = 8, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    cities = []
+    for _ in range(count):
+        name = _name(rng, rng.choice((2, 2, 3)))
+        cities.append({
+            "name": name,
+            "aliases": [name + "市", _name(rng, 2) + "城"],
+            "districts": {(d := _name(rng, 2)) + "区": [d] for _ in range(districts)},
+        })
+    return cities
+
+
+def linear_match(patterns: list[tuple[str, tuple]], query: str):
+    """The pre-automaton lookup: first listed name contained in the query."""
+    for name, value in patterns:
+        if name in query:
+            return value
+    return None
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", default="8,100,1000,3000", help="comma-separated city counts")
+    parser.add_argument("--districts", type=int, default=8, help="districts per city")
+    parser.add_argument("--queries", type=int, default=2000, help="timed queries per size")
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    from app.search.aho_corasick import AhoCorasick
+
+    rng = random.Random(42)
+    results = []
+    print(f"\n{'cities':>8}{'patterns':>10}{'compile ms':>12}   {'query µs':<10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for count in (int(c) for c in args.cities.split(",")):
+        cities = synthetic_cities(count, args.districts)
+        patterns = [(c["name"], (c["name"], "")) for c in cities]
+        patterns += [(a, (c["name"], "")) for c in cities for a in c["aliases"]]
+        patterns += [(n, (c["name"], d)) for c in cities for d, al in c["districts"].items() for n in [d, *al]]
+
+        start = time.perf_counter()
+        matcher = AhoCorasick(patterns)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        queries = []
+        for _ in range(args.queries):
+            name = rng.choice(patterns)[0] if rng.random() < 0.9 else _name(rng, 3)  # 10% unknown
+            queries.append(rng.choice(TEMPLATES).format(name))
+
+        timings = {}
+        for label, fn in (
+            ("automaton", lambda q: max(matcher.iter_matches(q), key=lambda m: m.end - m.start, default=None)),
+            ("linear_scan", lambda q: linear_match(patterns, q)),
+        ):
+            latencies = []
+            for q in queries:
+                t = time.perf_counter()
+                fn(q)
+                latencies.append(time.perf_counter() - t)
+            # Scaled by 1000 so the summary's "ms" are µs.
+            timings[label] = latency_summary([v * 1000 for v in latencies])
+
+        results.append({"cities": count, "patterns": len(matcher), "compile_ms": round(compile_ms, 2), **timings})
+        for label in ("automaton", "linear_scan"):
+            lat = timings[label]
+            head = f"{count:>8}{len(matcher):>10}{compile_ms:>12.1f}" if label == "automaton" else " " * 30
+            print(f"{head}   {label:<10}{lat['p50']:>9.2f}{lat['p95']:>9.2f}{lat['p99']:>9.2f}")
+
+    report = {"sizes": results}
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
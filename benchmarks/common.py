@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import tempfile
+
+SAMPLE_DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_docs")
+
+# Representative queries per workload, shared by the in-process and HTTP benchmarks.
+WORKLOADS = {
+    "react": [
+        "查一下北京的天气",
+        "帮我算一下 (123 + 456) * 2",
+        "查询订单 ORD-2024-001 的状态",
+        "查一下 2024-11 的销售额",
+        "搜索人工智能最新趋势",
+    ],
+    "plan_execute": [
+        "查一下上海的天气，然后根据天气推荐穿搭",
+        "查询 2024-10 的销售额，再计算 (2100000 - 1890000) / 1890000 * 100",
+        "对比 2024-11 和 2024-12 的销售额并分析增长原因",
+        "查询订单 ORD-2024-004，然后搜索智能手表最新趋势",
+    ],
+    "rag": [
+        "年假怎么休？",
+        "退货流程是什么？",
+        "报销范围有哪些？",
+        "换货商品没有库存怎么办？",
+    ],
+}
+WORKLOADS["auto"] = WORKLOADS["react"] + WORKLOADS["plan_execute"]
+
+
+def fake_provider_env(prefix: str = "smartflow-bench-") -> dict[str, str]:
+    """Environment for the offline fake provider with every data path in a new temp dir.
+
+    Covers Chroma, the sales DB and the search index, so a run never touches
+    the repo's ``data/``. For ``os.environ`` or a server subprocess.
+    """
+    data_dir = tempfile.mkdtemp(prefix=prefix)
+    return {
+        "LLM_PROVIDER": "fake",
+        "CHROMA_PERSIST_DIR": data_dir,
+        "SALES_DB_PATH": os.path.join(data_dir, "sales.db"),
+        "SEARCH_INDEX_DIR": os.path.join(data_dir, "search_index"),
+    }
+
+
+def use_fake_provider(**overrides) -> str:
+    """Point the app at the offline fake provider and a throwaway data dir (Chroma, sales DB, search index).
+
+    Must run before anything under ``app`` is imported, since settings are read
+    once at import time. Returns the temporary persist directory.
+    """
+    env = fake_provider_env()
+    os.environ.update(env)
+    os.environ.setdefault("LONG_TERM_MAINTENANCE_INTERVAL", "0")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    # Chroma warns on every query against small collections and on telemetry.
+    logging.getLogger("chromadb").setLevel(logging.CRITICAL)
+    return env["CHROMA_PERSIST_DIR"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def latency_summary(latencies_s: list[float]) -> dict:
+    """p50/p95/p99/mean/max of a list of latencies in seconds, reported in ms."""
+    if not latencies_s:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    ms = [v * 1000 for v in latencies_s]
+    return {
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "mean": round(sum(ms) / len(ms), 3),
+        "max": round(max(ms), 3),
+    }
+
+
+def write_json(report, path: str | None) -> None:
+    """Write a report to path, or to stdout when path is "-"."""
+    if not path:
+        return
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
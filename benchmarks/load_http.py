@@ -0,0 +1,286 @@
+"""Open-loop HTTP load generator for the SmartFlow API.
+
+Drives /api/chat, /api/documents/upload and /api/documents/collections with a
+mixed workload built from data/sample_docs and the benchmark queries, using
+Poisson arrivals at a fixed rate and a pool of reused session IDs.
+
+Usage:
+    # against a running server
+    python -m benchmarks.load_http --base-url http://localhost:8000 --rate 20 --duration 30
+
+    # spawn a local server on the offline fake provider (no network needed)
+    python -m benchmarks.load_http --spawn-server --rate 50 --duration 20 --json run.json
+
+    # compare with a previous run
+    python -m benchmarks.load_http --spawn-server --baseline run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import SAMPLE_DOCS_DIR, WORKLOADS, fake_provider_env, latency_summary, write_json
+
+LOAD_COLLECTION = "loadtest"
+DEFAULT_MIX = "chat=0.85,collections=0.1,upload=0.05"
+
+
+class _Stats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, elapsed: float, status: str, ok: bool) -> None:
+        self.latencies.append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def report(self) -> dict:
+        count = len(self.latencies)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "latency_ms": latency_summary(self.latencies),
+        }
+
+
+def _parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"chat", "collections", "upload"}
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _load_sample_docs() -> list[tuple[str, bytes]]:
+    docs = []
+    for name in sorted(os.listdir(SAMPLE_DOCS_DIR)):
+        with open(os.path.join(SAMPLE_DOCS_DIR, name), "rb") as f:
+            docs.append((name, f.read()))
+    return docs
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, args, rng: random.Random):
+        self.client = client
+        self.args = args
+        self.rng = rng
+        self.mix = _parse_mix(args.mix)
+        self.sessions = [f"load-{i}" for i in range(args.sessions)]
+        self.docs = _load_sample_docs()
+        self.stats = {name: _Stats() for name in self.mix}
+        self.in_flight = 0
+        self.dropped = 0
+
+    def _chat_payload(self) -> dict:
+        workload = self.rng.choice(list(WORKLOADS))
+        query = self.rng.choice(WORKLOADS[workload])
+        return {
+            "message": query,
+            "session_id": self.rng.choice(self.sessions),
+            "agent_mode": "react" if workload == "rag" else workload,
+            "use_rag": workload == "rag",
+            "collection_name": LOAD_COLLECTION,
+        }
+
+    async def _send(self, endpoint: str) -> None:
+        start = time.perf_counter()
+        try:
+            if endpoint == "chat":
+                resp = await self.client.post("/api/chat", json=self._chat_payload())
+            elif endpoint == "upload":
+                name, content = self.rng.choice(self.docs)
+                resp = await self.client.post(
+                    "/api/documents/upload",
+                    files={"file": (name, content)},
+                    data={"collection_name": LOAD_COLLECTION},
+                )
+            else:
+                resp = await self.client.get("/api/documents/collections")
+            status, ok = str(resp.status_code), resp.status_code < 400
+        except httpx.TimeoutException:
+            status, ok = "timeout", False
+        except httpx.HTTPError as e:
+            status, ok = type(e).__name__, False
+        self.stats[endpoint].record(time.perf_counter() - start, status, ok)
+
+    async def _tracked(self, endpoint: str) -> None:
+        self.in_flight += 1
+        try:
+            await self._send(endpoint)
+        finally:
+            self.in_flight -= 1
+
+    async def run(self) -> float:
+        """Issue requests with exponential inter-arrival times (open loop)."""
+        endpoints, weights = zip(*self.mix.items())
+        tasks = set()
+        start = time.perf_counter()
+        next_at = start
+        sent = 0
+        while True:
+            now = time.perf_counter()
+            if now - start >= self.args.duration:
+                break
+            if self.args.requests and sent >= self.args.requests:
+                break
+            if next_at > now:
+                await asyncio.sleep(next_at - now)
+            next_at += self.rng.expovariate(self.args.rate)
+            sent += 1
+            if self.in_flight >= self.args.max_in_flight:
+                self.dropped += 1
+                continue
+            endpoint = self.rng.choices(endpoints, weights)[0]
+            task = asyncio.create_task(self._tracked(endpoint))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+async def _prime(client: httpx.AsyncClient, docs: list[tuple[str, bytes]]) -> None:
+    """Make sure the RAG collection exists before chat traffic starts."""
+    name, content = docs[0]
+    resp = await client.post(
+        "/api/documents/upload",
+        files={"file": (name, content)},
+        data={"collection_name": LOAD_COLLECTION},
+    )
+    resp.raise_for_status()
+
+
+def _spawn_server(port: int, show_logs: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(fake_provider_env(prefix="smartflow-load-"))
+    env["LONG_TERM_MAINTENANCE_INTERVAL"] = "0"
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=None if show_logs else subprocess.DEVNULL,
+        stderr=None if show_logs else subprocess.DEVNULL,
+    )
+
+
+async def _wait_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2.0) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit(f"Server at {base_url} did not become healthy within {timeout:.0f}s")
+
+
+def _print_comparison(report: dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs baseline {baseline_path}:")
+    rps_old, rps_new = baseline["throughput_rps"], report["throughput_rps"]
+    print(f"  throughput_rps  {rps_old:>10.2f} -> {rps_new:>10.2f}")
+    for endpoint, new in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old:
+            continue
+        for key in ("p50", "p95", "p99"):
+            a, b = old["latency_ms"][key], new["latency_ms"][key]
+            delta = (b - a) / a * 100 if a else 0.0
+            print(f"  {endpoint:<12}{key:<5}{a:>10.2f} -> {b:>10.2f} ms ({delta:+.1f}%)")
+        print(f"  {endpoint:<12}err  {old['error_rate']:>10.4f} -> {new['error_rate']:>10.4f}")
+
+
+async def _main(args) -> dict:
+    server = None
+    base_url = args.base_url
+    if args.spawn_server:
+        server = _spawn_server(args.port, args.server_logs)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await _wait_healthy(base_url)
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            generator = LoadGenerator(client, args, random.Random(args.seed))
+            await _prime(client, generator.docs)
+            wall = await generator.run()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    endpoints = {name: s.report() for name, s in generator.stats.items()}
+    completed = sum(e["count"] for e in endpoints.values())
+    errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "config": {
+            "base_url": base_url,
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": generator.mix,
+            "sessions": args.sessions,
+            "seed": args.seed,
+        },
+        "wall_seconds": round(wall, 3),
+        "completed": completed,
+        "dropped": generator.dropped,
+        "throughput_rps": round(completed / wall, 2) if wall > 0 else 0.0,
+        "error_rate": round(errors / completed, 4) if completed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--spawn-server", action="store_true", help="start a local server on the fake provider")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn-server")
+    parser.add_argument("--server-logs", action="store_true", help="show output of the spawned server")
+    parser.add_argument("--rate", type=float, default=10.0, help="mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to generate load")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many arrivals (0 = no limit)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. chat=0.8,upload=0.1,collections=0.1")
+    parser.add_argument("--sessions", type=int, default=20, help="size of the reused session ID pool")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report as JSON to this path ('-' for stdout)")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_main(args))
+
+    print(
+        f"completed={report['completed']} dropped={report['dropped']} "
+        f"rps={report['throughput_rps']:.2f} error_rate={report['error_rate']:.4f}"
+    )
+    for endpoint, r in report["endpoints"].items():
+        lat = r["latency_ms"]
+        print(
+            f"  {endpoint:<12} n={r['count']:<6} err={r['error_rate']:.4f} "
+            f"p50={lat['p50']:.1f} p95={lat['p95']:.1f} p99={lat['p99']:.1f} ms"
+        )
+    if args.baseline:
+        _print_comparison(report, args.baseline)
+    write_json(report, args.json)
+    return report
+
+
+if __name__ == "__main__":
+    main()